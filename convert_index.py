@@ -1,36 +1,195 @@
-import pickle
+"""
+Exporta e importa índices (FileIndex) sem carregar as ocorrências em memória.
+
+O arquivo de ocorrências está ordenado por (term_id, doc_id): ele é lido
+sequencialmente e cada lista de ocorrências é gravada assim que termina,
+de modo que apenas a lista do termo atual fica em memória.
+
+Formatos:
+    jsonl:  uma linha por termo
+            {"term": ..., "term_id": ..., "df": ..., "postings": [[doc_id, term_freq], ...]}
+    binary: cabeçalho MAGIC seguido de um bloco por termo (inteiros em varint,
+            ver util/encoding.py):
+            len(termo) termo df len(colunas) colunas
+            em que as colunas são os doc_ids (gaps) seguidos das frequências
+
+Uso:
+    python convert_index.py export INDICE SAIDA [--format jsonl|binary]
+    python convert_index.py import ENTRADA INDICE [--format jsonl|binary] [--prefix PREFIXO]
+
+INDICE é um indice salvo com Index.save (--output do index.indexer). Na
+exportação também é aceito um arquivo .idx avulso (ex.: occur_index.idx), mas
+nele não há os termos, apenas os term_ids.
+"""
+from typing import BinaryIO, Iterator, List, TextIO, Tuple
 import json
+import os
+import pickle
+
+from index.structure import FileIndex, Index, TermFilePosition, TermOccurrence
+from util.encoding import encode_gaps, decode_gaps, encode_varint, decode_varint, write_varint, read_varint
+
+MAGIC = b"RIIDX1\n"
 
+# (termo, term_id, [(doc_id, term_freq), ...])
+TermPostings = Tuple[str, int, List[Tuple[int, int]]]
 
-def read_input(file):
-    data = []
-    dict_term_id = {}
+
+def read_occurrences(file: BinaryIO) -> Iterator[TermOccurrence]:
     while True:
         try:
-            line = pickle.load(file)
+            occurrence = pickle.load(file)
         except EOFError:
             break
         else:
-            value = {'doc_id': line.doc_id, 'term_freq': line.term_freq}
-            key = f'term_id {line.term_id}'
-            if key not in dict_term_id:
-                if dict_term_id != {}:
-                    data.append(dict_term_id.copy())
-                dict_term_id = {key: [value]}
-            else:
-                dict_term_id[key].append(value)
-    return data
+            yield occurrence
+
+
+def group_by_term(iter_occurrences: Iterator[TermOccurrence], dic_terms: dict = None,
+                  deleted_docs=()) -> Iterator[TermPostings]:
+    """Agrupa as ocorrências (ordenadas por term_id) em uma lista por termo"""
+    term_id = None
+    lst_postings = []
+    for occurrence in iter_occurrences:
+        if occurrence.term_id != term_id:
+            if lst_postings:
+                yield (dic_terms.get(term_id) if dic_terms else None), term_id, lst_postings
+            term_id = occurrence.term_id
+            lst_postings = []
+        if occurrence.doc_id not in deleted_docs:
+            lst_postings.append((occurrence.doc_id, occurrence.term_freq))
+    if lst_postings:
+        yield (dic_terms.get(term_id) if dic_terms else None), term_id, lst_postings
+
+
+def iter_index_postings(index: FileIndex) -> Iterator[TermPostings]:
+    if index.lst_occurrences_tmp:
+        raise ValueError("O índice possui ocorrências em memória: chame finish_indexing antes de exportá-lo")
+    if index.str_idx_file_name is None:
+        return
+    dic_terms = {entry.term_id: term for term, entry in index.dic_index.items()}
+    with open(index.str_idx_file_name, "rb") as file:
+        yield from group_by_term(read_occurrences(file), dic_terms, index.deleted_docs)
+
+
+def iter_idx_file_postings(str_idx_file: str) -> Iterator[TermPostings]:
+    with open(str_idx_file, "rb") as file:
+        yield from group_by_term(read_occurrences(file))
+
 
+def write_jsonl(iter_postings: Iterator[TermPostings], file: TextIO) -> int:
+    num_terms = 0
+    for term, term_id, lst_postings in iter_postings:
+        dic_line = {"term": term, "term_id": term_id, "df": len(lst_postings), "postings": lst_postings}
+        file.write(json.dumps(dic_line, ensure_ascii=False) + "\n")
+        num_terms += 1
+    return num_terms
 
-def write_output(data: list):
-    with open('data.json', 'w', encoding='utf-8') as file:
-        json.dump(data, file, ensure_ascii=False, indent=4)
+
+def read_jsonl(file: TextIO) -> Iterator[TermPostings]:
+    for line in file:
+        if line.strip():
+            dic_line = json.loads(line)
+            yield dic_line["term"], dic_line["term_id"], [tuple(posting) for posting in dic_line["postings"]]
+
+
+def write_binary(iter_postings: Iterator[TermPostings], file: BinaryIO) -> int:
+    file.write(MAGIC)
+    num_terms = 0
+    for term, term_id, lst_postings in iter_postings:
+        if term is None:
+            raise ValueError("O formato binário exige os termos: exporte um indice salvo com Index.save")
+        arr_term = term.encode("utf-8")
+        arr_columns = encode_gaps(doc_id for doc_id, term_freq in lst_postings) + \
+                      b"".join(encode_varint(term_freq) for doc_id, term_freq in lst_postings)
+        file.write(encode_varint(len(arr_term)) + arr_term + encode_varint(len(lst_postings)))
+        write_varint(file, len(arr_columns))
+        file.write(arr_columns)
+        num_terms += 1
+    return num_terms
+
+
+def read_binary(file: BinaryIO) -> Iterator[TermPostings]:
+    if file.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Arquivo não está no formato binário de indice")
+    term_id = 0
+    while True:
+        term_len = read_varint(file)
+        if term_len is None:
+            break
+        term = file.read(term_len).decode("utf-8")
+        doc_count = read_varint(file)
+        arr_columns = file.read(read_varint(file))
+        lst_doc_ids, pos = decode_gaps(arr_columns, doc_count)
+        lst_freqs = []
+        for i in range(doc_count):
+            term_freq, pos = decode_varint(arr_columns, pos)
+            lst_freqs.append(term_freq)
+        yield term, term_id, list(zip(lst_doc_ids, lst_freqs))
+        term_id += 1
+
+
+def build_file_index(iter_postings: Iterator[TermPostings], str_file_prefix: str = "occur_index") -> FileIndex:
+    """
+    Cria um FileIndex finalizado gravando as ocorrências diretamente no arquivo
+    (os termos chegam em ordem de term_id e cada lista ordenada por doc_id)
+    """
+    index = FileIndex(str_file_prefix)
+    index.str_idx_file_name = f"{str_file_prefix}_{index.idx_file_counter}.idx"
+    with open(index.str_idx_file_name, "wb") as file:
+        for term, old_term_id, lst_postings in iter_postings:
+            if term is None:
+                term = f"term_id {old_term_id}"
+            term_id = len(index.dic_index)
+            index.dic_index[term] = TermFilePosition(term_id, file.tell(), len(lst_postings))
+            for doc_id, term_freq in lst_postings:
+                TermOccurrence(doc_id, term_id, term_freq).write(file)
+                index.set_documents.add(doc_id)
+    return index
+
+
+def export_index(str_input: str, str_output: str, str_format: str = "jsonl") -> int:
+    if str_input.endswith(".idx"):
+        iter_postings = iter_idx_file_postings(str_input)
+    else:
+        iter_postings = iter_index_postings(Index.load(str_input))
+    if str_format == "binary":
+        with open(str_output, "wb") as file:
+            return write_binary(iter_postings, file)
+    with open(str_output, "w", encoding="utf-8") as file:
+        return write_jsonl(iter_postings, file)
+
+
+def import_index(str_input: str, str_output: str, str_format: str = "jsonl", str_file_prefix: str = None) -> FileIndex:
+    if str_file_prefix is None:
+        str_file_prefix = os.path.splitext(str_output)[0]
+    if str_format == "binary":
+        with open(str_input, "rb") as file:
+            index = build_file_index(read_binary(file), str_file_prefix)
+    else:
+        with open(str_input, "r", encoding="utf-8") as file:
+            index = build_file_index(read_jsonl(file), str_file_prefix)
+    index.save(str_output)
+    return index
 
 
 def main():
-    file_name = 'occur_index.idx'
-    with open(file_name, "rb") as file:
-        write_output(read_input(file))
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Exporta/importa índices em JSONL ou no formato binário")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--format", choices=["jsonl", "binary"], default="jsonl")
+    parser.add_argument("--prefix", default=None, help="prefixo do arquivo de ocorrências criado na importação")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        num_terms = export_index(args.input, args.output, args.format)
+        print(f"{num_terms} termos exportados para {args.output}")
+    else:
+        index = import_index(args.input, args.output, args.format, args.prefix)
+        print(f"{len(index.dic_index)} termos importados em {index.str_idx_file_name}")
 
 
 if __name__ == '__main__':
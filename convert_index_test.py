@@ -0,0 +1,63 @@
+from convert_index import export_index, import_index, iter_index_postings
+from index.structure import FileIndex, Index
+import json
+import os
+import tempfile
+import unittest
+
+
+class ConvertIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.index = FileIndex(self.path("occur_index"))
+        for doc_id, term, term_freq in [(1, "casa", 2), (1, "verde", 1), (2, "casa", 1), (3, "ação", 4),
+                                        (300, "verde", 2), (2, "azul", 1)]:
+            self.index.index(term, doc_id, term_freq)
+        self.index.finish_indexing()
+        self.index.save(self.path("index.pickle"))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def path(self, str_file: str) -> str:
+        return os.path.join(self.tmp_dir.name, str_file)
+
+    def assert_same_index(self, index: FileIndex, expected_index: FileIndex):
+        self.assertEqual(index.document_count, expected_index.document_count)
+        self.assertCountEqual(index.vocabulary, expected_index.vocabulary)
+        for term in expected_index.vocabulary:
+            self.assertListEqual([(occur.doc_id, occur.term_freq) for occur in index.get_occurrence_list(term)],
+                                 [(occur.doc_id, occur.term_freq) for occur in expected_index.get_occurrence_list(term)])
+            self.assertEqual(index.document_count_with_term(term), expected_index.document_count_with_term(term))
+
+    def test_jsonl(self):
+        self.assertEqual(export_index(self.path("index.pickle"), self.path("index.jsonl")), 4)
+        with open(self.path("index.jsonl"), encoding="utf-8") as file:
+            lst_lines = [json.loads(line) for line in file]
+        self.assertDictEqual(lst_lines[0], {"term": "casa", "term_id": 0, "df": 2, "postings": [[1, 2], [2, 1]]})
+        self.assertEqual(lst_lines[2]["term"], "ação")
+
+        index = import_index(self.path("index.jsonl"), self.path("imported.pickle"))
+        self.assert_same_index(index, self.index)
+        self.assert_same_index(Index.load(self.path("imported.pickle")), self.index)
+
+    def test_binary(self):
+        self.assertEqual(export_index(self.path("index.pickle"), self.path("index.bin"), "binary"), 4)
+        index = import_index(self.path("index.bin"), self.path("imported.pickle"), "binary")
+        self.assert_same_index(index, self.index)
+
+    def test_deleted_docs_and_raw_idx_file(self):
+        self.index.delete_document(2)
+        self.assertListEqual([(term, lst_postings) for term, term_id, lst_postings in iter_index_postings(self.index)],
+                             [("casa", [(1, 2)]), ("verde", [(1, 1), (300, 2)]), ("ação", [(3, 4)])])
+
+        #o arquivo .idx avulso não tem os termos
+        export_index(self.index.str_idx_file_name, self.path("raw.jsonl"))
+        with open(self.path("raw.jsonl"), encoding="utf-8") as file:
+            dic_line = json.loads(file.readline())
+        self.assertIsNone(dic_line["term"])
+        self.assertRaises(ValueError, export_index, self.index.str_idx_file_name, self.path("raw.bin"), "binary")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,253 @@
+"""
+Conjunto compacto de doc_ids no estilo Roaring, usado na avaliação de
+consultas booleanas.
+
+Os doc_ids são divididos em blocos de 2^16 ids pelos 16 bits mais altos.
+Cada bloco não vazio guarda os 16 bits mais baixos em um container:
+
+    array:  array("H") ordenado, para blocos com até ARRAY_MAX_SIZE ids
+    bitset: um int do Python com 2^16 bits, para blocos mais densos
+
+AND/OR/ANDNOT entre dois bitsets são uma única operação sobre inteiros
+(&, |, & ~), executada em C sobre palavras de máquina, e a cardinalidade vem
+de int.bit_count. Containers array são combinados por intercalação ou por
+consulta ao bitset. Após cada operação o container é convertido para o tipo
+adequado à sua nova cardinalidade.
+"""
+from typing import Dict, Iterable, Iterator, List, Union
+from array import array
+import bisect
+import heapq
+
+CONTAINER_BITS = 16
+CONTAINER_SIZE = 1 << CONTAINER_BITS
+LOW_MASK = CONTAINER_SIZE - 1
+# um array com 4096 uint16 ocupa 8 KiB, o mesmo que um bitset
+ARRAY_MAX_SIZE = 4096
+FULL_BITSET = (1 << CONTAINER_SIZE) - 1
+
+# posições dos bits de cada byte, para converter um bitset em array
+BYTE_BITS = [tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+
+Container = Union[array, int]
+
+
+def array_to_bitset(arr_low: Iterable[int]) -> int:
+    arr_bytes = bytearray(CONTAINER_SIZE // 8)
+    for low in arr_low:
+        arr_bytes[low >> 3] |= 1 << (low & 7)
+    return int.from_bytes(arr_bytes, "little")
+
+
+def bitset_to_array(bitset: int) -> array:
+    arr_low = array("H")
+    for byte_pos, byte in enumerate(bitset.to_bytes(CONTAINER_SIZE // 8, "little")):
+        if byte:
+            base = byte_pos << 3
+            arr_low.extend(base + bit for bit in BYTE_BITS[byte])
+    return arr_low
+
+
+def container_size(container: Container) -> int:
+    return container.bit_count() if isinstance(container, int) else len(container)
+
+
+def optimize(container: Container) -> Container:
+    """Container com o tipo adequado à cardinalidade (None se estiver vazio)"""
+    if isinstance(container, int):
+        size = container.bit_count()
+        if size == 0:
+            return None
+        return bitset_to_array(container) if size <= ARRAY_MAX_SIZE else container
+    if not container:
+        return None
+    return array_to_bitset(container) if len(container) > ARRAY_MAX_SIZE else container
+
+
+def container_and(container: Container, other: Container) -> Container:
+    if isinstance(container, int) and isinstance(other, int):
+        return container & other
+    if isinstance(container, int):
+        container, other = other, container
+    if isinstance(other, int):
+        return array("H", (low for low in container if other >> low & 1))
+    if len(container) > len(other):
+        container, other = other, container
+    arr_low = array("H")
+    pos = 0
+    for low in container:
+        pos = bisect.bisect_left(other, low, pos)
+        if pos == len(other):
+            break
+        if other[pos] == low:
+            arr_low.append(low)
+    return arr_low
+
+
+def container_or(container: Container, other: Container) -> Container:
+    if isinstance(container, array) and isinstance(other, array):
+        if len(container) + len(other) <= ARRAY_MAX_SIZE:
+            arr_low = array("H")
+            previous = -1
+            for low in heapq.merge(container, other):
+                if low != previous:
+                    arr_low.append(low)
+                    previous = low
+            return arr_low
+    if isinstance(container, array):
+        container = array_to_bitset(container)
+    if isinstance(other, array):
+        other = array_to_bitset(other)
+    return container | other
+
+
+def container_andnot(container: Container, other: Container) -> Container:
+    if isinstance(container, int):
+        if isinstance(other, array):
+            other = array_to_bitset(other)
+        return container & ~other
+    if isinstance(other, int):
+        return array("H", (low for low in container if not other >> low & 1))
+    set_other = set(other)
+    return array("H", (low for low in container if low not in set_other))
+
+
+class RoaringBitmap:
+    def __init__(self, doc_ids: Iterable[int] = ()):
+        # bloco (16 bits mais altos) -> container
+        self.dic_containers: Dict[int, Container] = {}
+        self.add_many(doc_ids)
+
+    @classmethod
+    def from_containers(cls, dic_containers: Dict[int, Container]) -> "RoaringBitmap":
+        bitmap = cls()
+        bitmap.dic_containers = dic_containers
+        return bitmap
+
+    def add_many(self, doc_ids: Iterable[int]):
+        """Adiciona vários doc_ids; é mais rápido se eles vierem ordenados"""
+        dic_new = {}
+        for doc_id in doc_ids:
+            dic_new.setdefault(doc_id >> CONTAINER_BITS, []).append(doc_id & LOW_MASK)
+        for high, lst_low in dic_new.items():
+            container = array("H", sorted(set(lst_low)))
+            if high in self.dic_containers:
+                container = container_or(self.dic_containers[high], container)
+            self.dic_containers[high] = optimize(container)
+
+    def add(self, doc_id: int):
+        self.add_many((doc_id,))
+
+    def discard(self, doc_id: int):
+        high = doc_id >> CONTAINER_BITS
+        if high in self.dic_containers:
+            container = optimize(container_andnot(self.dic_containers[high], array("H", [doc_id & LOW_MASK])))
+            if container is None:
+                del self.dic_containers[high]
+            else:
+                self.dic_containers[high] = container
+
+    def clear(self):
+        self.dic_containers = {}
+
+    def __contains__(self, doc_id: int) -> bool:
+        container = self.dic_containers.get(doc_id >> CONTAINER_BITS)
+        if container is None:
+            return False
+        low = doc_id & LOW_MASK
+        if isinstance(container, int):
+            return container >> low & 1 == 1
+        pos = bisect.bisect_left(container, low)
+        return pos < len(container) and container[pos] == low
+
+    def __len__(self) -> int:
+        return sum(container_size(container) for container in self.dic_containers.values())
+
+    def __bool__(self) -> bool:
+        return bool(self.dic_containers)
+
+    def __iter__(self) -> Iterator[int]:
+        for high in sorted(self.dic_containers):
+            container = self.dic_containers[high]
+            if isinstance(container, int):
+                container = bitset_to_array(container)
+            base = high << CONTAINER_BITS
+            for low in container:
+                yield base + low
+
+    def to_list(self) -> List[int]:
+        return list(self)
+
+    def combine(self, other: "RoaringBitmap", operation, keep_missing_self: bool, keep_missing_other: bool) -> "RoaringBitmap":
+        dic_containers = {}
+        for high, container in self.dic_containers.items():
+            other_container = other.dic_containers.get(high)
+            if other_container is None:
+                if keep_missing_self:
+                    dic_containers[high] = container
+                continue
+            container = optimize(operation(container, other_container))
+            if container is not None:
+                dic_containers[high] = container
+        if keep_missing_other:
+            for high, container in other.dic_containers.items():
+                if high not in self.dic_containers:
+                    dic_containers[high] = container
+        return RoaringBitmap.from_containers(dic_containers)
+
+    def __and__(self, other: "RoaringBitmap") -> "RoaringBitmap":
+        if len(self.dic_containers) > len(other.dic_containers):
+            return other & self
+        return self.combine(other, container_and, False, False)
+
+    def __or__(self, other: "RoaringBitmap") -> "RoaringBitmap":
+        return self.combine(other, container_or, True, True)
+
+    def __sub__(self, other: "RoaringBitmap") -> "RoaringBitmap":
+        return self.combine(other, container_andnot, True, False)
+
+    def andnot(self, other: "RoaringBitmap") -> "RoaringBitmap":
+        return self - other
+
+    @staticmethod
+    def union_all(lst_bitmaps: Iterable["RoaringBitmap"]) -> "RoaringBitmap":
+        """OR de vários bitmaps, bloco a bloco (sem bitmaps intermediários)"""
+        dic_containers = {}
+        for bitmap in lst_bitmaps:
+            for high, container in bitmap.dic_containers.items():
+                if high in dic_containers:
+                    dic_containers[high] = container_or(dic_containers[high], container)
+                else:
+                    dic_containers[high] = container
+        return RoaringBitmap.from_containers({high: optimize(container) for high, container in dic_containers.items()})
+
+    @staticmethod
+    def intersection_all(lst_bitmaps: Iterable["RoaringBitmap"]) -> "RoaringBitmap":
+        """AND de vários bitmaps, do menor para o maior, parando quando o resultado fica vazio"""
+        lst_bitmaps = sorted(lst_bitmaps, key=len)
+        if not lst_bitmaps:
+            return RoaringBitmap()
+        result = lst_bitmaps[0]
+        for bitmap in lst_bitmaps[1:]:
+            if not result:
+                break
+            result = result & bitmap
+        return result
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, RoaringBitmap):
+            return NotImplemented
+        # o tipo de cada container depende só da cardinalidade, então basta comparar os containers
+        return self.dic_containers == other.dic_containers
+
+    @property
+    def nbytes(self) -> int:
+        """Tamanho aproximado dos containers, em bytes"""
+        return sum(CONTAINER_SIZE // 8 if isinstance(container, int) else 2 * len(container)
+                   for container in self.dic_containers.values())
+
+    def __str__(self):
+        return f"RoaringBitmap({self.to_list()})"
+
+    def __repr__(self):
+        return str(self)
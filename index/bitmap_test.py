@@ -0,0 +1,121 @@
+from index.bitmap import RoaringBitmap, ARRAY_MAX_SIZE, array_to_bitset, bitset_to_array
+from index.structure import FileIndex, HashIndex, Index
+from random import randrange, sample, seed
+from array import array
+import os
+import pickle
+import tempfile
+import unittest
+
+
+class RoaringBitmapTest(unittest.TestCase):
+    def setUp(self):
+        seed(42)
+        #blocos esparsos, um bloco denso (bitset) e ids acima de 2^32
+        self.lst_sets = [set(sample(range(200000), 300)),
+                         set(range(70000, 70000 + 3 * ARRAY_MAX_SIZE)) | {5, 2 ** 33},
+                         set(randrange(0, 140000) for i in range(9000)),
+                         set()]
+
+    def test_container_conversion(self):
+        arr_low = array("H", [0, 7, 8, 65535])
+        self.assertEqual(bitset_to_array(array_to_bitset(arr_low)), arr_low)
+        self.assertEqual(array_to_bitset(arr_low).bit_count(), 4)
+
+    def test_membership(self):
+        for set_docs in self.lst_sets:
+            bitmap = RoaringBitmap(set_docs)
+            self.assertEqual(len(bitmap), len(set_docs))
+            self.assertListEqual(list(bitmap), sorted(set_docs))
+            self.assertEqual(bool(bitmap), bool(set_docs))
+            for doc_id in list(set_docs)[:50]:
+                self.assertIn(doc_id, bitmap)
+            self.assertNotIn(2 ** 34, bitmap)
+
+        bitmap = RoaringBitmap(self.lst_sets[1])
+        self.assertTrue(any(isinstance(container, int) for container in bitmap.dic_containers.values()))
+        self.assertLess(bitmap.nbytes, 8 * len(self.lst_sets[1]))
+        bitmap.discard(5)
+        bitmap.discard(70000)
+        bitmap.discard(6)
+        self.assertEqual(bitmap, RoaringBitmap(self.lst_sets[1] - {5, 70000}))
+        bitmap.add(5)
+        self.assertIn(5, bitmap)
+        bitmap.clear()
+        self.assertFalse(bitmap)
+        self.assertEqual(len(bitmap), 0)
+
+    def test_operations(self):
+        for set_a in self.lst_sets:
+            for set_b in self.lst_sets:
+                bitmap_a, bitmap_b = RoaringBitmap(set_a), RoaringBitmap(set_b)
+                self.assertListEqual((bitmap_a & bitmap_b).to_list(), sorted(set_a & set_b))
+                self.assertListEqual((bitmap_a | bitmap_b).to_list(), sorted(set_a | set_b))
+                self.assertListEqual((bitmap_a - bitmap_b).to_list(), sorted(set_a - set_b))
+                #o resultado tem a mesma representação de um bitmap criado diretamente
+                self.assertEqual(bitmap_a & bitmap_b, RoaringBitmap(set_a & set_b))
+                self.assertEqual(bitmap_a | bitmap_b, RoaringBitmap(set_a | set_b))
+                self.assertEqual(bitmap_a.andnot(bitmap_b), RoaringBitmap(set_a - set_b))
+
+        lst_bitmaps = [RoaringBitmap(set_docs) for set_docs in self.lst_sets[:3]]
+        self.assertListEqual(RoaringBitmap.union_all(lst_bitmaps).to_list(), sorted(set.union(*self.lst_sets[:3])))
+        self.assertListEqual(RoaringBitmap.intersection_all(lst_bitmaps).to_list(), sorted(set.intersection(*self.lst_sets[:3])))
+        self.assertListEqual(RoaringBitmap.intersection_all([]).to_list(), [])
+
+    def test_pickle(self):
+        bitmap = RoaringBitmap(self.lst_sets[1])
+        self.assertEqual(pickle.loads(pickle.dumps(bitmap)), bitmap)
+
+    def test_index_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index = FileIndex(os.path.join(tmp_dir, "occur_index_bitmap"))
+            index.enable_bitmap_cache(min_doc_count=3)
+            for doc_id in range(1, 6):
+                index.index("casa", doc_id, 1)
+                if doc_id % 2:
+                    index.index("verde", doc_id, 1)
+            index.index("azul", 2, 1)
+            index.finish_indexing()
+            self.assertSetEqual(set(index.bitmap_cache), {"casa", "verde"})
+
+            str_file = os.path.join(tmp_dir, "index.pickle")
+            index.save(str_file)
+            index = Index.load(str_file)
+            self.assertListEqual(index.get_doc_id_bitmap("verde").to_list(), [1, 3, 5])
+            self.assertListEqual(index.get_doc_id_bitmap("azul").to_list(), [2])
+            self.assertListEqual(index.get_doc_id_bitmap("crocodilo").to_list(), [])
+            index.delete_document(3)
+            self.assertIsInstance(index.deleted_docs, RoaringBitmap)
+            self.assertListEqual(index.get_doc_id_bitmap("verde").to_list(), [1, 5])
+            self.assertListEqual(index.get_doc_id_bitmap("casa").to_list(), [1, 2, 4, 5])
+
+        index = HashIndex()
+        index.index("casa", 1, 1)
+        index.finish_indexing()
+        self.assertIsNone(index.bitmap_cache)
+        self.assertListEqual(index.get_doc_id_bitmap("casa").to_list(), [1])
+
+    def test_index_cache_invalidation(self):
+        #indexar ou compactar depois do finish_indexing descarta os bitmaps até o proximo finish_indexing
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for index in [HashIndex(), FileIndex(os.path.join(tmp_dir, "occur_index_bitmap"))]:
+                index.enable_bitmap_cache(min_doc_count=1)
+                index.index("casa", 1, 1)
+                index.index("casa", 2, 1)
+                index.finish_indexing()
+                index.update_document(1, {"verde": 2})
+                index.index("casa", 3, 1)
+                self.assertIsNone(index.bitmap_cache)
+                self.assertListEqual(index.get_doc_id_bitmap("casa").to_list(),
+                                     [occur.doc_id for occur in index.get_occurrence_list("casa")])
+                index.finish_indexing()
+                self.assertListEqual(index.get_doc_id_bitmap("casa").to_list(), [2, 3])
+                self.assertListEqual(index.get_doc_id_bitmap("verde").to_list(), [1])
+
+                index.delete_document(2)
+                index.compact()
+                self.assertListEqual(index.get_doc_id_bitmap("casa").to_list(), [3])
+
+
+if __name__ == "__main__":
+    unittest.main()
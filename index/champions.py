@@ -0,0 +1,84 @@
+"""
+Champion lists: para cada termo, apenas as `r` ocorrências de maior
+impacto, ordenadas por doc_id. Consultas que aceitam um ranking aproximado
+pontuam primeiro só essas ocorrências (QueryRunner.get_docs_term_top_k) e
+só recorrem às listas completas quando elas não rendem k documentos.
+
+Impacto:
+    tf:     frequência do termo no documento
+    impact: peso tf-idf da ocorrência dividido pela norma do documento
+            (exige document_norm, ex.: IndexPreComputedVals.document_norm)
+
+Cada lista (ChampionList) guarda o df da lista completa em
+`doc_count_with_term`, usado pelos modelos no lugar do tamanho da lista para
+que o idf seja o mesmo da consulta exaustiva.
+"""
+from typing import Iterable, Mapping
+import heapq
+import math
+
+from util.metrics import metrics
+
+IMPACTS = ("tf", "impact")
+
+
+class ChampionList(list):
+    def __init__(self, lst_occurrences: Iterable = (), doc_count_with_term: int = 0):
+        super().__init__(lst_occurrences)
+        self.doc_count_with_term = doc_count_with_term
+
+
+class ChampionLists:
+    def __init__(self, r: int = 50, impact: str = "tf"):
+        if impact not in IMPACTS:
+            raise ValueError(f"Impacto desconhecido: {impact} (use {', '.join(IMPACTS)})")
+        self.r = r
+        self.impact = impact
+        self.dic_lists = {}
+
+    @classmethod
+    @metrics.timed("champions.build")
+    def build(cls, index, r: int = 50, impact: str = "tf", document_norm: Mapping[int, float] = None) -> "ChampionLists":
+        champion_lists = cls(r, impact)
+        if impact == "impact" and document_norm is None:
+            raise ValueError("O impacto tf-idf precisa da norma dos documentos (document_norm)")
+        doc_count = index.document_count
+        for term in index.vocabulary:
+            lst_occurrences = index.get_occurrence_list(term)
+            if not lst_occurrences:
+                continue
+            if impact == "tf":
+                key = lambda occur: occur.term_freq
+            else:
+                idf = math.log(doc_count / len(lst_occurrences), 2)
+                key = lambda occur: (1 + math.log(occur.term_freq, 2)) * idf / (document_norm.get(occur.doc_id) or 1)
+            lst_top = heapq.nlargest(r, lst_occurrences, key=key)
+            lst_top.sort(key=lambda occur: occur.doc_id)
+            champion_lists.dic_lists[term] = ChampionList(lst_top, len(lst_occurrences))
+        return champion_lists
+
+    def __contains__(self, term: str) -> bool:
+        return term in self.dic_lists
+
+    def get_occurrence_list(self, term: str, deleted_docs=None) -> ChampionList:
+        champion_list = self.dic_lists.get(term)
+        if champion_list is None:
+            return ChampionList()
+        if not deleted_docs:
+            return champion_list
+        # o df continua o da construção: as remoções só mudam o idf após finish_indexing
+        return ChampionList((occur for occur in champion_list if occur.doc_id not in deleted_docs),
+                            champion_list.doc_count_with_term)
+
+
+def recall_at_k(query_runner, queries: Iterable[str], k: int = 10) -> Mapping[str, float]:
+    """
+    Fração do top-k exaustivo (get_docs_term) que também está no top-k
+    aproximado (get_docs_term_top_k) de cada consulta
+    """
+    dic_recall = {}
+    for query in queries:
+        lst_exact = list(query_runner.get_docs_term(query)[0])[:k]
+        lst_approx = list(query_runner.get_docs_term_top_k(query, k)[0])[:k]
+        dic_recall[query] = len(set(lst_exact) & set(lst_approx)) / len(lst_exact) if lst_exact else 1.0
+    return dic_recall
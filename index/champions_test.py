@@ -0,0 +1,111 @@
+from index.champions import ChampionLists, ChampionList, recall_at_k
+from index.structure import HashIndex, FileIndex
+from index.indexer import Cleaner
+from query.processing import QueryRunner
+from query.ranking_models import IndexPreComputedVals, VectorRankingModel
+from random import randrange, seed
+import os
+import tempfile
+import unittest
+
+
+class ChampionListsTest(unittest.TestCase):
+    def setUp(self):
+        seed(17)
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.index = FileIndex(os.path.join(self.tmp_dir.name, "occur_index_champions"))
+        self.index.enable_champion_lists(r=5)
+        vocabulary = ["casa", "verde", "azul", "predio", "rua", "janela", "porta", "xicara"]
+        for doc_id in range(1, 61):
+            for term in set(vocabulary[randrange(len(vocabulary))] for i in range(4)):
+                self.index.index(term, doc_id, randrange(1, 10))
+        self.index.finish_indexing()
+        cleaner = Cleaner(stop_words_file="stopwords.txt",language="portuguese",
+                        perform_stop_words_removal=False,perform_accents_removal=False,
+                        perform_stemming=False)
+        self.query_runner = QueryRunner(VectorRankingModel(IndexPreComputedVals(self.index)), self.index, cleaner)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_build(self):
+        champion_lists = self.index.champion_lists
+        for term in self.index.vocabulary:
+            lst_occurrences = self.index.get_occurrence_list(term)
+            champion_list = champion_lists.get_occurrence_list(term)
+            self.assertEqual(len(champion_list), min(5, len(lst_occurrences)))
+            self.assertEqual(champion_list.doc_count_with_term, len(lst_occurrences))
+            self.assertListEqual([occur.doc_id for occur in champion_list], sorted(occur.doc_id for occur in champion_list))
+            lst_freqs = sorted((occur.term_freq for occur in lst_occurrences), reverse=True)
+            self.assertGreaterEqual(min(occur.term_freq for occur in champion_list), lst_freqs[len(champion_list) - 1])
+        self.assertListEqual(champion_lists.get_occurrence_list("crocodilo"), [])
+
+        precomp = IndexPreComputedVals(self.index)
+        champion_lists = ChampionLists.build(self.index, r=3, impact="impact", document_norm=precomp.document_norm)
+        self.assertEqual(len(champion_lists.get_occurrence_list("casa")), 3)
+        self.assertRaises(ValueError, ChampionLists.build, self.index, 3, "impact")
+        self.assertRaises(ValueError, ChampionLists, 3, "xpto")
+
+    def test_impact_built_in_finish_indexing(self):
+        index = HashIndex()
+        index.enable_champion_lists(r=1, impact="impact")
+        #doc 1 tem o maior tf de "casa", mas o doc 2 é curto: maior peso normalizado
+        index.index("casa", 1, 4)
+        index.index("verde", 1, 8)
+        index.index("azul", 1, 8)
+        index.index("casa", 2, 2)
+        index.index("verde", 3, 1)
+        index.finish_indexing()
+        self.assertEqual(index.champion_lists.impact, "impact")
+        self.assertListEqual([occur.doc_id for occur in index.champion_lists.get_occurrence_list("casa")], [2])
+
+        expected = ChampionLists.build(index, 1, "impact", IndexPreComputedVals(index).document_norm)
+        for term in index.vocabulary:
+            self.assertListEqual([occur.doc_id for occur in index.champion_lists.get_occurrence_list(term)],
+                                 [occur.doc_id for occur in expected.get_occurrence_list(term)])
+        self.assertRaises(ValueError, index.enable_champion_lists, 1, "xpto")
+
+    def test_deleted_docs(self):
+        champion_list = self.index.champion_lists.get_occurrence_list("casa")
+        doc_id = champion_list[0].doc_id
+        self.index.delete_document(doc_id)
+        champion_list = self.index.champion_lists.get_occurrence_list("casa", self.index.deleted_docs)
+        self.assertNotIn(doc_id, [occur.doc_id for occur in champion_list])
+        self.assertNotIn(doc_id, self.query_runner.get_docs_term_top_k("casa", 3)[0])
+
+    def test_top_k_and_recall(self):
+        #com df e normas da coleção inteira, cada parcela do peso é a exata; falta
+        #apenas a dos termos em cuja champion list o documento não está
+        lst_docs, dic_weights = self.query_runner.get_docs_term_top_k("casa verde", 5)
+        lst_exact, dic_exact = self.query_runner.get_docs_term("casa verde")
+        for doc_id in lst_docs:
+            self.assertLessEqual(dic_weights[doc_id], dic_exact[doc_id] + 1e-9)
+        self.assertLessEqual(len(lst_docs), 10)
+        #documento com maior tf em ambos os termos aparece nas duas listas: peso exato
+        doc_id = lst_docs[0]
+        if all(doc_id in [occur.doc_id for occur in self.index.champion_lists.get_occurrence_list(term)] for term in ("casa", "verde")):
+            self.assertAlmostEqual(dic_weights[doc_id], dic_exact[doc_id])
+
+        #menos de k candidatos: usa as listas completas
+        self.assertListEqual(self.query_runner.get_docs_term_top_k("casa", 20)[0], self.query_runner.get_docs_term("casa")[0])
+
+        lst_queries = ["casa", "casa verde", "porta azul rua"]
+        dic_recall = recall_at_k(self.query_runner, lst_queries, k=5)
+        self.assertTrue(all(0 <= recall <= 1 for recall in dic_recall.values()))
+
+        #listas com todas as ocorrências: o ranking aproximado é o exato
+        self.index.champion_lists = ChampionLists.build(self.index, r=100)
+        self.assertDictEqual(recall_at_k(self.query_runner, lst_queries, k=5), {query: 1.0 for query in lst_queries})
+
+    def test_hash_index(self):
+        index = HashIndex()
+        index.enable_champion_lists(r=1)
+        index.index("casa", 1, 1)
+        index.index("casa", 2, 3)
+        index.finish_indexing()
+        self.assertListEqual([occur.doc_id for occur in index.champion_lists.get_occurrence_list("casa")], [2])
+        self.assertIsInstance(index.champion_lists.get_occurrence_list("casa"), ChampionList)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,197 @@
+"""
+Detecção de documentos quase duplicados durante a indexação (MinHash + LSH).
+
+Cada documento é reduzido ao conjunto dos seus shingles (sequências de
+`shingle_size` palavras, em minúsculas). A assinatura MinHash usa uma única
+função de hash (one permutation hashing): h(x) mod num_perm escolhe uma das
+`num_perm` posições e cada posição guarda o menor h(x) que caiu nela, então
+o custo é um hash por shingle, e não num_perm. Posições vazias são
+preenchidas a partir da próxima posição não vazia (densificação). A fração
+de posições iguais em duas assinaturas estima a similaridade de Jaccard
+entre os documentos.
+
+Para não comparar o documento novo com todos os anteriores, a assinatura é
+dividida em `bands` faixas de num_perm / bands valores (LSH): só são
+candidatos os documentos que têm alguma faixa idêntica. Com b faixas de r
+valores, a probabilidade de dois documentos com similaridade s serem
+candidatos é 1 - (1 - s^r)^b, que sobe bruscamente perto de (1/b)^(1/r)
+(~0.71 com os valores padrão). Os candidatos só são considerados duplicados
+se a similaridade estimada for >= threshold.
+
+O primeiro documento de um grupo é o único indexado; os demais ficam na
+tabela `dic_duplicate_of` (doc_id duplicado -> doc_id indexado), salva junto
+com o índice (Index.dic_duplicate_of). Como o texto de um duplicado não é
+tokenizado, as ocorrências economizadas são estimadas pelas do documento
+indexado do grupo: mesmos term_ids e frequências, gravadas com o doc_id do
+duplicado. Os bytes economizados são o tamanho dessas ocorrências no arquivo
+do FileIndex (TermOccurrence.write), medido com pickle.
+"""
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from random import Random
+import pickle
+import re
+import zlib
+
+from util.metrics import metrics
+
+# primo de Mersenne 2^61 - 1, módulo das funções de hash
+HASH_PRIME = (1 << 61) - 1
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def shingles(text: str, shingle_size: int = 5) -> Set[int]:
+    """Hashes (crc32) das sequências de shingle_size palavras do texto"""
+    lst_words = WORD_PATTERN.findall(text.lower())
+    if len(lst_words) <= shingle_size:
+        return {zlib.crc32(" ".join(lst_words).encode("utf-8"))} if lst_words else set()
+    return {zlib.crc32(" ".join(lst_words[i:i + shingle_size]).encode("utf-8"))
+            for i in range(len(lst_words) - shingle_size + 1)}
+
+
+# o pickle de um int depende só da sua quantidade de bits: tamanho medido
+# da ocorrência por (bits do doc_id, do term_id, da frequência)
+_dic_occurrence_bytes = {}
+
+
+def occurrence_file_bytes(doc_id: int, term_id: int, term_freq: int) -> int:
+    """Bytes da ocorrência no arquivo do FileIndex (TermOccurrence.write)"""
+    key = (doc_id.bit_length(), term_id.bit_length(), term_freq.bit_length())
+    size = _dic_occurrence_bytes.get(key)
+    if size is None:
+        from index.structure import TermOccurrence
+        size = _dic_occurrence_bytes[key] = len(pickle.dumps(TermOccurrence(doc_id, term_id, term_freq)))
+    return size
+
+
+class MinHash:
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        random = Random(seed)
+        self.num_perm = num_perm
+        self.a = random.randrange(1, HASH_PRIME)
+        self.b = random.randrange(0, HASH_PRIME)
+        self.c = random.randrange(1, HASH_PRIME)
+
+    def hash_values(self, set_shingles: Iterable[int]) -> List[int]:
+        # (a * x + b) mod P seguido de xor-shift e de outra multiplicação: só a
+        # função afim deixa shingles próximos em posições correlacionadas
+        a, b, c = self.a, self.b, self.c
+        return [c * (value ^ (value >> 31)) % HASH_PRIME
+                for value in [(a * shingle + b) % HASH_PRIME for shingle in set_shingles]]
+
+    def signature(self, set_shingles: Iterable[int]) -> tuple:
+        num_perm = self.num_perm
+        # em ordem decrescente, o último valor gravado em cada posição é o menor
+        lst_values = sorted(self.hash_values(set_shingles), reverse=True)
+        if not lst_values:
+            raise ValueError("Não há assinatura MinHash de um conjunto vazio")
+        dic_bins = {value % num_perm: value for value in lst_values}
+        if len(dic_bins) == num_perm:
+            return tuple(dic_bins[pos] for pos in range(num_perm))
+
+        # densificação: a posição vazia recebe o valor da próxima não vazia
+        # (circularmente) somado a distância * P, que nenhum hash atinge
+        lst_signature = [None] * num_perm
+        next_value, distance = None, 0
+        for pos in range(2 * num_perm - 1, -1, -1):
+            value = dic_bins.get(pos % num_perm)
+            if value is None:
+                distance += 1
+            else:
+                next_value, distance = value, 0
+            if pos < num_perm:
+                lst_signature[pos] = next_value + distance * HASH_PRIME
+        return tuple(lst_signature)
+
+    @staticmethod
+    def similarity(signature_a: tuple, signature_b: tuple) -> float:
+        """Estimativa da similaridade de Jaccard entre os conjuntos das duas assinaturas"""
+        return sum(1 for value_a, value_b in zip(signature_a, signature_b) if value_a == value_b) / len(signature_a)
+
+
+class NearDuplicateDetector:
+    def __init__(self, threshold: float = 0.8, num_perm: int = 128, bands: int = 16,
+                 shingle_size: int = 5, seed: int = 1):
+        if num_perm % bands != 0:
+            raise ValueError("num_perm deve ser múltiplo de bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.minhash = MinHash(num_perm, seed)
+
+        # (faixa, valores da faixa) -> doc_ids indexados com essa faixa
+        self.dic_buckets = {}
+        self.dic_signatures = {}
+        self.dic_duplicate_of = {}
+        # doc_id indexado -> (ocorrências, bytes delas no arquivo) (add_postings)
+        self.dic_postings = {}
+        self.document_count = 0
+
+    def band_keys(self, signature: tuple) -> List[tuple]:
+        return [(band, signature[band * self.rows:(band + 1) * self.rows]) for band in range(self.bands)]
+
+    def find_duplicate(self, signature: tuple) -> Optional[int]:
+        """Documento indexado mais parecido com a assinatura, se a similaridade for >= threshold"""
+        set_candidates = set()
+        for key in self.band_keys(signature):
+            set_candidates.update(self.dic_buckets.get(key, ()))
+        metrics.inc("dedup.candidates", len(set_candidates))
+        best_doc_id, best_similarity = None, self.threshold
+        for doc_id in sorted(set_candidates):
+            similarity = MinHash.similarity(signature, self.dic_signatures[doc_id])
+            if similarity >= best_similarity:
+                best_doc_id, best_similarity = doc_id, similarity
+        return best_doc_id
+
+    def check(self, doc_id: int, text: str) -> Optional[int]:
+        """
+        Registra o documento e retorna o doc_id indexado do qual ele é quase
+        duplicado (ele não deve ser indexado), ou None se ele é novo.
+        """
+        self.document_count += 1
+        set_shingles = shingles(text, self.shingle_size)
+        if not set_shingles:
+            return None
+        with metrics.span("dedup.signature"):
+            signature = self.minhash.signature(set_shingles)
+        original_doc_id = self.find_duplicate(signature)
+        if original_doc_id is not None:
+            self.dic_duplicate_of[doc_id] = original_doc_id
+            metrics.inc("dedup.duplicates")
+            return original_doc_id
+        self.dic_signatures[doc_id] = signature
+        for key in self.band_keys(signature):
+            self.dic_buckets.setdefault(key, []).append(doc_id)
+        return None
+
+    def add_postings(self, doc_id: int, lst_postings: Iterable[Tuple[int, int]]):
+        """Registra as ocorrências (term_id, term_freq) gravadas para o documento indexado"""
+        count, size = 0, 0
+        for term_id, term_freq in lst_postings:
+            count += 1
+            size += occurrence_file_bytes(doc_id, term_id, term_freq)
+        self.dic_postings[doc_id] = (count, size)
+
+    def duplicate_groups(self) -> Dict[int, List[int]]:
+        """doc_id indexado -> doc_ids dos seus duplicados"""
+        dic_groups = {}
+        for doc_id, original_doc_id in sorted(self.dic_duplicate_of.items()):
+            dic_groups.setdefault(original_doc_id, []).append(doc_id)
+        return dic_groups
+
+    def report(self) -> dict:
+        postings_indexed = sum(count for count, size in self.dic_postings.values())
+        postings_saved, bytes_saved = 0, 0
+        for doc_id, original_doc_id in self.dic_duplicate_of.items():
+            count, size = self.dic_postings.get(original_doc_id, (0, 0))
+            postings_saved += count
+            # as mesmas ocorrências, com o doc_id do duplicado no lugar do original
+            bytes_saved += size + count * (occurrence_file_bytes(doc_id, 0, 0) - occurrence_file_bytes(original_doc_id, 0, 0))
+        total = postings_indexed + postings_saved
+        return {"documents": self.document_count,
+                "duplicates": len(self.dic_duplicate_of),
+                "duplicate_groups": len(self.duplicate_groups()),
+                "postings_indexed": postings_indexed,
+                "postings_saved": postings_saved,
+                "postings_reduction": postings_saved / total if total else 0.0,
+                "index_bytes_saved": bytes_saved}
@@ -0,0 +1,87 @@
+from index.dedup import MinHash, NearDuplicateDetector, shingles
+from index.indexer import HTMLIndexer
+from index.structure import HashIndex, TermOccurrence
+from collections import Counter
+from random import Random
+import pickle
+import unittest
+
+
+class SplitIndexer(HTMLIndexer):
+    """Tokeniza por espaços (sem o nltk)"""
+    def text_word_count(self, plain_text: str):
+        return dict(Counter(plain_text.lower().split()))
+
+
+class DedupTest(unittest.TestCase):
+    def setUp(self):
+        random = Random(5)
+        vocabulary = [f"palavra{i}" for i in range(300)]
+        self.lst_texts = [" ".join(random.choice(vocabulary) for j in range(200)) for i in range(5)]
+
+    def test_similarity(self):
+        minhash = MinHash(num_perm=256)
+        set_a = set(range(0, 1000))
+        set_b = set(range(200, 1200))
+        jaccard = len(set_a & set_b) / len(set_a | set_b)
+        self.assertAlmostEqual(MinHash.similarity(minhash.signature(set_a), minhash.signature(set_b)), jaccard, delta=0.1)
+        self.assertEqual(MinHash.similarity(minhash.signature(set_a), minhash.signature(set_a)), 1.0)
+
+        #menos shingles que posições: as vazias são preenchidas (densificação)
+        minhash = MinHash(num_perm=128)
+        signature = minhash.signature({10, 20, 30})
+        self.assertEqual(len(signature), 128)
+        self.assertEqual(signature, minhash.signature({30, 20, 10}))
+        self.assertLess(MinHash.similarity(signature, minhash.signature({40, 50, 60})), 0.2)
+        self.assertRaises(ValueError, minhash.signature, set())
+
+    def test_shingles(self):
+        self.assertEqual(len(shingles("a b c d e f g", 5)), 3)
+        self.assertEqual(shingles("A, b!", 5), shingles("a b", 5))
+        self.assertSetEqual(shingles("", 5), set())
+
+    def test_check(self):
+        detector = NearDuplicateDetector(threshold=0.8)
+        for doc_id, text in enumerate(self.lst_texts, 1):
+            self.assertIsNone(detector.check(doc_id, text))
+        # mesmo texto com uma palavra trocada no final: quase duplicado
+        near_duplicate = self.lst_texts[1].rsplit(" ", 1)[0] + " diferente"
+        self.assertEqual(detector.check(10, near_duplicate), 2)
+        self.assertEqual(detector.check(11, self.lst_texts[1]), 2)
+        # metade do texto: abaixo do limiar
+        half = " ".join(self.lst_texts[3].split()[:100])
+        self.assertIsNone(detector.check(12, half))
+        self.assertDictEqual(detector.duplicate_groups(), {2: [10, 11]})
+
+    def test_index_text(self):
+        index = HashIndex()
+        detector = NearDuplicateDetector(threshold=0.8)
+        indexer = SplitIndexer(index, dedup=detector)
+        for doc_id, text in enumerate(self.lst_texts, 1):
+            indexer.index_text(doc_id, f"<html><body><p>{text}</p></body></html>")
+        indexer.index_text(6, f"<html><body><h1>Cópia</h1><p>{self.lst_texts[0]}</p></body></html>")
+
+        self.assertEqual(index.document_count, 5)
+        self.assertNotIn(6, index.set_documents)
+        self.assertDictEqual(index.dic_duplicate_of, {6: 1})
+
+        dic_report = detector.report()
+        self.assertEqual(dic_report["documents"], 6)
+        self.assertEqual(dic_report["duplicates"], 1)
+        self.assertEqual(dic_report["postings_saved"], len(set(self.lst_texts[0].split())))
+        self.assertEqual(dic_report["postings_indexed"], sum(len(occurrences) for occurrences in index.dic_index.values()))
+        #as ocorrências do doc 1, gravadas com o doc_id do duplicado
+        lst_original = [occur for occurrences in index.dic_index.values() for occur in occurrences if occur.doc_id == 1]
+        self.assertEqual(dic_report["index_bytes_saved"],
+                         sum(len(pickle.dumps(TermOccurrence(6, occur.term_id, occur.term_freq))) for occur in lst_original))
+
+        #doc_ids e term_ids grandes ocupam mais bytes no arquivo
+        indexer.index_text(100000, f"<html><body><p>{self.lst_texts[0]}</p></body></html>")
+        bytes_saved = detector.report()["index_bytes_saved"] - dic_report["index_bytes_saved"]
+        self.assertEqual(bytes_saved, sum(len(pickle.dumps(TermOccurrence(100000, occur.term_id, occur.term_freq)))
+                                          for occur in lst_original))
+        self.assertGreater(bytes_saved, dic_report["index_bytes_saved"])
+
+
+if __name__ == "__main__":
+    unittest.main()
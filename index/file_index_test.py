@@ -1,4 +1,6 @@
 from .structure import *
+import os
+import tempfile
 import unittest
 from .index_structure_test import StructureTest
 from .performance_test import PerformanceTest
@@ -109,6 +111,45 @@ class FileIndexTest(unittest.TestCase):
         arr_doc_por_termo = [3,3,1,2]
         [self.assertEqual(self.index.dic_index[arr_termos[i]].doc_count_with_term,arr_doc_por_termo[i],f"A quantidade de documentos que possuem o termo de id {self.index.dic_index[arr_termos[i]].term_id} seria {arr_doc_por_termo[i]} e não {self.index.dic_index[arr_termos[i]].doc_count_with_term}") for i in range(4)]
 
+    def test_memory_budget(self):
+        #orçamento para 10 ocorrências: grava em disco a cada 10 ocorrências indexadas
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.index = FileIndex(os.path.join(tmp_dir, "occur_index_budget"), memory_budget=10 * FileIndex.OCCURRENCE_BYTES)
+            self.assertEqual(self.index.memory_budget, 10 * FileIndex.OCCURRENCE_BYTES)
+            self.assertEqual(FileIndex().memory_budget, FileIndex.DEFAULT_MEMORY_BUDGET)
+            for doc_id in range(1, 26):
+                self.index.index("casa", doc_id, 1)
+                self.assertLess(len(self.index.lst_occurrences_tmp), 10)
+            self.assertEqual(self.index.idx_file_counter, 1)
+            self.assertEqual(self.index.tmp_occurrences_bytes, 5 * FileIndex.OCCURRENCE_BYTES)
+            self.assertEqual(self.index.peak_tmp_occurrences_bytes, 10 * FileIndex.OCCURRENCE_BYTES)
+
+            self.index.delete_document(25)
+            self.assertEqual(self.index.tmp_occurrences_bytes, 4 * FileIndex.OCCURRENCE_BYTES)
+            self.index.finish_indexing()
+            self.assertEqual(self.index.tmp_occurrences_bytes, 0)
+            self.assertListEqual([occur.doc_id for occur in self.index.get_occurrence_list("casa")], list(range(1, 25)))
+        self.assertGreater(FileIndex.OCCURRENCE_BYTES, 0)
+
+    def test_load_from_other_directory(self):
+        #o índice salvo com um prefixo relativo abre a partir de outro diretório
+        str_cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            try:
+                os.chdir(tmp_dir)
+                index = FileIndex("occur_index_relative")
+                index.index("casa", 1, 2)
+                index.index("casa", 3, 1)
+                index.finish_indexing()
+                index.save("index.pickle")
+                os.mkdir("outro")
+                os.chdir("outro")
+                index = Index.load(os.path.join(tmp_dir, "index.pickle"))
+                self.assertListEqual([occur.doc_id for occur in index.get_occurrence_list("casa")], [1, 3])
+                self.assertTrue(os.path.isabs(index.str_idx_file_name))
+            finally:
+                os.chdir(str_cwd)
+
 
 
 
@@ -59,6 +59,30 @@ class StructureTest(unittest.TestCase):
         list_occur = self.index.get_occurrence_list('xuxu')
         self.assertListEqual(list_occur,[],"O termo xuxu não existe, deveria retornar lista vazia")
 
+    def test_delete_and_update_document(self):
+        self.assertTrue(self.index.delete_document(2))
+        self.assertFalse(self.index.delete_document(2), "O documento 2 já foi removido")
+        self.assertFalse(self.index.delete_document(42), "O documento 42 não existe")
+
+        self.assertEqual(2,self.index.document_count)
+        self.assertEqual(1,self.index.document_count_with_term("casa"), "Casa continua apenas no doc. 1")
+        self.assertEqual(2,self.index.document_count_with_term("vermelho"))
+        self.assertListEqual([occur.doc_id for occur in self.index.get_occurrence_list("vermelho")], [1,3])
+
+        self.index.compact()
+        self.assertEqual(0,len(self.index.deleted_docs), "O compact deveria descartar as marcas de remoção")
+        self.assertEqual(1,self.index.document_count_with_term("casa"))
+        self.assertListEqual([occur.doc_id for occur in self.index.get_occurrence_list("vermelho")], [1,3])
+
+        #doc. 3 passa a ter apenas "casa" (2x) e "amarelo" (1x)
+        self.index.update_document(3, {"casa":2, "amarelo":1})
+        self.index.finish_indexing()
+        self.assertEqual(2,self.index.document_count)
+        self.assertDictEqual({occur.doc_id:occur.term_freq for occur in self.index.get_occurrence_list("casa")}, {1:10, 3:2})
+        self.assertListEqual([occur.doc_id for occur in self.index.get_occurrence_list("vermelho")], [1])
+        self.assertListEqual([occur.doc_id for occur in self.index.get_occurrence_list("amarelo")], [3])
+        self.assertEqual(self.index.get_term_id("casa"), self.index.get_occurrence_list("casa")[0].term_id)
+
 class FileStructureTest(StructureTest):
     def setUp(self):
         self.index = FileIndex()
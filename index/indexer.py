@@ -1,19 +1,42 @@
-from datetime import datetime
-
-from nltk.stem.snowball import SnowballStemmer
-from bs4 import BeautifulSoup
+from typing import List
 import string
-from nltk.tokenize import word_tokenize
 import os
 
+from util.metrics import metrics
+from util.profiling import profiler
+
+# nltk e BeautifulSoup só são importados no primeiro uso (tokenização,
+# stemming e leitura do HTML), para que processos que apenas consultam não
+# paguem esse custo
+
+# diretório do repositório, onde ficam os arquivos de dados (ex.: stopwords.txt)
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_STOP_WORDS_FILE = os.path.join(DATA_DIR, "stopwords.txt")
+
+
+def resolve_data_file(str_file: str) -> str:
+    """Caminho relativo que não existe no diretório atual é procurado em DATA_DIR"""
+    if os.path.isabs(str_file) or os.path.exists(str_file):
+        return str_file
+    return os.path.join(DATA_DIR, str_file)
+
+
+def word_tokenize(text: str):
+    from nltk.tokenize import word_tokenize as nltk_word_tokenize
+    return nltk_word_tokenize(text)
+
 
 class Cleaner:
+    # Após construído o Cleaner é somente leitura: preprocess_word pode ser
+    # usado por várias threads sem trava (ver util/threads.py)
     def __init__(self, stop_words_file: str, language: str,
                  perform_stop_words_removal: bool, perform_accents_removal: bool,
                  perform_stemming: bool):
-        self.set_stop_words = self.read_stop_words(stop_words_file)
+        self.set_stop_words = self.read_stop_words(resolve_data_file(stop_words_file))
 
-        self.stemmer = SnowballStemmer(language)
+        # criado no primeiro uso (propriedade stemmer)
+        self.language = language
+        self._stemmer = None
         in_table = "áéíóúâêôçãẽõü"
         out_table = "aeiouaeocaeou"
         # altere a linha abaixo para remoção de acentos (Atividade 11)
@@ -25,7 +48,15 @@ class Cleaner:
         self.perform_accents_removal = perform_accents_removal
         self.perform_stemming = perform_stemming
 
+    @property
+    def stemmer(self):
+        if self._stemmer is None:
+            from nltk.stem.snowball import SnowballStemmer
+            self._stemmer = SnowballStemmer(self.language)
+        return self._stemmer
+
     def html_to_plain_text(self, html_doc: str) -> str:
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(html_doc, parser='lxml')
         return soup.get_text()
 
@@ -41,7 +72,8 @@ class Cleaner:
         return term in self.set_stop_words
 
     def word_stem(self, term: str):
-        return self.stemmer.stem(term)
+        with metrics.span("indexer.stem"):
+            return self.stemmer.stem(term)
 
     def remove_accents(self, term: str) -> str:
         return term.translate(self.accents_translation_table)
@@ -69,25 +101,64 @@ class Cleaner:
         return word
 
 
+class DefaultCleaner:
+    """
+    Cleaner padrão do HTMLIndexer, criado no primeiro acesso a
+    HTMLIndexer.cleaner (e não ao importar o módulo)
+    """
+    def __init__(self):
+        self.cleaner = None
+
+    def __get__(self, instance, owner) -> Cleaner:
+        if self.cleaner is None:
+            self.cleaner = Cleaner(stop_words_file=DEFAULT_STOP_WORDS_FILE,
+                                   language="portuguese",
+                                   perform_stop_words_removal=True,
+                                   perform_accents_removal=True,
+                                   perform_stemming=True)
+        return self.cleaner
+
+
 class HTMLIndexer:
-    cleaner = Cleaner(stop_words_file="stopwords.txt",
-                      language="portuguese",
-                      perform_stop_words_removal=True,
-                      perform_accents_removal=True,
-                      perform_stemming=True)
+    cleaner = DefaultCleaner()
 
-    def __init__(self, index):
+    def __init__(self, index, doc_id_filter=None, position_store=None, journal=None, dedup=None, token_cache=None):
         self.index = index
+        # quando informado, só são indexados os arquivos cujo doc_id_filter(doc_id) é verdadeiro
+        self.doc_id_filter = doc_id_filter
+        # quando informado (index.positions.PositionStore), grava também as posições dos termos
+        self.position_store = position_store
+        # quando informado (index.journal.IndexingJournal), registra o progresso e pula os arquivos já concluídos
+        if journal is not None and position_store is not None:
+            raise ValueError("A indexação com diário não suporta position_store")
+        self.journal = journal
+        # quando informado (index.dedup.NearDuplicateDetector), quase duplicados não são indexados
+        self.dedup = dedup
+        if dedup is not None:
+            if index.dic_duplicate_of is None:
+                index.dic_duplicate_of = {}
+            dedup.dic_duplicate_of = index.dic_duplicate_of
+        # quando informado (index.token_cache.TokenCacheWriter), grava os tokens de cada documento indexado
+        self.token_cache = token_cache
+
+    def tokenize(self, plain_text: str) -> List[str]:
+        with metrics.span("indexer.tokenize"):
+            token_list = word_tokenize(plain_text)
+        metrics.inc("indexer.tokens", len(token_list))
+        return token_list
 
     def text_word_count(self, plain_text: str):
+        return self.token_word_count(self.tokenize(plain_text))
+
+    def token_word_count(self, token_list: List[str]):
         dic_word_count = {}
-        token_list = word_tokenize(plain_text)
-        for word in token_list:
-            processed_word = self.cleaner.preprocess_word(word)
-            if processed_word in dic_word_count.keys():
-                dic_word_count[processed_word] += 1
-            else:
-                dic_word_count[processed_word] = 1
+        with metrics.span("indexer.clean"):
+            for word in token_list:
+                processed_word = self.cleaner.preprocess_word(word)
+                if processed_word in dic_word_count.keys():
+                    dic_word_count[processed_word] += 1
+                else:
+                    dic_word_count[processed_word] = 1
         try:
             del dic_word_count['']
             del dic_word_count[None]
@@ -95,13 +166,72 @@ class HTMLIndexer:
             pass
         return dic_word_count
 
+    def text_word_positions(self, plain_text: str):
+        return self.token_word_positions(self.tokenize(plain_text))
+
+    def token_word_positions(self, token_list: List[str]):
+        """Posições (índice do token no texto) de cada termo"""
+        dic_word_positions = {}
+        with metrics.span("indexer.clean"):
+            for position, word in enumerate(token_list):
+                processed_word = self.cleaner.preprocess_word(word)
+                if processed_word:
+                    dic_word_positions.setdefault(processed_word, []).append(position)
+        return dic_word_positions
+
+    def text_terms(self, plain_text: str, positions: bool):
+        """Posições de cada termo (positions=True, para o position_store) ou frequência de cada termo"""
+        return self.text_word_positions(plain_text) if positions else self.text_word_count(plain_text)
+
+    def token_terms(self, token_list: List[str], positions: bool):
+        """Como text_terms, a partir dos tokens já extraídos do texto"""
+        return self.token_word_positions(token_list) if positions else self.token_word_count(token_list)
+
+    def is_duplicate(self, doc_id: int, text_plain: str) -> bool:
+        with metrics.span("indexer.dedup"):
+            return self.dedup.check(doc_id, text_plain) is not None
+
     def index_text(self, doc_id: int, text_html: str):
-        text_plain = self.cleaner.html_to_plain_text(text_html)
-        dict_text_word_count = self.text_word_count(text_plain)
-        for key in dict_text_word_count:
-            if key:
-                self.index.index(key, doc_id, dict_text_word_count[key])
+        with metrics.span("indexer.parse"):
+            text_plain = self.cleaner.html_to_plain_text(text_html)
+        if self.dedup is not None and self.is_duplicate(doc_id, text_plain):
+            return
+        positions = self.position_store is not None
+        if self.token_cache is not None:
+            token_list = self.tokenize(text_plain)
+            self.token_cache.add_document(doc_id, token_list)
+            self.index_terms(doc_id, self.token_terms(token_list, positions))
+        else:
+            self.index_terms(doc_id, self.text_terms(text_plain, positions))
 
+    def index_terms(self, doc_id: int, dic_terms):
+        """Indexa o resultado de text_terms (parte do index_text feita pela thread escritora)"""
+        if self.position_store is not None:
+            self.position_store.add_document(doc_id, dic_terms)
+            dict_text_word_count = {word: len(lst_positions) for word, lst_positions in dic_terms.items()}
+        else:
+            dict_text_word_count = dic_terms
+        with metrics.span("indexer.index"):
+            for key in dict_text_word_count:
+                if key:
+                    self.index.index(key, doc_id, dict_text_word_count[key])
+        if self.dedup is not None:
+            self.dedup.add_postings(doc_id, [(self.index.get_term_id(key), term_freq)
+                                             for key, term_freq in dict_text_word_count.items() if key])
+        metrics.inc("indexer.documents")
+        profiler.sample()
+
+    @profiler.profiled("index_token_cache")
+    def index_token_cache(self, token_cache):
+        """Indexa os documentos de um index.token_cache.TokenCache, sem ler nem tokenizar o HTML de novo"""
+        positions = self.position_store is not None
+        for doc_id, token_list in token_cache:
+            if self.doc_id_filter is not None and not self.doc_id_filter(doc_id):
+                continue
+            metrics.inc("indexer.tokens", len(token_list))
+            self.index_terms(doc_id, self.token_terms(token_list, positions))
+
+    @profiler.profiled("index_text_dir")
     def index_text_dir(self, path: str):
         for str_sub_dir in os.listdir(path):
             path_sub_dir = self.create_path(path, str_sub_dir)
@@ -109,19 +239,21 @@ class HTMLIndexer:
 
     def browse_in_directory(self, path_sub_dir):
         for file_name in os.listdir(path_sub_dir):
+            if self.doc_id_filter is not None and not self.doc_id_filter(self.get_doc_id(file_name)):
+                continue
+            if self.journal is not None and self.journal.is_finished(file_name):
+                continue
             filename = self.create_path(path_sub_dir, file_name)
+            if self.journal is not None:
+                self.journal.begin_document(file_name, self.get_doc_id(file_name))
             self.index_file(file_name, filename)
-            self.write_file(file_name)
+            if self.journal is not None:
+                self.journal.record_document(file_name)
 
     @staticmethod
     def create_path(path, str_sub_dir):
         return f'{path}/{str_sub_dir}'
 
-    @staticmethod
-    def write_file(file_name):
-        with open("teste.txt", "a", encoding="utf-8") as file:
-            file.write(file_name)
-
     def index_file(self, file_name, filename):
         with open(filename, "rb") as file:
             self.index_text(self.get_doc_id(file_name), file)
@@ -133,3 +265,58 @@ class HTMLIndexer:
     def get_first(file_name):
         return (file_name.split("."))[0]
 
+
+def main():
+    import argparse
+    from index.structure import FileIndex
+
+    parser = argparse.ArgumentParser(description="Indexa um diretório de documentos HTML (<dir>/<subdir>/<doc_id>.html)")
+    parser.add_argument("path", help="diretório com os subdiretórios de documentos")
+    parser.add_argument("--output", default=None, help="arquivo onde o indice finalizado será salvo (Index.load)")
+    parser.add_argument("--metrics", action="store_true", help="imprime as métricas coletadas (JSON) ao final")
+    parser.add_argument("--memory-budget", type=float, default=None,
+                        help="MB de ocorrências mantidas em memória antes de gravá-las em disco")
+    parser.add_argument("--dedup-threshold", type=float, default=None,
+                        help="não indexa documentos com similaridade (MinHash) >= o limiar com um já indexado")
+    parser.add_argument("--token-cache", default=None,
+                        help="diretório onde os tokens dos documentos são gravados para reindexar com python -m index.token_cache")
+    profiler.add_arguments(parser)
+    args = parser.parse_args()
+
+    profiler.configure_from_args(args)
+    if args.metrics:
+        metrics.enable()
+
+    import resource
+
+    memory_budget = int(args.memory_budget * 1024 * 1024) if args.memory_budget is not None else None
+    index = FileIndex(memory_budget=memory_budget)
+    dedup = None
+    if args.dedup_threshold is not None:
+        from index.dedup import NearDuplicateDetector
+        dedup = NearDuplicateDetector(args.dedup_threshold)
+    token_cache = None
+    if args.token_cache is not None:
+        from index.token_cache import TokenCacheWriter
+        token_cache = TokenCacheWriter(args.token_cache)
+    HTMLIndexer(index, dedup=dedup, token_cache=token_cache).index_text_dir(args.path)
+    if token_cache is not None:
+        token_cache.close()
+    index.finish_indexing()
+    print(f"{index.document_count} documentos, {len(index.dic_index)} termos indexados em {index.str_idx_file_name}")
+    print(f"Ocorrências em memória: máximo {index.peak_tmp_occurrences_bytes / 2**20:,.1f} MB "
+          f"(orçamento {index.memory_budget / 2**20:,.1f} MB); "
+          f"RSS máximo do processo: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:,.1f} MB")
+    if dedup is not None:
+        dic_report = dedup.report()
+        print(f"Quase duplicados: {dic_report['duplicates']} de {dic_report['documents']} documentos "
+              f"em {dic_report['duplicate_groups']} grupos; {dic_report['postings_saved']:,} ocorrências "
+              f"({dic_report['postings_reduction']:.1%}, ~{dic_report['index_bytes_saved'] / 2**20:,.1f} MB do índice) economizadas")
+    if args.output is not None:
+        index.save(args.output)
+    if args.metrics:
+        print(metrics.to_json(indent=4))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""
+Ingestão de documentos em fluxo, sem extrair arquivos intermediários.
+
+Uma fonte é um gerador de registros (doc_id, bytes do HTML):
+
+    directory_source(path):   o diretório de dois níveis do index_text_dir
+                              (<dir>/<subdir>/<doc_id>.html)
+    tar_source(arquivo):      membros de um tar (.tar, .tar.gz, .tgz, .tar.bz2...),
+                              lido em modo fluxo ("r|*"), sem acesso aleatório
+    jsonl_source(arquivo):    uma linha JSON por documento ({"id": 1, "html": "..."}),
+                              compactado com gzip ou não
+
+`open_source` escolhe a fonte pelo caminho. Nos tar e diretórios o doc_id vem
+do nome do arquivo, como em HTMLIndexer.get_doc_id.
+
+`ingest` alimenta o HTMLIndexer com os registros. Com num_workers > 0, o
+parse do HTML e a tokenização (HTMLIndexer.text_terms) são feitos por um
+pool de processos (ou threads) e a thread atual só indexa (index_terms), na
+ordem da fonte. No máximo `max_pending` documentos ficam em processamento:
+o próximo registro só é lido da fonte quando o mais antigo termina, então a
+leitura espera pela indexação (back-pressure) e a memória usada não depende
+do tamanho da coleção.
+
+Uso: python -m index.ingest FONTE [--workers N] [--output INDICE]
+"""
+from typing import Iterable, Iterator, Tuple
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import gzip
+import json
+import os
+import tarfile
+
+from util.metrics import metrics
+
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+JSONL_SUFFIXES = (".jsonl", ".jsonl.gz", ".json.gz", ".ndjson", ".ndjson.gz")
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def doc_id_from_file_name(file_name: str) -> int:
+    return int(os.path.basename(file_name).split(".")[0])
+
+
+def directory_source(path: str) -> Iterator[Tuple[int, bytes]]:
+    for str_sub_dir in os.listdir(path):
+        path_sub_dir = os.path.join(path, str_sub_dir)
+        for file_name in os.listdir(path_sub_dir):
+            with open(os.path.join(path_sub_dir, file_name), "rb") as file:
+                yield doc_id_from_file_name(file_name), file.read()
+
+
+def tar_source(str_file: str) -> Iterator[Tuple[int, bytes]]:
+    with tarfile.open(str_file, "r|*") as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            yield doc_id_from_file_name(member.name), tar.extractfile(member).read()
+
+
+def jsonl_source(str_file: str, id_field: str = "id", html_field: str = "html") -> Iterator[Tuple[int, bytes]]:
+    with open(str_file, "rb") as file:
+        bol_gzip = file.read(2) == GZIP_MAGIC
+    with (gzip.open(str_file, "rb") if bol_gzip else open(str_file, "rb")) as file:
+        for line in file:
+            if not line.strip():
+                continue
+            dic_doc = json.loads(line)
+            yield int(dic_doc[id_field]), dic_doc[html_field].encode("utf-8")
+
+
+def open_source(path: str) -> Iterator[Tuple[int, bytes]]:
+    if os.path.isdir(path):
+        return directory_source(path)
+    if path.endswith(TAR_SUFFIXES):
+        return tar_source(path)
+    if path.endswith(JSONL_SUFFIXES):
+        return jsonl_source(path)
+    raise ValueError(f"Formato de fonte desconhecido: {path}")
+
+
+# HTMLIndexer (sem índice) do processo trabalhador da ingestão
+_worker_indexer = None
+
+
+def _init_worker(indexer_class, cleaner):
+    global _worker_indexer
+    _worker_indexer = indexer_class(None)
+    _worker_indexer.cleaner = cleaner
+
+
+def analyze_record(indexer, doc_id: int, data: bytes, positions: bool, keep_text: bool, keep_tokens: bool):
+    """
+    Parte do index_text feita fora da thread escritora: (doc_id, texto (se
+    keep_text), termos, tokens (se keep_tokens, para o cache de tokens))
+    """
+    text_plain = indexer.cleaner.html_to_plain_text(data)
+    if keep_tokens:
+        token_list = indexer.tokenize(text_plain)
+        return doc_id, text_plain if keep_text else None, indexer.token_terms(token_list, positions), token_list
+    return doc_id, text_plain if keep_text else None, indexer.text_terms(text_plain, positions), None
+
+
+def _analyze_in_worker(doc_id: int, data: bytes, positions: bool, keep_text: bool, keep_tokens: bool):
+    return analyze_record(_worker_indexer, doc_id, data, positions, keep_text, keep_tokens)
+
+
+def ingest(indexer, records: Iterable[Tuple[int, bytes]], num_workers: int = 0,
+           max_pending: int = None, use_processes: bool = True) -> int:
+    """
+    Indexa os registros (doc_id, bytes) com o indexer; retorna quantos
+    documentos foram lidos. Com num_workers = 0 tudo é feito na thread atual.
+    """
+    if indexer.journal is not None:
+        raise ValueError("A ingestão em fluxo não suporta o diário (use index_text_dir)")
+    positions = indexer.position_store is not None
+    keep_text = indexer.dedup is not None
+    keep_tokens = indexer.token_cache is not None
+    count = 0
+
+    def index_analyzed(doc_id, text_plain, dic_terms, token_list):
+        if text_plain is not None and indexer.is_duplicate(doc_id, text_plain):
+            return
+        if token_list is not None:
+            indexer.token_cache.add_document(doc_id, token_list)
+        indexer.index_terms(doc_id, dic_terms)
+
+    if num_workers == 0:
+        for doc_id, data in records:
+            count += 1
+            if indexer.doc_id_filter is None or indexer.doc_id_filter(doc_id):
+                indexer.index_text(doc_id, data)
+        metrics.inc("ingest.documents", count)
+        return count
+
+    if use_processes:
+        executor = ProcessPoolExecutor(num_workers, initializer=_init_worker,
+                                       initargs=(type(indexer), indexer.cleaner))
+        analyze = _analyze_in_worker
+    else:
+        # o Cleaner é somente leitura e pode ser usado por várias threads
+        executor = ThreadPoolExecutor(num_workers)
+        analyze = lambda *args: analyze_record(indexer, *args)
+    max_pending = max_pending or 4 * num_workers
+    deq_pending = deque()
+    with executor:
+        for doc_id, data in records:
+            count += 1
+            if indexer.doc_id_filter is not None and not indexer.doc_id_filter(doc_id):
+                continue
+            deq_pending.append(executor.submit(analyze, doc_id, data, positions, keep_text, keep_tokens))
+            if len(deq_pending) >= max_pending:
+                metrics.inc("ingest.backpressure_waits")
+                index_analyzed(*deq_pending.popleft().result())
+        while deq_pending:
+            index_analyzed(*deq_pending.popleft().result())
+    metrics.inc("ingest.documents", count)
+    return count
+
+
+def main():
+    import argparse
+    from index.indexer import HTMLIndexer
+    from index.structure import FileIndex
+
+    parser = argparse.ArgumentParser(description="Indexa documentos de um diretório, tar ou JSONL (gzip) sem extraí-los")
+    parser.add_argument("source", help="diretório, arquivo tar ou arquivo JSONL")
+    parser.add_argument("--workers", type=int, default=0, help="processos que fazem o parse e a tokenização")
+    parser.add_argument("--max-pending", type=int, default=None,
+                        help="máximo de documentos em processamento (padrão: 4 por processo)")
+    parser.add_argument("--memory-budget", type=float, default=None,
+                        help="MB de ocorrências mantidas em memória antes de gravá-las em disco")
+    parser.add_argument("--output", default=None, help="arquivo onde o indice finalizado será salvo (Index.load)")
+    args = parser.parse_args()
+
+    memory_budget = int(args.memory_budget * 1024 * 1024) if args.memory_budget is not None else None
+    index = FileIndex(memory_budget=memory_budget)
+    count = ingest(HTMLIndexer(index), open_source(args.source), args.workers, args.max_pending)
+    index.finish_indexing()
+    print(f"{count} documentos lidos, {index.document_count} indexados, {len(index.dic_index)} termos em {index.str_idx_file_name}")
+    if args.output is not None:
+        index.save(args.output)
+
+
+if __name__ == '__main__':
+    main()
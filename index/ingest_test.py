@@ -0,0 +1,97 @@
+from index.ingest import directory_source, tar_source, jsonl_source, open_source, ingest
+from index.indexer import HTMLIndexer
+from index.structure import HashIndex
+from collections import Counter
+from random import Random
+import gzip
+import json
+import os
+import tarfile
+import tempfile
+import unittest
+
+
+class SplitIndexer(HTMLIndexer):
+    """Tokeniza por espaços (sem o nltk)"""
+    def text_word_count(self, plain_text: str):
+        return dict(Counter(plain_text.lower().split()))
+
+
+class IngestTest(unittest.TestCase):
+    NUM_DOCS = 30
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        random = Random(7)
+        vocabulary = ["casa", "verde", "azul", "predio", "rua", "janela", "porta", "xicara"]
+        self.dic_docs = {doc_id: "<html><body><p>" + " ".join(random.choice(vocabulary) for i in range(8)) + "</p></body></html>"
+                         for doc_id in range(1, IngestTest.NUM_DOCS + 1)}
+
+        self.str_dir = os.path.join(self.tmp_dir.name, "docs")
+        for doc_id, html in self.dic_docs.items():
+            str_sub_dir = os.path.join(self.str_dir, str(doc_id % 4))
+            os.makedirs(str_sub_dir, exist_ok=True)
+            with open(os.path.join(str_sub_dir, f"{doc_id}.html"), "w", encoding="utf-8") as file:
+                file.write(html)
+
+        self.str_tar = os.path.join(self.tmp_dir.name, "docs.tar.gz")
+        with tarfile.open(self.str_tar, "w:gz") as tar:
+            tar.add(self.str_dir, arcname="docs")
+
+        self.str_jsonl = os.path.join(self.tmp_dir.name, "docs.jsonl.gz")
+        with gzip.open(self.str_jsonl, "wt", encoding="utf-8") as file:
+            for doc_id, html in self.dic_docs.items():
+                file.write(json.dumps({"id": doc_id, "html": html}) + "\n")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def postings(self, index):
+        return {term: sorted((occur.doc_id, occur.term_freq) for occur in index.get_occurrence_list(term))
+                for term in index.vocabulary}
+
+    def test_sources(self):
+        dic_expected = {doc_id: html.encode("utf-8") for doc_id, html in self.dic_docs.items()}
+        for source in (directory_source(self.str_dir), tar_source(self.str_tar), jsonl_source(self.str_jsonl),
+                       open_source(self.str_tar), open_source(self.str_jsonl)):
+            self.assertDictEqual(dict(source), dic_expected)
+        with self.assertRaises(ValueError):
+            open_source(os.path.join(self.tmp_dir.name, "docs.zip"))
+
+    def test_ingest(self):
+        expected_index = HashIndex()
+        SplitIndexer(expected_index).index_text_dir(self.str_dir)
+        dic_expected = self.postings(expected_index)
+
+        for num_workers, use_processes in ((0, True), (2, False), (2, True)):
+            index = HashIndex()
+            count = ingest(SplitIndexer(index), open_source(self.str_jsonl), num_workers, use_processes=use_processes)
+            self.assertEqual(count, IngestTest.NUM_DOCS)
+            self.assertEqual(index.document_count, IngestTest.NUM_DOCS)
+            self.assertDictEqual(self.postings(index), dic_expected)
+
+    def test_backpressure(self):
+        lst_read = []
+        lst_pending = []
+
+        def records():
+            for doc_id, data in jsonl_source(self.str_jsonl):
+                lst_read.append(doc_id)
+                yield doc_id, data
+
+        class PendingIndexer(SplitIndexer):
+            def index_terms(self, doc_id, dic_terms):
+                lst_pending.append(len(lst_read) - self.index.document_count)
+                super().index_terms(doc_id, dic_terms)
+
+        index = HashIndex()
+        ingest(PendingIndexer(index, doc_id_filter=lambda doc_id: doc_id != 5), records(),
+               num_workers=2, max_pending=3, use_processes=False)
+        self.assertEqual(index.document_count, IngestTest.NUM_DOCS - 1)
+        self.assertNotIn(5, index.set_documents)
+        # nunca há mais de max_pending documentos lidos e ainda não indexados (+1 filtrado)
+        self.assertLessEqual(max(lst_pending), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
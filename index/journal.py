@@ -0,0 +1,188 @@
+"""
+Diário (journal) de progresso da indexação de um diretório, para retomar
+uma indexação interrompida sem recomeçar do zero.
+
+O diário é um arquivo texto, uma entrada por linha:
+
+    doc <arquivo>        documento indexado
+    partial <doc_id>     documento que estava sendo indexado durante o checkpoint
+    checkpoint <n>       fim do n-ésimo checkpoint
+
+Um checkpoint é feito a cada vez que o FileIndex grava as ocorrências em
+memória no arquivo do índice (ver FileIndex.flush_listener): o estado do
+índice, sem as ocorrências em memória, é salvo em `<diário>.snapshot.<n>`
+(arquivo temporário + fsync + os.replace) e só então a linha do checkpoint
+é gravada e o diário é sincronizado (fsync). O snapshot do checkpoint
+anterior e o arquivo anterior do índice só são apagados depois disso: uma
+interrupção entre o snapshot e a linha do checkpoint retoma do checkpoint
+anterior, cujo snapshot (e o arquivo do índice para o qual ele aponta)
+ainda existe.
+
+As linhas `doc` são gravadas em lotes, sem fsync. Ao retomar (resume=True),
+apenas os documentos anteriores ao último checkpoint contam como concluídos:
+os demais estavam só em memória e são indexados de novo, e o diário é
+truncado no último checkpoint. Um documento `partial` teve parte das
+ocorrências gravada no checkpoint; ele é removido do índice restaurado
+(delete_document) antes de ser indexado de novo. Se o snapshot do último
+checkpoint não existir, load_index lança FileNotFoundError: os documentos
+concluídos segundo o diário não estariam no índice.
+
+Uso: python -m index.journal DIRETORIO DIARIO [--resume] [--output INDICE]
+"""
+from typing import List, Optional, Set
+import glob
+import os
+
+from index.structure import Index, FileIndex
+
+
+class IndexingJournal:
+    def __init__(self, str_file_name: str, resume: bool = False, batch_size: int = 100):
+        self.str_file_name = str_file_name
+        self.batch_size = batch_size
+        # documentos concluídos (até o último checkpoint) e doc_ids a remover ao retomar
+        self.set_finished = set()
+        self.lst_partial_doc_ids = []
+        self.checkpoint_count = 0
+        # documento sendo indexado (file_name, doc_id) e linhas ainda não gravadas
+        self.current_document = None
+        self.lst_pending = []
+
+        if resume and os.path.exists(str_file_name):
+            self.read()
+        # snapshots que não são do último checkpoint (ou todos, sem resume)
+        str_current_snapshot = self.snapshot_file(self.checkpoint_count) if self.checkpoint_count > 0 else None
+        for str_snapshot_file in glob.glob(glob.escape(str_file_name) + ".snapshot.*"):
+            if str_snapshot_file != str_current_snapshot:
+                os.remove(str_snapshot_file)
+        self.file = open(str_file_name, "a" if resume else "w", encoding="utf-8")
+
+    def snapshot_file(self, checkpoint: int) -> str:
+        return f"{self.str_file_name}.snapshot.{checkpoint}"
+
+    def read(self):
+        """Lê o diário até o último checkpoint e descarta o restante"""
+        set_docs = set()
+        lst_partial = []
+        end_pos = 0
+        with open(self.str_file_name, "rb") as file:
+            for line in file:
+                if not line.endswith(b"\n"):
+                    # linha incompleta (interrupção durante a escrita)
+                    break
+                entry, _, value = line.decode("utf-8").rstrip("\n").partition(" ")
+                if entry == "doc":
+                    set_docs.add(value)
+                elif entry == "partial":
+                    lst_partial.append(int(value))
+                elif entry == "checkpoint":
+                    self.set_finished |= set_docs
+                    set_docs = set()
+                    self.lst_partial_doc_ids = lst_partial
+                    lst_partial = []
+                    self.checkpoint_count = int(value)
+                    end_pos = file.tell()
+        with open(self.str_file_name, "r+b") as file:
+            file.truncate(end_pos)
+
+    def load_index(self) -> Optional[Index]:
+        """Índice do último checkpoint, já sem os documentos parcialmente gravados (None se não houver checkpoint)"""
+        if self.checkpoint_count == 0:
+            return None
+        str_snapshot_file = self.snapshot_file(self.checkpoint_count)
+        if not os.path.exists(str_snapshot_file):
+            raise FileNotFoundError(f"O snapshot do checkpoint {self.checkpoint_count} ({str_snapshot_file}) não existe; "
+                                    f"recomece a indexação sem resume")
+        index = Index.load(str_snapshot_file)
+        for doc_id in self.lst_partial_doc_ids:
+            index.delete_document(doc_id)
+        return index
+
+    def attach(self, index: FileIndex):
+        index.flush_listener = self.checkpoint
+
+    def is_finished(self, file_name: str) -> bool:
+        return file_name in self.set_finished
+
+    def begin_document(self, file_name: str, doc_id: int):
+        self.current_document = (file_name, doc_id)
+
+    def record_document(self, file_name: str):
+        self.current_document = None
+        self.lst_pending.append(f"doc {file_name}\n")
+        if len(self.lst_pending) >= self.batch_size:
+            self.write_pending()
+
+    def write_pending(self):
+        self.file.writelines(self.lst_pending)
+        self.file.flush()
+        self.lst_pending = []
+
+    def checkpoint(self, index: FileIndex):
+        # o arquivo do índice precisa estar no disco antes do snapshot que aponta para ele
+        if index.str_idx_file_name is not None:
+            with open(index.str_idx_file_name, "rb") as idx_file:
+                os.fsync(idx_file.fileno())
+        checkpoint = self.checkpoint_count + 1
+        str_snapshot_file = self.snapshot_file(checkpoint)
+        index.save(str_snapshot_file + ".tmp")
+        with open(str_snapshot_file + ".tmp", "rb") as snapshot_file:
+            os.fsync(snapshot_file.fileno())
+        os.replace(str_snapshot_file + ".tmp", str_snapshot_file)
+
+        if self.current_document is not None:
+            self.lst_pending.append(f"partial {self.current_document[1]}\n")
+        self.lst_pending.append(f"checkpoint {checkpoint}\n")
+        self.write_pending()
+        os.fsync(self.file.fileno())
+        # só agora o snapshot anterior deixa de ser o do último checkpoint do diário
+        if self.checkpoint_count > 0:
+            os.remove(self.snapshot_file(self.checkpoint_count))
+        self.checkpoint_count = checkpoint
+
+    def close(self):
+        self.write_pending()
+        self.file.close()
+
+
+def build_index(path: str, str_journal_file: str, resume: bool = False,
+                str_file_prefix: str = "occur_index", memory_budget: int = None) -> FileIndex:
+    """Indexa o diretório `path` registrando o progresso no diário; com resume, continua do último checkpoint"""
+    from index.indexer import HTMLIndexer
+
+    journal = IndexingJournal(str_journal_file, resume)
+    index = journal.load_index() if resume else None
+    if index is None:
+        index = FileIndex(str_file_prefix, memory_budget)
+    journal.attach(index)
+    try:
+        HTMLIndexer(index, journal=journal).index_text_dir(path)
+        index.finish_indexing()
+    finally:
+        index.flush_listener = None
+        journal.close()
+    return index
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Indexa um diretório com checkpoints, podendo retomar uma indexação interrompida")
+    parser.add_argument("path", help="diretório com os subdiretórios de documentos")
+    parser.add_argument("journal", help="arquivo do diário de progresso")
+    parser.add_argument("--resume", action="store_true", help="continua a partir do último checkpoint do diário")
+    parser.add_argument("--prefix", default="occur_index", help="prefixo dos arquivos do índice")
+    parser.add_argument("--memory-budget", type=float, default=None,
+                        help="MB de ocorrências mantidas em memória (cada gravação em disco é um checkpoint)")
+    parser.add_argument("--output", default=None, help="arquivo onde o indice finalizado será salvo (Index.load)")
+    args = parser.parse_args()
+
+    memory_budget = int(args.memory_budget * 1024 * 1024) if args.memory_budget is not None else None
+    index = build_index(args.path, args.journal, args.resume, args.prefix, memory_budget)
+    print(f"{index.document_count} documentos, {len(index.dic_index)} termos indexados em {index.str_idx_file_name}")
+    if args.output is not None:
+        index.save(args.output)
+
+
+if __name__ == '__main__':
+    main()
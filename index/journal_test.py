@@ -0,0 +1,148 @@
+from index.journal import IndexingJournal
+from index.indexer import HTMLIndexer
+from index.structure import FileIndex
+from collections import Counter
+from random import randrange, seed
+import gc
+import os
+import tempfile
+import unittest
+
+
+class WordIndexer(HTMLIndexer):
+    """Indexa arquivos de palavras separadas por espaço (sem tokenização do nltk)"""
+    crash_after = None
+
+    def index_file(self, file_name, filename):
+        if WordIndexer.crash_after is not None:
+            if WordIndexer.crash_after == 0:
+                raise KeyboardInterrupt()
+            WordIndexer.crash_after -= 1
+        with open(filename, encoding="utf-8") as file:
+            for term, term_freq in Counter(file.read().split()).items():
+                self.index.index(term, self.get_doc_id(file_name), term_freq)
+
+
+class CrashingJournal(IndexingJournal):
+    """Interrompe o checkpoint depois de gravar o snapshot e antes da linha do checkpoint no diário"""
+    crash_at_checkpoint = None
+
+    def write_pending(self):
+        if f"checkpoint {self.crash_at_checkpoint}\n" in self.lst_pending:
+            raise KeyboardInterrupt()
+        super().write_pending()
+
+
+class JournalTest(unittest.TestCase):
+    NUM_DOCS = 40
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.str_docs_dir = os.path.join(self.tmp_dir.name, "docs")
+        seed(3)
+        vocabulary = ["casa", "verde", "azul", "predio", "rua", "janela", "porta", "xicara"]
+        for doc_id in range(1, JournalTest.NUM_DOCS + 1):
+            str_sub_dir = os.path.join(self.str_docs_dir, str(doc_id % 3))
+            os.makedirs(str_sub_dir, exist_ok=True)
+            with open(os.path.join(str_sub_dir, f"{doc_id}.html"), "w", encoding="utf-8") as file:
+                file.write(" ".join(vocabulary[randrange(len(vocabulary))] for i in range(6)))
+        self.str_journal = os.path.join(self.tmp_dir.name, "journal.log")
+        #o orçamento de memória (7 ocorrências) força gravações (checkpoints) no meio dos documentos
+        FileIndex(os.path.join(self.tmp_dir.name, "probe"))
+        self.memory_budget = 7 * FileIndex.OCCURRENCE_BYTES
+
+    def tearDown(self):
+        WordIndexer.crash_after = None
+        self.tmp_dir.cleanup()
+
+    def build(self, str_prefix, journal=None):
+        index = FileIndex(os.path.join(self.tmp_dir.name, str_prefix), self.memory_budget)
+        if journal is not None:
+            index = journal.load_index() or index
+            journal.attach(index)
+        try:
+            WordIndexer(index, journal=journal).index_text_dir(self.str_docs_dir)
+            index.finish_indexing()
+        finally:
+            index.flush_listener = None
+            if journal is not None:
+                journal.close()
+        return index
+
+    def postings(self, index):
+        return {term: [(occur.doc_id, occur.term_freq) for occur in index.get_occurrence_list(term)]
+                for term in index.vocabulary}
+
+    def test_resume_after_crash(self):
+        expected_index = self.build("expected")
+
+        WordIndexer.crash_after = 23
+        with self.assertRaises(KeyboardInterrupt):
+            self.build("journaled", IndexingJournal(self.str_journal))
+        with open(self.str_journal, encoding="utf-8") as file:
+            lst_lines = file.read().splitlines()
+        self.assertTrue(any(line.startswith("checkpoint") for line in lst_lines))
+        self.assertTrue(any(line.startswith("partial") for line in lst_lines))
+
+        journal = IndexingJournal(self.str_journal, resume=True)
+        self.assertGreater(len(journal.set_finished), 0)
+        self.assertLess(len(journal.set_finished), 23)
+        WordIndexer.crash_after = None
+        lst_indexed = []
+        original_index_file = WordIndexer.index_file
+        def index_file(indexer, file_name, filename):
+            lst_indexed.append(file_name)
+            original_index_file(indexer, file_name, filename)
+        WordIndexer.index_file = index_file
+        try:
+            index = self.build("journaled", journal)
+        finally:
+            WordIndexer.index_file = original_index_file
+        #os documentos concluídos antes do último checkpoint não são indexados de novo
+        self.assertEqual(len(lst_indexed), JournalTest.NUM_DOCS - len(journal.set_finished))
+        self.assertTrue(set(lst_indexed).isdisjoint(journal.set_finished))
+
+        self.assertEqual(index.document_count, JournalTest.NUM_DOCS)
+        self.assertDictEqual(self.postings(index), self.postings(expected_index))
+
+    def test_crash_before_checkpoint_line(self):
+        expected_index = self.build("expected")
+
+        journal = CrashingJournal(self.str_journal)
+        journal.crash_at_checkpoint = 3
+        #a interrupção acontece no meio da gravação do FileIndex (que desabilita o gc)
+        self.addCleanup(gc.enable)
+        with self.assertRaises(KeyboardInterrupt):
+            self.build("journaled", journal)
+        self.assertTrue(os.path.exists(journal.snapshot_file(3)))
+        self.assertTrue(os.path.exists(journal.snapshot_file(2)))
+
+        #retoma do checkpoint 2, o último gravado no diário; o snapshot 3 é descartado
+        journal = IndexingJournal(self.str_journal, resume=True)
+        self.assertEqual(journal.checkpoint_count, 2)
+        self.assertFalse(os.path.exists(journal.snapshot_file(3)))
+        index = self.build("journaled", journal)
+        self.assertEqual(index.document_count, JournalTest.NUM_DOCS)
+        self.assertDictEqual(self.postings(index), self.postings(expected_index))
+
+    def test_truncate_after_checkpoint(self):
+        with open(self.str_journal, "w", encoding="utf-8") as file:
+            file.write("doc 1.html\ndoc 2.html\npartial 3\ncheckpoint 1\ndoc 3.html\ndoc 4.ht")
+        journal = IndexingJournal(self.str_journal, resume=True)
+        self.assertSetEqual(journal.set_finished, {"1.html", "2.html"})
+        self.assertListEqual(journal.lst_partial_doc_ids, [3])
+        self.assertEqual(journal.checkpoint_count, 1)
+        #sem o snapshot do checkpoint, os documentos concluídos não estariam no índice
+        with self.assertRaises(FileNotFoundError):
+            journal.load_index()
+        journal.close()
+        with open(self.str_journal, encoding="utf-8") as file:
+            self.assertEqual(file.read(), "doc 1.html\ndoc 2.html\npartial 3\ncheckpoint 1\n")
+
+        #sem resume, o diário é recomeçado
+        IndexingJournal(self.str_journal).close()
+        self.assertEqual(os.path.getsize(self.str_journal), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
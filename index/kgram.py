@@ -0,0 +1,190 @@
+"""
+Índice de k-gramas de caracteres sobre o vocabulário, usado para expandir
+termos da consulta que não estão no índice:
+
+    wildcard("paul*"):  termos que casam com o padrão (`*` = qualquer sequência)
+    similar("pauol"):   termos a até `max_distance` edições (distância de Levenshtein)
+
+Cada termo é delimitado por k - 1 `$` de cada lado ("$$casa$$" para k = 3) e
+dividido em k-gramas; cada k-grama aponta para a lista (ordenada) dos termos
+que o contêm. Os candidatos saem da interseção (wildcard) ou da contagem
+(similar) dessas listas e depois são verificados, sem percorrer o
+vocabulário inteiro. Padrões que são apenas
+um prefixo (`paul*`) usam busca binária no vocabulário ordenado. As expansões
+são ordenadas pelo df (mais frequentes primeiro) e limitadas a `max_expansions`.
+"""
+from collections import Counter
+from itertools import chain
+from typing import Callable, Iterable, List, Set
+import bisect
+import fnmatch
+import heapq
+import re
+
+from util.metrics import metrics
+
+BOUNDARY = "$"
+
+
+def kgrams(term: str, k: int) -> List[str]:
+    padded = f"{BOUNDARY * (k - 1)}{term}{BOUNDARY * (k - 1)}"
+    return [padded[i:i + k] for i in range(max(len(padded) - k + 1, 1))]
+
+
+def edit_distance(term_a: str, term_b: str, max_distance: int) -> int:
+    """Distância de Levenshtein, ou max_distance + 1 se ela passar de max_distance"""
+    if abs(len(term_a) - len(term_b)) > max_distance:
+        return max_distance + 1
+    # o prefixo e o sufixo em comum não mudam a distância
+    start = 0
+    while start < len(term_a) and start < len(term_b) and term_a[start] == term_b[start]:
+        start += 1
+    end_a, end_b = len(term_a), len(term_b)
+    while end_a > start and end_b > start and term_a[end_a - 1] == term_b[end_b - 1]:
+        end_a -= 1
+        end_b -= 1
+    term_a, term_b = term_a[start:end_a], term_b[start:end_b]
+    if not term_a or not term_b:
+        return min(len(term_a) + len(term_b), max_distance + 1)
+    lst_previous = list(range(len(term_b) + 1))
+    for i, char_a in enumerate(term_a, 1):
+        lst_current = [i]
+        for j, char_b in enumerate(term_b, 1):
+            lst_current.append(min(lst_previous[j] + 1,
+                                   lst_current[j - 1] + 1,
+                                   lst_previous[j - 1] + (char_a != char_b)))
+        if min(lst_current) > max_distance:
+            return max_distance + 1
+        lst_previous = lst_current
+    return min(lst_previous[-1], max_distance + 1)
+
+
+class KGramIndex:
+    def __init__(self, lst_terms: List[str], lst_dfs: List[int], k: int = 3):
+        # termos em ordem; as listas dos k-gramas guardam a posição do termo
+        # aqui, separadas pelo tamanho do termo: (tamanho, k-grama) -> posições
+        self.k = k
+        self.lst_terms = lst_terms
+        self.lst_dfs = lst_dfs
+        self.dic_kgrams = {}
+        self.dic_lengths = {}
+        for pos, term in enumerate(lst_terms):
+            length = len(term)
+            for kgram in set(kgrams(term, k)):
+                self.dic_kgrams.setdefault((length, kgram), []).append(pos)
+            self.dic_lengths.setdefault(length, []).append(pos)
+
+    @classmethod
+    def build(cls, vocabulary: Iterable[str], document_count_with_term: Callable[[str], int], k: int = 3) -> "KGramIndex":
+        lst_terms = sorted(term for term in vocabulary if term)
+        return cls(lst_terms, [document_count_with_term(term) for term in lst_terms], k)
+
+    def __len__(self) -> int:
+        return len(self.lst_terms)
+
+    def top_by_df(self, lst_positions: Iterable[int], max_expansions: int) -> List[str]:
+        lst_top = heapq.nsmallest(max_expansions, lst_positions, key=lambda pos: (-self.lst_dfs[pos], self.lst_terms[pos]))
+        return [self.lst_terms[pos] for pos in lst_top]
+
+    def prefix_positions(self, prefix: str) -> range:
+        start = bisect.bisect_left(self.lst_terms, prefix)
+        end = bisect.bisect_left(self.lst_terms, prefix + "\U0010ffff")
+        return range(start, end)
+
+    @staticmethod
+    def prefix_slice(lst_positions: List[int], prefix_range: range) -> List[int]:
+        start = bisect.bisect_left(lst_positions, prefix_range.start)
+        end = bisect.bisect_left(lst_positions, prefix_range.stop, start)
+        return lst_positions[start:end]
+
+    @metrics.timed("kgram.wildcard")
+    def wildcard(self, pattern: str, max_expansions: int = 50) -> List[str]:
+        if "*" not in pattern:
+            pos = bisect.bisect_left(self.lst_terms, pattern)
+            return [pattern] if pos < len(self.lst_terms) and self.lst_terms[pos] == pattern else []
+
+        prefix = pattern[:pattern.index("*")]
+        if pattern == prefix + "*":
+            return self.top_by_df(self.prefix_positions(prefix), max_expansions)
+
+        # k-gramas das partes fixas do padrão (com os delimitadores nas pontas)
+        set_kgrams = set()
+        str_boundary = BOUNDARY * (self.k - 1)
+        for piece in f"{str_boundary}{pattern}{str_boundary}".split("*"):
+            set_kgrams.update(piece[i:i + self.k] for i in range(len(piece) - self.k + 1))
+        if set_kgrams:
+            # interseção das listas de cada tamanho que comporta as partes fixas
+            # do padrão; as listas estão em ordem, então o trecho de cada uma
+            # dentro do intervalo do prefixo sai por busca binária
+            min_length = len(pattern) - pattern.count("*")
+            prefix_range = self.prefix_positions(prefix) if prefix else None
+            set_candidates = set()
+            for length in self.dic_lengths:
+                if length < min_length:
+                    continue
+                lst_lists = [self.dic_kgrams.get((length, kgram), []) for kgram in set_kgrams]
+                if prefix_range is not None:
+                    lst_lists = [self.prefix_slice(lst_positions, prefix_range) for lst_positions in lst_lists]
+                lst_lists.sort(key=len)
+                set_length_candidates = set(lst_lists[0])
+                for lst_positions in lst_lists[1:]:
+                    if not set_length_candidates:
+                        break
+                    set_length_candidates.intersection_update(lst_positions)
+                set_candidates |= set_length_candidates
+        elif prefix:
+            set_candidates = self.prefix_positions(prefix)
+        else:
+            set_candidates = range(len(self.lst_terms))
+
+        regex = re.compile(fnmatch.translate(pattern))
+        return self.top_by_df((pos for pos in set_candidates if regex.match(self.lst_terms[pos])), max_expansions)
+
+    def shared_kgram_candidates(self, set_term_kgrams: Set[str], min_shared: int, lst_lengths: Iterable[int]) -> List[int]:
+        """Posições dos termos com os tamanhos de lst_lengths que contêm ao menos min_shared k-gramas de set_term_kgrams"""
+        lst_candidates = []
+        for length in lst_lengths:
+            lst_lists = sorted((self.dic_kgrams.get((length, kgram), []) for kgram in set_term_kgrams), key=len)
+            # quem tem min_shared k-gramas em comum está em ao menos uma das
+            # len(lst_lists) - min_shared + 1 listas menores; nas maiores só
+            # são procurados esses candidatos
+            num_probe = len(lst_lists) - min_shared + 1
+            dic_shared = Counter(chain.from_iterable(lst_lists[:num_probe]))
+            for lst_positions in lst_lists[num_probe:]:
+                dic_shared.update(dic_shared.keys() & lst_positions)
+            lst_candidates += [pos for pos, shared in dic_shared.items() if shared >= min_shared]
+        return lst_candidates
+
+    @metrics.timed("kgram.similar")
+    def similar(self, term: str, max_distance: int = 1, max_expansions: int = 10) -> List[str]:
+        """
+        Termos a até max_distance edições de `term`, do mais próximo ao mais
+        distante (e, com a mesma distância, do maior df ao menor). Só são
+        verificados os termos cujo tamanho difere do termo em até
+        max_distance e, como cada edição altera no máximo k k-gramas, que
+        compartilham ao menos len(kgramas) - k * max_distance k-gramas com o
+        termo (len(term) + k - 1 - k * max_distance, sem k-gramas repetidos).
+        Se esse limite não for positivo (termos muito curtos), todos os termos
+        com tamanho compatível são verificados.
+        """
+        set_term_kgrams = set(kgrams(term, self.k))
+        min_shared = len(set_term_kgrams) - self.k * max_distance
+        lst_lengths = range(max(len(term) - max_distance, 1), len(term) + max_distance + 1)
+
+        if min_shared <= 0:
+            iter_candidates = (pos for length in lst_lengths for pos in self.dic_lengths.get(length, ()))
+        else:
+            iter_candidates = self.shared_kgram_candidates(set_term_kgrams, min_shared, lst_lengths)
+
+        lst_matches = []
+        for pos in iter_candidates:
+            distance = edit_distance(term, self.lst_terms[pos], max_distance)
+            if distance <= max_distance:
+                lst_matches.append((distance, -self.lst_dfs[pos], self.lst_terms[pos]))
+        return [candidate for distance, df, candidate in heapq.nsmallest(max_expansions, lst_matches)]
+
+    def expand(self, term: str, max_distance: int = 1, max_expansions: int = 10) -> List[str]:
+        """Termos do índice para `term`: o próprio termo, as expansões do wildcard ou os termos parecidos"""
+        if "*" in term:
+            return self.wildcard(term, max_expansions)
+        return self.similar(term, max_distance, max_expansions)
@@ -0,0 +1,78 @@
+from index.kgram import KGramIndex, edit_distance, kgrams
+from index.structure import HashIndex, FileIndex
+from random import choice, seed
+import os
+import tempfile
+import unittest
+
+
+class KGramIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.dic_dfs = {"paulo": 30, "paulista": 10, "paula": 5, "saulo": 7, "pauta": 2, "belo": 20,
+                        "horizonte": 15, "horizontal": 3, "ação": 4, "acao": 1}
+        self.kgram_index = KGramIndex.build(self.dic_dfs, self.dic_dfs.get, k=3)
+
+    def test_kgrams_and_edit_distance(self):
+        self.assertListEqual(kgrams("casa", 3), ["$$c", "$ca", "cas", "asa", "sa$", "a$$"])
+        self.assertListEqual(kgrams("a", 3), ["$$a", "$a$", "a$$"])
+        self.assertListEqual(kgrams("a", 2), ["$a", "a$"])
+        self.assertEqual(edit_distance("paulo", "paulo", 2), 0)
+        self.assertEqual(edit_distance("paulo", "pauol", 2), 2)
+        self.assertEqual(edit_distance("paulo", "saulo", 2), 1)
+        self.assertEqual(edit_distance("paulo", "horizonte", 2), 3)
+        self.assertEqual(edit_distance("paulo", "paul", 2), 1)
+        self.assertEqual(edit_distance("ab", "ba", 2), 2)
+        self.assertEqual(edit_distance("cas", "cxs", 1), 1)
+
+    def test_wildcard(self):
+        self.assertListEqual(self.kgram_index.wildcard("paul*"), ["paulo", "paulista", "paula"])
+        self.assertListEqual(self.kgram_index.wildcard("paul*", max_expansions=2), ["paulo", "paulista"])
+        self.assertListEqual(self.kgram_index.wildcard("*ulo"), ["paulo", "saulo"])
+        self.assertListEqual(self.kgram_index.wildcard("horizont*l"), ["horizontal"])
+        self.assertListEqual(self.kgram_index.wildcard("p*a"), ["paulista", "paula", "pauta"])
+        self.assertListEqual(self.kgram_index.wildcard("*a*o"), ["paulo", "saulo", "ação", "acao"])
+        self.assertListEqual(self.kgram_index.wildcard("belo"), ["belo"])
+        self.assertListEqual(self.kgram_index.wildcard("crocodilo*"), [])
+        self.assertEqual(len(self.kgram_index.wildcard("*", max_expansions=100)), len(self.dic_dfs))
+
+    def test_similar(self):
+        self.assertListEqual(self.kgram_index.similar("paulo"), ["paulo", "saulo", "paula"])
+        self.assertListEqual(self.kgram_index.similar("pualo", max_distance=2), ["paulo"])
+        self.assertListEqual(self.kgram_index.similar("horizonet", max_distance=2), ["horizonte"])
+        self.assertListEqual(self.kgram_index.similar("xyz"), [])
+        self.assertListEqual(self.kgram_index.expand("belo*"), ["belo"])
+
+    def test_built_in_finish_indexing(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for index in [HashIndex(), FileIndex(os.path.join(tmp_dir, "occur_index_kgram"))]:
+                index.enable_kgram_index(k=2)
+                index.index("casa", 1, 1)
+                index.index("casas", 2, 1)
+                index.index("casas", 3, 1)
+                index.finish_indexing()
+                self.assertListEqual(index.kgram_index.wildcard("cas*"), ["casas", "casa"])
+                index.index("casaco", 4, 1)
+                index.finish_indexing()
+                self.assertListEqual(index.kgram_index.similar("casaca"), ["casaco"])
+
+    def test_large_vocabulary(self):
+        seed(13)
+        letters = "abcdefghijlmnoprstuv"
+        set_terms = set()
+        while len(set_terms) < 20000:
+            set_terms.add("".join(choice(letters) for i in range(choice(range(3, 12)))))
+        kgram_index = KGramIndex.build(set_terms, lambda term: len(term), k=3)
+
+        #o mesmo resultado de uma varredura do vocabulário
+        #(o tempo por expansão é medido em index/performance_test.py)
+        for term in ["cas", "casa", "paulista"]:
+            lst_expected = sorted((edit_distance(term, candidate, 1), -len(candidate), candidate)
+                                  for candidate in set_terms if edit_distance(term, candidate, 1) <= 1)
+            self.assertListEqual(kgram_index.similar(term, max_expansions=10000),
+                                 [candidate for distance, df, candidate in lst_expected])
+        self.assertListEqual(kgram_index.wildcard("p*a", max_expansions=10000),
+                             sorted((term for term in set_terms if term[0] == "p" and term[-1] == "a"),
+                                    key=lambda term: (-len(term), term)))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,220 @@
+"""
+Léxico compacto (somente leitura) para substituir o dic_index do FileIndex.
+
+Os termos ficam ordenados em um único arquivo, acessado por mmap:
+
+    cabeçalho:   MAGIC, quantidade de termos n, termos por bloco, quantidade de blocos
+    posições:    n uint64, term_file_start_pos de cada termo (NO_POSITION = None)
+    term_ids:    n uint32
+    dfs:         n uint32, doc_count_with_term (NO_DF = None)
+    blocos:      (quantidade de blocos + 1) uint32, início de cada bloco
+    termos:      blocos com codificação front coding: o primeiro termo do bloco
+                 é gravado inteiro e os demais como (prefixo comum com o anterior,
+                 sufixo), em UTF-8 e varints
+
+O i-ésimo termo em ordem tem seus valores na posição i de cada vetor. A
+busca exata é uma busca binária pelo primeiro termo de cada bloco seguida da
+leitura de um bloco, e a busca por prefixo percorre os blocos a partir daí.
+O léxico implementa Mapping, então pode ser usado no lugar do dicionário;
+as entradas são criadas na consulta (LexiconEntry).
+"""
+from typing import Iterable, Iterator, Optional, Tuple
+from collections.abc import ItemsView, Mapping
+from array import array
+import mmap
+import struct
+import sys
+
+from util.encoding import encode_varint, decode_varint
+
+MAGIC = b"RILEXIC1"
+HEADER = struct.Struct("<8sQII")
+NO_POSITION = 2 ** 64 - 1
+NO_DF = 2 ** 32 - 1
+
+
+class LexiconEntry:
+    __slots__ = ("term_id", "term_file_start_pos", "doc_count_with_term")
+
+    def __init__(self, term_id: int, term_file_start_pos: Optional[int], doc_count_with_term: Optional[int]):
+        self.term_id = term_id
+        self.term_file_start_pos = term_file_start_pos
+        self.doc_count_with_term = doc_count_with_term
+
+    def __str__(self):
+        return f"term_id: {self.term_id}, doc_count_with_term: {self.doc_count_with_term}, term_file_start_pos: {self.term_file_start_pos}"
+
+    def __repr__(self):
+        return str(self)
+
+
+class LexiconItemsView(ItemsView):
+    def __iter__(self):
+        return self._mapping.iter_items()
+
+
+class Lexicon(Mapping):
+    def __init__(self, str_file_name: str):
+        if sys.byteorder != "little":
+            raise NotImplementedError("Lexicon só é suportado em plataformas little-endian")
+        self.str_file_name = str_file_name
+        self.open()
+
+    @staticmethod
+    def build(iter_items: Iterable[Tuple[str, object]], str_file_name: str, block_size: int = 16) -> int:
+        """
+        Grava o léxico dos pares (termo, entrada) - a entrada tem term_id,
+        term_file_start_pos e doc_count_with_term (ex.: TermFilePosition)
+        """
+        arr_positions = array("Q")
+        arr_term_ids = array("I")
+        arr_dfs = array("I")
+        arr_block_offsets = array("I")
+        arr_terms = bytearray()
+        previous = b""
+        for rank, (term, entry) in enumerate(sorted(iter_items, key=lambda item: item[0])):
+            arr_term = term.encode("utf-8")
+            if rank % block_size == 0:
+                arr_block_offsets.append(len(arr_terms))
+                arr_terms += encode_varint(len(arr_term)) + arr_term
+            else:
+                shared = 0
+                while shared < min(len(previous), len(arr_term)) and previous[shared] == arr_term[shared]:
+                    shared += 1
+                arr_terms += encode_varint(shared) + encode_varint(len(arr_term) - shared) + arr_term[shared:]
+            previous = arr_term
+            arr_positions.append(NO_POSITION if entry.term_file_start_pos is None else entry.term_file_start_pos)
+            arr_term_ids.append(entry.term_id)
+            arr_dfs.append(NO_DF if entry.doc_count_with_term is None else entry.doc_count_with_term)
+        num_blocks = len(arr_block_offsets)
+        arr_block_offsets.append(len(arr_terms))
+
+        with open(str_file_name, "wb") as file:
+            file.write(HEADER.pack(MAGIC, len(arr_term_ids), block_size, num_blocks))
+            for arr_values in (arr_positions, arr_term_ids, arr_dfs, arr_block_offsets):
+                arr_values.tofile(file)
+            file.write(arr_terms)
+        return len(arr_term_ids)
+
+    def open(self):
+        with open(self.str_file_name, "rb") as file:
+            self.mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self.block_size, self.num_blocks = HEADER.unpack_from(self.mm)
+        if magic != MAGIC:
+            raise ValueError(f"{self.str_file_name} não é um arquivo de léxico")
+        buffer = memoryview(self.mm)
+        pos = HEADER.size
+        self.positions = buffer[pos:pos + 8 * self.count].cast("Q")
+        pos += 8 * self.count
+        self.term_ids = buffer[pos:pos + 4 * self.count].cast("I")
+        pos += 4 * self.count
+        self.dfs = buffer[pos:pos + 4 * self.count].cast("I")
+        pos += 4 * self.count
+        self.block_offsets = buffer[pos:pos + 4 * (self.num_blocks + 1)].cast("I")
+        self.start_terms = pos + 4 * (self.num_blocks + 1)
+
+    def close(self):
+        for view in (self.positions, self.term_ids, self.dfs, self.block_offsets):
+            view.release()
+        self.mm.close()
+
+    def entry(self, rank: int) -> LexiconEntry:
+        position = self.positions[rank]
+        df = self.dfs[rank]
+        return LexiconEntry(self.term_ids[rank],
+                            None if position == NO_POSITION else position,
+                            None if df == NO_DF else df)
+
+    def first_term(self, block: int) -> bytes:
+        pos = self.start_terms + self.block_offsets[block]
+        length, pos = decode_varint(self.mm, pos)
+        return self.mm[pos:pos + length]
+
+    def iter_block(self, block: int) -> Iterator[Tuple[int, bytes]]:
+        """(posição do termo na ordem, termo em UTF-8) de cada termo do bloco"""
+        pos = self.start_terms + self.block_offsets[block]
+        end = self.start_terms + self.block_offsets[block + 1]
+        length, pos = decode_varint(self.mm, pos)
+        term = self.mm[pos:pos + length]
+        pos += length
+        rank = block * self.block_size
+        yield rank, term
+        while pos < end:
+            shared, pos = decode_varint(self.mm, pos)
+            length, pos = decode_varint(self.mm, pos)
+            term = term[:shared] + self.mm[pos:pos + length]
+            pos += length
+            rank += 1
+            yield rank, term
+
+    def find_block(self, arr_term: bytes) -> int:
+        """Último bloco cujo primeiro termo é <= arr_term (-1 se não houver)"""
+        lo, hi = 0, self.num_blocks
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.first_term(mid) <= arr_term:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo - 1
+
+    def rank(self, term: str) -> int:
+        """Posição do termo na ordem (-1 se ele não estiver no léxico)"""
+        if not isinstance(term, str):
+            return -1
+        arr_term = term.encode("utf-8")
+        block = self.find_block(arr_term)
+        if block < 0:
+            return -1
+        for rank, arr_block_term in self.iter_block(block):
+            if arr_block_term == arr_term:
+                return rank
+            if arr_block_term > arr_term:
+                break
+        return -1
+
+    def __getitem__(self, term: str) -> LexiconEntry:
+        rank = self.rank(term)
+        if rank < 0:
+            raise KeyError(term)
+        return self.entry(rank)
+
+    def __contains__(self, term) -> bool:
+        return self.rank(term) >= 0
+
+    def __setitem__(self, term, entry):
+        raise TypeError("O léxico compacto é somente leitura")
+
+    def __len__(self) -> int:
+        return self.count
+
+    def iter_ranked_terms(self, first_block: int = 0) -> Iterator[Tuple[int, bytes]]:
+        for block in range(first_block, self.num_blocks):
+            yield from self.iter_block(block)
+
+    def __iter__(self) -> Iterator[str]:
+        for rank, arr_term in self.iter_ranked_terms():
+            yield arr_term.decode("utf-8")
+
+    def iter_items(self) -> Iterator[Tuple[str, LexiconEntry]]:
+        for rank, arr_term in self.iter_ranked_terms():
+            yield arr_term.decode("utf-8"), self.entry(rank)
+
+    def items(self) -> LexiconItemsView:
+        return LexiconItemsView(self)
+
+    def prefix(self, prefix: str) -> Iterator[Tuple[str, LexiconEntry]]:
+        """Termos (e entradas) que começam com `prefix`, em ordem"""
+        arr_prefix = prefix.encode("utf-8")
+        for rank, arr_term in self.iter_ranked_terms(max(self.find_block(arr_prefix), 0)):
+            if arr_term.startswith(arr_prefix):
+                yield arr_term.decode("utf-8"), self.entry(rank)
+            elif arr_term > arr_prefix:
+                break
+
+    def __getstate__(self):
+        return {"str_file_name": self.str_file_name}
+
+    def __setstate__(self, dic_state):
+        self.str_file_name = dic_state["str_file_name"]
+        self.open()
@@ -0,0 +1,77 @@
+from index.lexicon import Lexicon
+from index.structure import FileIndex, Index, TermFilePosition
+import os
+import tempfile
+import unittest
+
+
+class LexiconTest(unittest.TestCase):
+    TERMS = ["casa", "casaco", "casamento", "casas", "cavalo", "ação", "zebra", "a", "árvore", "b"]
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.str_file = os.path.join(self.tmp_dir.name, "lexicon.lex")
+        self.dic_index = {term: TermFilePosition(term_id, term_id * 100, term_id + 1)
+                          for term_id, term in enumerate(LexiconTest.TERMS)}
+        self.dic_index["b"].term_file_start_pos = None
+        self.dic_index["b"].doc_count_with_term = None
+        Lexicon.build(self.dic_index.items(), self.str_file, block_size=3)
+        self.lexicon = Lexicon(self.str_file)
+
+    def tearDown(self):
+        self.lexicon.close()
+        self.tmp_dir.cleanup()
+
+    def test_lookup(self):
+        self.assertEqual(len(self.lexicon), len(LexiconTest.TERMS))
+        for term, entry in self.dic_index.items():
+            self.assertIn(term, self.lexicon)
+            self.assertEqual(self.lexicon[term].term_id, entry.term_id)
+            self.assertEqual(self.lexicon[term].term_file_start_pos, entry.term_file_start_pos)
+            self.assertEqual(self.lexicon[term].doc_count_with_term, entry.doc_count_with_term)
+        for term in ["", "c", "casad", "zzz", "0", None]:
+            self.assertNotIn(term, self.lexicon)
+        self.assertRaises(KeyError, lambda: self.lexicon["crocodilo"])
+        self.assertIsNone(self.lexicon.get("crocodilo"))
+        self.assertRaises(TypeError, self.lexicon.__setitem__, "crocodilo", None)
+
+    def test_iteration_and_prefix(self):
+        self.assertListEqual(list(self.lexicon), sorted(LexiconTest.TERMS))
+        self.assertListEqual([term for term, entry in self.lexicon.items()], sorted(LexiconTest.TERMS))
+        self.assertListEqual([term for term, entry in self.lexicon.prefix("casa")], ["casa", "casaco", "casamento", "casas"])
+        self.assertListEqual([entry.term_id for term, entry in self.lexicon.prefix("cav")], [4])
+        self.assertListEqual(list(self.lexicon.prefix("x")), [])
+        self.assertEqual(len(list(self.lexicon.prefix(""))), len(LexiconTest.TERMS))
+
+    def test_file_index(self):
+        index = FileIndex(os.path.join(self.tmp_dir.name, "occur_index"))
+        for doc_id, term, term_freq in [(1, "casa", 2), (1, "verde", 1), (2, "casa", 1), (3, "ação", 4)]:
+            index.index(term, doc_id, term_freq)
+        index.finish_indexing()
+        index.freeze_lexicon()
+        self.assertIsInstance(index.dic_index, Lexicon)
+        self.assertEqual(index.get_term_id("verde"), 1)
+        self.assertListEqual([occur.doc_id for occur in index.get_occurrence_list("casa")], [1, 2])
+        self.assertEqual(index.document_count_with_term("ação"), 1)
+        self.assertListEqual(list(index.vocabulary), ["ação", "casa", "verde"])
+
+        #o léxico é reaberto após o pickle
+        str_pickle = os.path.join(self.tmp_dir.name, "index.pickle")
+        index.save(str_pickle)
+        loaded_index = Index.load(str_pickle)
+        self.assertEqual(loaded_index.document_count_with_term("casa"), 2)
+        loaded_index.dic_index.close()
+
+        #novas ocorrências voltam a usar o dicionário
+        index.index("azul", 4, 1)
+        index.delete_document(2)
+        index.finish_indexing()
+        self.assertIsInstance(index.dic_index, dict)
+        index.freeze_lexicon()
+        self.assertListEqual([occur.doc_id for occur in index.get_occurrence_list("casa")], [1])
+        self.assertEqual(index.document_count_with_term("azul"), 1)
+        index.dic_index.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
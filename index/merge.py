@@ -0,0 +1,164 @@
+"""
+Merge offline de índices (FileIndex) construídos de forma independente.
+
+Cada índice de origem tem seu próprio espaço de term_ids (atribuídos na ordem
+de inserção). O merge monta um léxico único com os termos em ordem
+alfabética (o term_id novo é a posição do termo) e uma tabela, por origem,
+term_id de origem -> term_id novo.
+
+Os arquivos de origem são lidos uma única vez, em sequência (sem seek por
+termo), já com o term_id remapeado. Se o remapeamento preserva a ordem dos
+term_ids da origem (ex.: uma origem que já é resultado de um merge), o
+arquivo é usado diretamente como uma sequência ordenada; senão as
+ocorrências são ordenadas por (term_id novo, doc_id) em blocos de até
+`memory_budget` bytes, gravados em arquivos temporários (runs). Todas as
+sequências são intercaladas (heapq.merge) e gravadas no arquivo novo,
+registrando a posição e a quantidade de documentos de cada termo.
+
+Os índices de origem devem cobrir documentos disjuntos; se um doc_id aparecer
+em mais de um índice para o mesmo termo, vale a ocorrência do primeiro.
+
+Uso: python -m index.merge SAIDA ENTRADA [ENTRADA ...] [--prefix PREFIXO]
+"""
+from typing import Iterator, List, Mapping, Tuple
+import heapq
+import os
+
+from index.structure import FileIndex, TermFilePosition, TermOccurrence
+from util.metrics import metrics
+
+
+def read_occurrences(index: FileIndex, str_file_name: str = None) -> Iterator[TermOccurrence]:
+    """Ocorrências de um arquivo de ocorrências (por padrão, o de `index`), na ordem em que foram gravadas"""
+    with open(str_file_name or index.str_idx_file_name, "rb") as idx_file:
+        occurrence = index.next_from_file(idx_file)
+        while occurrence is not None:
+            yield occurrence
+            occurrence = index.next_from_file(idx_file)
+
+
+def remap_occurrences(index: FileIndex, dic_term_ids: Mapping[int, int]) -> Iterator[Tuple[int, int, int]]:
+    """(term_id novo, doc_id, term_freq) das ocorrências de `index`, sem os documentos removidos"""
+    for occurrence in read_occurrences(index):
+        if occurrence.doc_id not in index.deleted_docs:
+            yield dic_term_ids[occurrence.term_id], occurrence.doc_id, occurrence.term_freq
+
+
+def preserves_order(dic_term_ids: Mapping[int, int]) -> bool:
+    lst_new_ids = [dic_term_ids[term_id] for term_id in sorted(dic_term_ids)]
+    return all(previous < next_id for previous, next_id in zip(lst_new_ids, lst_new_ids[1:]))
+
+
+def write_runs(iter_occurrences: Iterator[Tuple[int, int, int]], str_file_prefix: str, memory_budget: int) -> List[str]:
+    """Grava as ocorrências em arquivos ordenados de até memory_budget bytes (em memória); retorna os nomes"""
+    lst_runs = []
+    lst_buffer = []
+
+    def write_run():
+        lst_buffer.sort()
+        str_run_file = f"{str_file_prefix}_{len(lst_runs)}.run"
+        with open(str_run_file, "wb") as run_file:
+            for term_id, doc_id, term_freq in lst_buffer:
+                TermOccurrence(doc_id, term_id, term_freq).write(run_file)
+        lst_runs.append(str_run_file)
+        lst_buffer.clear()
+
+    for occurrence in iter_occurrences:
+        lst_buffer.append(occurrence)
+        if len(lst_buffer) * FileIndex.OCCURRENCE_BYTES >= memory_budget:
+            write_run()
+    if lst_buffer:
+        write_run()
+    return lst_runs
+
+
+def tag_source(iter_occurrences, source: int) -> Iterator[Tuple[int, int, int, int]]:
+    # a origem entra na chave para que, no mesmo (termo, doc_id), vença a do primeiro índice
+    for term_id, doc_id, term_freq in iter_occurrences:
+        yield term_id, doc_id, source, term_freq
+
+
+def read_run(index: FileIndex, str_run_file: str) -> Iterator[Tuple[int, int, int]]:
+    for occurrence in read_occurrences(index, str_run_file):
+        yield occurrence.term_id, occurrence.doc_id, occurrence.term_freq
+
+
+@metrics.timed("merge.indexes")
+def merge_indexes(lst_indexes: List[FileIndex], str_file_prefix: str = "merged_index",
+                  memory_budget: int = None) -> FileIndex:
+    """Junta os índices finalizados de `lst_indexes` em um novo FileIndex gravado em `{str_file_prefix}_0.idx`"""
+    for index in lst_indexes:
+        if index.lst_occurrences_tmp:
+            raise ValueError(f"O índice {index.str_idx_file_name} possui ocorrências em memória: chame finish_indexing antes do merge")
+    if memory_budget is None:
+        memory_budget = FileIndex.DEFAULT_MEMORY_BUDGET
+
+    merged_index = FileIndex(str_file_prefix)
+    merged_index.str_idx_file_name = f"{str_file_prefix}_{merged_index.idx_file_counter}.idx"
+    for index in lst_indexes:
+        merged_index.set_documents.update(index.set_documents)
+
+    lst_terms = sorted(set().union(*[index.dic_index for index in lst_indexes]))
+    dic_new_term_ids = {term: term_id for term_id, term in enumerate(lst_terms)}
+    lst_entries = [TermFilePosition(term_id, None, 0) for term_id in range(len(lst_terms))]
+
+    lst_sources = []
+    lst_run_files = []
+    try:
+        for source, index in enumerate(lst_indexes):
+            if index.str_idx_file_name is None:
+                continue
+            dic_term_ids = {entry.term_id: dic_new_term_ids[term] for term, entry in index.dic_index.items()}
+            if preserves_order(dic_term_ids):
+                lst_sources.append(tag_source(remap_occurrences(index, dic_term_ids), source))
+                continue
+            lst_index_runs = write_runs(remap_occurrences(index, dic_term_ids),
+                                        f"{str_file_prefix}_{source}", memory_budget)
+            lst_run_files += lst_index_runs
+            metrics.inc("merge.runs", len(lst_index_runs))
+            lst_sources += [tag_source(read_run(index, str_run_file), source) for str_run_file in lst_index_runs]
+
+        with open(merged_index.str_idx_file_name, "wb") as new_file:
+            last_term_id, last_doc_id = None, None
+            for term_id, doc_id, source, term_freq in heapq.merge(*lst_sources):
+                if term_id == last_term_id and doc_id == last_doc_id:
+                    continue
+                entry = lst_entries[term_id]
+                if entry.term_file_start_pos is None:
+                    entry.term_file_start_pos = new_file.tell()
+                TermOccurrence(doc_id, term_id, term_freq).write(new_file)
+                entry.doc_count_with_term += 1
+                last_term_id, last_doc_id = term_id, doc_id
+    finally:
+        for str_run_file in lst_run_files:
+            if os.path.exists(str_run_file):
+                os.remove(str_run_file)
+
+    # termos sem entrada no arquivo (todas as ocorrências eram de documentos removidos) ficam com posição None
+    for term, entry in zip(lst_terms, lst_entries):
+        merged_index.dic_index[term] = entry
+    metrics.inc("merge.terms", len(lst_terms))
+    return merged_index
+
+
+def main():
+    import argparse
+    from index.structure import Index
+
+    parser = argparse.ArgumentParser(description="Junta índices salvos com Index.save (--output do index.indexer)")
+    parser.add_argument("output", help="arquivo onde o indice resultante será salvo")
+    parser.add_argument("inputs", nargs="+", help="índices a serem juntados")
+    parser.add_argument("--prefix", default=None, help="prefixo do arquivo de ocorrências do indice resultante")
+    parser.add_argument("--memory-budget", type=float, default=None,
+                        help="MB de ocorrências ordenadas em memória por arquivo temporário")
+    args = parser.parse_args()
+
+    str_prefix = args.prefix if args.prefix is not None else os.path.splitext(args.output)[0]
+    memory_budget = int(args.memory_budget * 1024 * 1024) if args.memory_budget is not None else None
+    merged_index = merge_indexes([Index.load(str_file) for str_file in args.inputs], str_prefix, memory_budget)
+    merged_index.save(args.output)
+    print(f"{merged_index.document_count} documentos, {len(merged_index.dic_index)} termos em {merged_index.str_idx_file_name}")
+
+
+if __name__ == '__main__':
+    main()
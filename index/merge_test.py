@@ -0,0 +1,93 @@
+from index.merge import merge_indexes
+from index.structure import FileIndex, HashIndex
+from random import randrange, seed
+import os
+import tempfile
+import unittest
+
+
+class MergeIndexesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def create_indexes(self, num_indexes: int):
+        seed(3)
+        vocabulary = ["casa", "verde", "azul", "predio", "rua", "janela", "porta", "xicara"]
+        lst_indexes = [FileIndex(os.path.join(self.tmp_dir.name, f"part_{i}")) for i in range(num_indexes)]
+        expected_index = HashIndex()
+        for doc_id in range(1, 31):
+            #cada parte indexa um pedaço disjunto da coleção, com seus proprios term_ids
+            index = lst_indexes[(doc_id - 1) // 10]
+            for term in set(vocabulary[randrange(len(vocabulary))] for i in range(4)):
+                freq = randrange(1, 5)
+                index.index(term, doc_id, freq)
+                expected_index.index(term, doc_id, freq)
+        for index in lst_indexes:
+            index.finish_indexing()
+        return lst_indexes, expected_index
+
+    def assert_same_index(self, index, expected_index):
+        self.assertEqual(index.document_count, expected_index.document_count)
+        self.assertCountEqual(index.vocabulary, expected_index.vocabulary)
+        for term in expected_index.vocabulary:
+            lst_expected = [(occur.doc_id, occur.term_freq) for occur in expected_index.get_occurrence_list(term)]
+            lst_occur = index.get_occurrence_list(term)
+            self.assertListEqual([(occur.doc_id, occur.term_freq) for occur in lst_occur], lst_expected)
+            self.assertTrue(all(occur.term_id == index.get_term_id(term) for occur in lst_occur))
+            self.assertEqual(index.document_count_with_term(term), len(lst_expected))
+
+    def test_merge(self):
+        lst_indexes, expected_index = self.create_indexes(3)
+        merged_index = merge_indexes(lst_indexes, os.path.join(self.tmp_dir.name, "merged"))
+        self.assert_same_index(merged_index, expected_index)
+
+        #o lexico resultante é ordenado e os term_ids seguem essa ordem
+        self.assertListEqual(list(merged_index.vocabulary), sorted(expected_index.vocabulary))
+        self.assertListEqual([merged_index.get_term_id(term) for term in merged_index.vocabulary],
+                             list(range(len(merged_index.vocabulary))))
+
+        #o indice resultante continua recebendo documentos
+        merged_index.index("crocodilo", 40, 2)
+        expected_index.index("crocodilo", 40, 2)
+        merged_index.finish_indexing()
+        self.assert_same_index(merged_index, expected_index)
+
+    def test_merge_with_deleted_docs(self):
+        lst_indexes, expected_index = self.create_indexes(3)
+        for doc_id in [1, 15, 30]:
+            lst_indexes[(doc_id - 1) // 10].delete_document(doc_id)
+            expected_index.delete_document(doc_id)
+        merged_index = merge_indexes(lst_indexes, os.path.join(self.tmp_dir.name, "merged"))
+        self.assertEqual(len(merged_index.deleted_docs), 0)
+        self.assert_same_index(merged_index, expected_index)
+
+    def test_merge_sorted_runs(self):
+        #orçamento de 5 ocorrências: cada origem é ordenada em vários arquivos temporários
+        lst_indexes, expected_index = self.create_indexes(3)
+        merged_index = merge_indexes(lst_indexes, os.path.join(self.tmp_dir.name, "merged"),
+                                     memory_budget=5 * FileIndex.OCCURRENCE_BYTES)
+        self.assert_same_index(merged_index, expected_index)
+        self.assertFalse([str_file for str_file in os.listdir(self.tmp_dir.name) if str_file.endswith(".run")])
+
+        #um índice já juntado tem os term_ids em ordem alfabética e é lido sem ordenação
+        new_index = FileIndex(os.path.join(self.tmp_dir.name, "part_new"))
+        new_index.index("abacate", 50, 3)
+        new_index.index("casa", 50, 1)
+        new_index.finish_indexing()
+        expected_index.index("abacate", 50, 3)
+        expected_index.index("casa", 50, 1)
+        merged_again = merge_indexes([merged_index, new_index], os.path.join(self.tmp_dir.name, "merged_again"),
+                                     memory_budget=5 * FileIndex.OCCURRENCE_BYTES)
+        self.assert_same_index(merged_again, expected_index)
+
+    def test_unfinished_index(self):
+        index = FileIndex(os.path.join(self.tmp_dir.name, "part"))
+        index.index("casa", 1, 1)
+        self.assertRaises(ValueError, merge_indexes, [index], os.path.join(self.tmp_dir.name, "merged"))
+
+
+if __name__ == "__main__":
+    unittest.main()
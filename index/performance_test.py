@@ -1,11 +1,13 @@
 from IPython.display import clear_output
 from index.structure import *
+from index.kgram import KGramIndex
 
 from datetime import datetime
 import math
 import tracemalloc
 import unittest
-from random import randrange,seed
+from random import randrange,seed,choice
+from time import perf_counter
 
 
 
@@ -34,7 +36,10 @@ class PerformanceTest(unittest.TestCase):
         current, peak = tracemalloc.get_traced_memory()
 
         clear_output(wait=True)
-        print(f"Memoria usada: {current / 10**6:,} MB; Máximo {peak / 10**6:,} MB")
+        print(f"Memoria usada: {current / 2**20:,.1f} MB; Máximo {peak / 2**20:,.1f} MB")
+        if isinstance(self.index, FileIndex):
+            print(f"Ocorrências em memória: máximo {self.index.peak_tmp_occurrences_bytes / 2**20:,.1f} MB "
+                  f"(orçamento {self.index.memory_budget / 2**20:,.1f} MB)")
         print(f"Indexando ocorrencia #{count:,}/{total:,} ({porc_complete}%)")
         print(f"Tempo gasto: {delta.total_seconds()}s")
 
@@ -66,6 +71,28 @@ class PerformanceTest(unittest.TestCase):
         self.print_status(total,total)
         tracemalloc.stop()
 
+class KGramPerformanceTest(unittest.TestCase):
+    NUM_TERMS = 200000
+
+    def test_performance(self):
+        print("Criando vocabulário...")
+        seed(13)
+        letters = "abcdefghijlmnoprstuv"
+        set_terms = set()
+        while len(set_terms) < KGramPerformanceTest.NUM_TERMS:
+            set_terms.add("".join(choice(letters) for i in range(choice(range(3, 12)))))
+        start = perf_counter()
+        kgram_index = KGramIndex.build(set_terms, lambda term: len(term), k=3)
+        print(f"Índice de k-gramas: {len(set_terms):,} termos em {perf_counter() - start:.2f}s")
+
+        lst_queries = ["cas", "casa", "pa*", "p*a", "*ulo"]
+        for term in sorted(set_terms)[::4000]:
+            lst_queries += [term[:-1] + "x", term[:2] + "*", term[:2] + "*" + term[-2:]]
+        start = perf_counter()
+        for query in lst_queries:
+            kgram_index.expand(query)
+        print(f"Expansão: {(perf_counter() - start) / len(lst_queries) * 1000:.3f} ms por consulta, em média")
+
 import time
 class FilePerformanceTest(PerformanceTest):
     def setUp(self):
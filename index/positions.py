@@ -0,0 +1,147 @@
+"""
+Posições dos termos nos documentos, gravadas fora do arquivo de ocorrências.
+
+As listas de ocorrências continuam só com (doc_id, term_id, term_freq): as
+posições ficam em um arquivo à parte e só são lidas por consultas de frase
+ou proximidade, e apenas para os documentos candidatos (que já contêm todos
+os termos). Cada documento é um bloco no arquivo:
+
+    para cada termo do documento, em ordem alfabética:
+        len(termo) termo quantidade_posições len(gaps) gaps
+
+(inteiros em varint, posições como diferenças; ver util/encoding.py). Em
+memória fica apenas doc_id -> (início, tamanho) do bloco. Os termos são
+gravados por extenso para que o arquivo continue válido quando os term_ids
+mudam (ex.: index/merge.py).
+
+A posição de um termo é o índice do token no texto, contando também os tokens
+descartados na limpeza (stop words), para que "Belo Horizonte" e
+"Universidade de São Paulo" sejam comparados pela distância original.
+"""
+from typing import Iterable, List, Mapping, Set
+import bisect
+import os
+
+from util.encoding import encode_varint, decode_varint, decode_gaps, encode_gaps
+from util.metrics import metrics
+
+
+class PositionStore:
+    def __init__(self, str_file_name: str):
+        self.str_file_name = str_file_name
+        self.dic_doc_blocks = {}
+        self.file = None
+
+    def add_document(self, doc_id: int, dic_term_positions: Mapping[str, List[int]]):
+        """Grava as posições (crescentes) de cada termo do documento; substitui o bloco anterior do doc_id"""
+        arr_block = bytearray()
+        for term in sorted(dic_term_positions):
+            arr_term = term.encode("utf-8")
+            arr_gaps = encode_gaps(dic_term_positions[term])
+            arr_block += encode_varint(len(arr_term)) + arr_term
+            arr_block += encode_varint(len(dic_term_positions[term])) + encode_varint(len(arr_gaps)) + arr_gaps
+        if self.file is None:
+            self.file = open(self.str_file_name, "ab")
+        self.dic_doc_blocks[doc_id] = (self.file.tell(), len(arr_block))
+        self.file.write(arr_block)
+
+    def delete_document(self, doc_id: int):
+        self.dic_doc_blocks.pop(doc_id, None)
+
+    def flush(self):
+        if self.file is not None:
+            self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __contains__(self, doc_id: int) -> bool:
+        return doc_id in self.dic_doc_blocks
+
+    @staticmethod
+    def decode_block(arr_block: bytes, set_terms: Set[str]) -> Mapping[str, List[int]]:
+        dic_positions = {}
+        pos = 0
+        while pos < len(arr_block) and len(dic_positions) < len(set_terms):
+            term_len, pos = decode_varint(arr_block, pos)
+            term = arr_block[pos:pos + term_len].decode("utf-8")
+            pos += term_len
+            count, pos = decode_varint(arr_block, pos)
+            gaps_len, pos = decode_varint(arr_block, pos)
+            if term in set_terms:
+                dic_positions[term], _ = decode_gaps(arr_block, count, pos)
+            pos += gaps_len
+        return dic_positions
+
+    def get_positions(self, doc_ids: Iterable[int], set_terms: Set[str]) -> Mapping[int, Mapping[str, List[int]]]:
+        """Posições dos termos de `set_terms` em cada documento de `doc_ids` (um único arquivo aberto)"""
+        self.flush()
+        dic_doc_positions = {}
+        with open(self.str_file_name, "rb") as file:
+            # blocos lidos na ordem do arquivo
+            for doc_id in sorted((doc_id for doc_id in doc_ids if doc_id in self.dic_doc_blocks),
+                                 key=lambda doc_id: self.dic_doc_blocks[doc_id][0]):
+                start, length = self.dic_doc_blocks[doc_id]
+                file.seek(start)
+                dic_doc_positions[doc_id] = self.decode_block(file.read(length), set_terms)
+        metrics.inc("positions.blocks_read", len(dic_doc_positions))
+        return dic_doc_positions
+
+    def compact(self, str_new_file_name: str = None):
+        """Reescreve o arquivo apenas com os blocos vigentes (removidos/atualizados ficam de fora)"""
+        self.close()
+        str_new_file_name = str_new_file_name or self.str_file_name + ".tmp"
+        dic_new_blocks = {}
+        with open(self.str_file_name, "rb") as file, open(str_new_file_name, "wb") as new_file:
+            for doc_id, (start, length) in sorted(self.dic_doc_blocks.items(), key=lambda item: item[1][0]):
+                file.seek(start)
+                dic_new_blocks[doc_id] = (new_file.tell(), length)
+                new_file.write(file.read(length))
+        os.replace(str_new_file_name, self.str_file_name)
+        self.dic_doc_blocks = dic_new_blocks
+
+    def __getstate__(self):
+        self.flush()
+        dic_state = self.__dict__.copy()
+        dic_state["file"] = None
+        return dic_state
+
+
+def query_term_offsets(lst_tokens: List[str], preprocess) -> List[tuple]:
+    """(deslocamento, termo) dos tokens da consulta que sobrevivem à limpeza"""
+    lst_offsets = []
+    for offset, token in enumerate(lst_tokens):
+        term = preprocess(token)
+        if term:
+            lst_offsets.append((offset, term))
+    return lst_offsets
+
+
+def match_phrase(dic_positions: Mapping[str, List[int]], lst_offsets: List[tuple], max_distance: int = 0) -> bool:
+    """
+    Verifica se os termos ocorrem na ordem de `lst_offsets` [(deslocamento, termo), ...]
+    com a mesma distância entre si da consulta, admitindo até `max_distance`
+    tokens a mais entre dois termos consecutivos (0 = frase exata).
+    """
+    if not lst_offsets:
+        return False
+    first_offset, first_term = lst_offsets[0]
+    lst_reachable = dic_positions.get(first_term, [])
+    last_offset = first_offset
+    for offset, term in lst_offsets[1:]:
+        lst_positions = dic_positions.get(term, [])
+        min_gap = offset - last_offset
+        lst_next = []
+        for position in lst_reachable:
+            i = bisect.bisect_left(lst_positions, position + min_gap)
+            while i < len(lst_positions) and lst_positions[i] <= position + min_gap + max_distance:
+                lst_next.append(lst_positions[i])
+                i += 1
+        # posições alcançáveis do termo atual, ordenadas e sem repetição
+        lst_reachable = sorted(set(lst_next))
+        if not lst_reachable:
+            return False
+        last_offset = offset
+    return len(lst_reachable) > 0
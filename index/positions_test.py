@@ -0,0 +1,58 @@
+from index.positions import PositionStore, match_phrase, query_term_offsets
+import os
+import pickle
+import tempfile
+import unittest
+
+
+class PositionStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = PositionStore(os.path.join(self.tmp_dir.name, "positions.pos"))
+        self.store.add_document(1, {"belo": [0, 10], "horizonte": [1, 300], "ação": [5]})
+        self.store.add_document(2, {"horizonte": [2], "belo": [7]})
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp_dir.cleanup()
+
+    def test_get_positions(self):
+        dic_doc_positions = self.store.get_positions([2, 1, 3], {"belo", "ação"})
+        self.assertDictEqual(dic_doc_positions, {1: {"belo": [0, 10], "ação": [5]}, 2: {"belo": [7]}})
+
+        #atualização e remoção
+        self.store.add_document(2, {"belo": [4]})
+        self.store.delete_document(1)
+        self.assertDictEqual(self.store.get_positions([1, 2], {"belo"}), {2: {"belo": [4]}})
+        size = os.path.getsize(self.store.str_file_name)
+        self.store.compact()
+        self.assertLess(os.path.getsize(self.store.str_file_name), size)
+        self.assertDictEqual(self.store.get_positions([1, 2], {"belo"}), {2: {"belo": [4]}})
+
+        #após o pickle, o arquivo continua sendo usado
+        store = pickle.loads(pickle.dumps(self.store))
+        store.add_document(5, {"casa": [1]})
+        self.assertDictEqual(store.get_positions([2, 5], {"belo", "casa"}), {2: {"belo": [4]}, 5: {"casa": [1]}})
+        store.close()
+
+    def test_match_phrase(self):
+        dic_positions = {"belo": [0, 10], "horizonte": [1, 300], "universidade": [20], "paulo": [23]}
+        lst_offsets = query_term_offsets("Belo Horizonte".split(" "), str.lower)
+        self.assertTrue(match_phrase(dic_positions, lst_offsets))
+        self.assertFalse(match_phrase(dic_positions, query_term_offsets(["horizonte", "belo"], str.lower)))
+
+        #"de" e "são" foram descartados da consulta, mas contam na distância
+        lst_offsets = [(0, "universidade"), (3, "paulo")]
+        self.assertTrue(match_phrase(dic_positions, lst_offsets))
+        self.assertFalse(match_phrase(dic_positions, [(0, "universidade"), (1, "paulo")]))
+        self.assertTrue(match_phrase(dic_positions, [(0, "universidade"), (1, "paulo")], max_distance=2))
+
+        #a escolha da posição intermediária não pode ser gulosa
+        dic_positions = {"a": [0], "b": [1, 3], "c": [6]}
+        self.assertTrue(match_phrase(dic_positions, [(0, "a"), (1, "b"), (2, "c")], max_distance=2))
+        self.assertFalse(match_phrase(dic_positions, [(0, "a"), (1, "b"), (2, "c")], max_distance=1))
+        self.assertFalse(match_phrase(dic_positions, []))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,207 @@
+"""
+Poda estática de um FileIndex finalizado.
+
+Cada ocorrência recebe o peso tf-idf que ela teria no modelo vetorial e as
+de menor peso são descartadas, gerando um índice menor:
+
+    term:     para cada termo, mantém as `retention` (fração) ocorrências de
+              maior peso, ou as com peso >= threshold * (maior peso do termo)
+    document: o mesmo critério aplicado aos termos de cada documento
+
+Ao menos uma ocorrência é mantida por termo (poda por termo) ou por
+documento (poda por documento). O índice podado guarda o df e o número de
+documentos originais em `collection_stats` (index.sharding.CollectionStats),
+que deve ser usado em IndexPreComputedVals para que o idf não mude.
+
+`pruning_report` compara o tamanho e a qualidade (P@k e nDCG@k nas consultas
+de avaliação, ver query/processing.py) dos dois índices.
+
+Uso: python -m index.pruning INDICE SAIDA [--strategy term|document]
+                             [--retention 0.5 | --threshold 0.1] [--report ARQUIVO]
+"""
+from typing import Iterator, List, Mapping, Sequence, Set, Tuple
+import heapq
+import json
+import math
+import os
+
+from index.structure import FileIndex, TermFilePosition, TermOccurrence
+from index.sharding import CollectionStats
+from util.metrics import metrics
+
+STRATEGIES = ("term", "document")
+
+
+def posting_weight(doc_count: int, term_freq: int, doc_count_with_term: int) -> float:
+    # mesmo peso de VectorRankingModel.tf_idf
+    return (1 + math.log(term_freq, 2)) * math.log(doc_count / doc_count_with_term, 2)
+
+
+def iter_term_postings(index: FileIndex) -> Iterator[Tuple[int, List[TermOccurrence]]]:
+    """Percorre o arquivo do índice sequencialmente, uma lista de ocorrências por vez"""
+    if index.str_idx_file_name is None:
+        return
+    with open(index.str_idx_file_name, "rb") as idx_file:
+        lst_occurrences = []
+        occurrence = index.next_from_file(idx_file)
+        while occurrence is not None:
+            if lst_occurrences and occurrence.term_id != lst_occurrences[0].term_id:
+                yield lst_occurrences[0].term_id, lst_occurrences
+                lst_occurrences = []
+            if occurrence.doc_id not in index.deleted_docs:
+                lst_occurrences.append(occurrence)
+            occurrence = index.next_from_file(idx_file)
+        if lst_occurrences:
+            yield lst_occurrences[0].term_id, lst_occurrences
+
+
+def keep_count(total: int, retention: float) -> int:
+    return max(1, math.ceil(total * retention))
+
+
+def select_top(lst_weights: Sequence[float], retention: float = None, threshold: float = None) -> float:
+    """Menor peso que ainda é mantido"""
+    if threshold is not None:
+        return threshold * max(lst_weights)
+    return heapq.nlargest(keep_count(len(lst_weights), retention), lst_weights)[-1]
+
+
+def document_cutoffs(index: FileIndex, retention: float = None, threshold: float = None) -> Mapping[int, float]:
+    """
+    Peso mínimo mantido em cada documento. Exige uma passada a mais pelo
+    arquivo e guarda os pesos de cada documento enquanto isso.
+    """
+    dic_weights = {}
+    doc_count = index.document_count
+    for term_id, lst_occurrences in iter_term_postings(index):
+        for occurrence in lst_occurrences:
+            weight = posting_weight(doc_count, occurrence.term_freq, len(lst_occurrences))
+            dic_weights.setdefault(occurrence.doc_id, []).append(weight)
+    return {doc_id: select_top(lst_weights, retention, threshold) for doc_id, lst_weights in dic_weights.items()}
+
+
+@metrics.timed("pruning.prune")
+def prune_index(index: FileIndex, str_file_prefix: str, strategy: str = "term",
+                retention: float = None, threshold: float = None) -> FileIndex:
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Estratégia de poda desconhecida: {strategy} (use {', '.join(STRATEGIES)})")
+    if (retention is None) == (threshold is None):
+        raise ValueError("Informe retention ou threshold (apenas um deles)")
+    if retention is not None and not 0 < retention <= 1:
+        raise ValueError(f"retention deve estar entre 0 e 1: {retention}")
+    if index.lst_occurrences_tmp:
+        raise ValueError("O índice possui ocorrências em memória: chame finish_indexing antes da poda")
+
+    dic_terms = {entry.term_id: term for term, entry in index.dic_index.items()}
+    doc_count = index.document_count
+    dic_cutoffs = document_cutoffs(index, retention, threshold) if strategy == "document" else None
+
+    pruned_index = FileIndex(str_file_prefix)
+    pruned_index.str_idx_file_name = f"{str_file_prefix}_{pruned_index.idx_file_counter}.idx"
+    pruned_index.set_documents = set(index.set_documents)
+    collection_stats = CollectionStats(doc_count)
+    with open(pruned_index.str_idx_file_name, "wb") as new_file:
+        for term_id, lst_occurrences in iter_term_postings(index):
+            term = dic_terms[term_id]
+            collection_stats.dic_doc_count_with_term[term] = len(lst_occurrences)
+            lst_weights = [posting_weight(doc_count, occurrence.term_freq, len(lst_occurrences))
+                           for occurrence in lst_occurrences]
+            if strategy == "term":
+                cutoff = select_top(lst_weights, retention, threshold)
+                lst_kept = [occurrence for occurrence, weight in zip(lst_occurrences, lst_weights) if weight >= cutoff]
+            else:
+                lst_kept = [occurrence for occurrence, weight in zip(lst_occurrences, lst_weights)
+                            if weight >= dic_cutoffs[occurrence.doc_id]]
+            if not lst_kept:
+                continue
+            pruned_index.dic_index[term] = TermFilePosition(len(pruned_index.dic_index), new_file.tell(), len(lst_kept))
+            for occurrence in lst_kept:
+                TermOccurrence(occurrence.doc_id, pruned_index.dic_index[term].term_id, occurrence.term_freq).write(new_file)
+            metrics.inc("pruning.postings_kept", len(lst_kept))
+            metrics.inc("pruning.postings_removed", len(lst_occurrences) - len(lst_kept))
+    pruned_index.collection_stats = collection_stats
+    return pruned_index
+
+
+def occurrence_count(index: FileIndex) -> int:
+    return sum(entry.doc_count_with_term or 0 for entry in index.dic_index.values())
+
+
+def evaluate(query_runner, dic_relevant: Mapping[str, Set[int]], lst_k: Sequence[int]) -> Mapping[str, dict]:
+    """P@k e nDCG@k de cada consulta de avaliação"""
+    dic_results = {}
+    for query, set_relevant in dic_relevant.items():
+        lst_docs, dic_weights = query_runner.get_docs_term(query)
+        lst_docs = list(lst_docs)
+        dic_results[query] = {}
+        for k in lst_k:
+            dic_results[query][f"P@{k}"] = query_runner.count_topn_relevant(k, lst_docs, set_relevant) / k
+            dic_results[query][f"nDCG@{k}"] = query_runner.compute_ndcg(k, lst_docs, set_relevant)
+    return dic_results
+
+
+def pruning_report(index: FileIndex, pruned_index: FileIndex, cleaner=None,
+                   dic_relevant: Mapping[str, Set[int]] = None, lst_k: Sequence[int] = (5, 10, 20)) -> dict:
+    """Redução de tamanho e, se dic_relevant for informado, a qualidade antes e depois da poda"""
+    from query.processing import QueryRunner
+    from query.ranking_models import IndexPreComputedVals, VectorRankingModel
+
+    original_bytes = os.path.getsize(index.str_idx_file_name)
+    pruned_bytes = os.path.getsize(pruned_index.str_idx_file_name)
+    original_postings = occurrence_count(index)
+    pruned_postings = occurrence_count(pruned_index)
+    dic_report = {
+        "original_bytes": original_bytes,
+        "pruned_bytes": pruned_bytes,
+        "bytes_ratio": pruned_bytes / original_bytes if original_bytes else 0,
+        "original_postings": original_postings,
+        "pruned_postings": pruned_postings,
+        "postings_ratio": pruned_postings / original_postings if original_postings else 0,
+    }
+    if dic_relevant:
+        original_runner = QueryRunner(VectorRankingModel(IndexPreComputedVals(index)), index, cleaner)
+        pruned_runner = QueryRunner(VectorRankingModel(IndexPreComputedVals(pruned_index)), pruned_index, cleaner)
+        dic_original = evaluate(original_runner, dic_relevant, lst_k)
+        dic_pruned = evaluate(pruned_runner, dic_relevant, lst_k)
+        dic_report["queries"] = {query: {metric: {"original": value,
+                                                   "pruned": dic_pruned[query][metric],
+                                                   "change": dic_pruned[query][metric] - value}
+                                          for metric, value in dic_metrics.items()}
+                                 for query, dic_metrics in dic_original.items()}
+    return dic_report
+
+
+def main():
+    import argparse
+    from index.structure import Index
+
+    parser = argparse.ArgumentParser(description="Poda estática de um índice salvo com Index.save")
+    parser.add_argument("index_file")
+    parser.add_argument("output", help="arquivo onde o indice podado será salvo")
+    parser.add_argument("--strategy", choices=STRATEGIES, default="term")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--retention", type=float, help="fração das ocorrências mantida (por termo/documento)")
+    group.add_argument("--threshold", type=float, help="fração do maior peso (do termo/documento) abaixo da qual a ocorrência é removida")
+    parser.add_argument("--report", default=None, help="arquivo JSON do relatório (por padrão, impresso)")
+    parser.add_argument("--relevant-docs", default="relevant_docs", help="diretório das consultas de avaliação")
+    args = parser.parse_args()
+
+    from index.indexer import HTMLIndexer
+    from query.processing import QueryRunner
+
+    index = Index.load(args.index_file)
+    pruned_index = prune_index(index, os.path.splitext(args.output)[0], args.strategy, args.retention, args.threshold)
+    pruned_index.save(args.output)
+
+    dic_relevant = QueryRunner.load_relevant_docs(args.relevant_docs) if os.path.isdir(args.relevant_docs) else None
+    str_report = json.dumps(pruning_report(index, pruned_index, HTMLIndexer.cleaner, dic_relevant),
+                            ensure_ascii=False, indent=4)
+    if args.report is not None:
+        with open(args.report, "w", encoding="utf-8") as file:
+            file.write(str_report)
+    else:
+        print(str_report)
+
+
+if __name__ == '__main__':
+    main()
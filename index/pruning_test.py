@@ -0,0 +1,85 @@
+from index.pruning import prune_index, pruning_report
+from index.structure import FileIndex, Index
+from index.indexer import Cleaner
+from query.ranking_models import IndexPreComputedVals
+from random import randrange, seed
+import os
+import tempfile
+import unittest
+
+
+class PruningTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.index = FileIndex(os.path.join(self.tmp_dir.name, "index"))
+        seed(5)
+        vocabulary = ["casa", "verde", "azul", "predio", "rua", "janela", "porta", "xicara"]
+        for doc_id in range(1, 41):
+            for term in set(vocabulary[randrange(len(vocabulary))] for i in range(5)):
+                self.index.index(term, doc_id, randrange(1, 8))
+        self.index.finish_indexing()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def prune(self, **kwargs) -> FileIndex:
+        return prune_index(self.index, os.path.join(self.tmp_dir.name, "pruned"), **kwargs)
+
+    def test_term_centric(self):
+        pruned_index = self.prune(strategy="term", retention=0.5)
+        for term in self.index.vocabulary:
+            lst_original = self.index.get_occurrence_list(term)
+            lst_pruned = pruned_index.get_occurrence_list(term)
+            self.assertGreaterEqual(len(lst_pruned), len(lst_original) // 2)
+            self.assertTrue(all(occur.term_id == pruned_index.get_term_id(term) for occur in lst_pruned))
+            #mantém as ocorrências de maior frequência (o idf é o mesmo para o termo)
+            lst_freqs = sorted((occur.term_freq for occur in lst_original), reverse=True)
+            self.assertGreaterEqual(min(occur.term_freq for occur in lst_pruned), lst_freqs[len(lst_original) // 2])
+            #o df original é mantido para o cálculo do idf
+            self.assertEqual(pruned_index.collection_stats.document_count_with_term(term), len(lst_original))
+        self.assertEqual(pruned_index.collection_stats.document_count, self.index.document_count)
+
+    def test_load_keeps_collection_stats(self):
+        #o índice podado salvo e reaberto (ex.: pelo query.server) usa o idf da coleção original
+        pruned_index = self.prune(strategy="term", retention=0.5)
+        str_file = os.path.join(self.tmp_dir.name, "pruned.pickle")
+        pruned_index.save(str_file)
+        loaded_index = Index.load(str_file)
+        precomp = IndexPreComputedVals(loaded_index)
+        self.assertIs(type(precomp.collection_stats), type(pruned_index.collection_stats))
+        self.assertEqual(precomp.doc_count, self.index.document_count)
+        original_precomp = IndexPreComputedVals(self.index)
+        for term in self.index.vocabulary:
+            self.assertEqual(precomp.document_count_with_term(term, loaded_index.get_occurrence_list(term)),
+                             original_precomp.document_count_with_term(term, self.index.get_occurrence_list(term)))
+
+    def test_document_centric(self):
+        pruned_index = self.prune(strategy="document", threshold=0.8)
+        dic_terms_per_doc = {}
+        for term in pruned_index.vocabulary:
+            for occur in pruned_index.get_occurrence_list(term):
+                dic_terms_per_doc.setdefault(occur.doc_id, []).append(term)
+        #todo documento mantém ao menos um termo
+        self.assertSetEqual(set(dic_terms_per_doc), self.index.set_documents)
+
+    def test_report(self):
+        pruned_index = self.prune(strategy="term", retention=0.3)
+        cleaner = Cleaner(stop_words_file="stopwords.txt",language="portuguese",
+                        perform_stop_words_removal=False,perform_accents_removal=False,
+                        perform_stemming=False)
+        dic_report = pruning_report(self.index, pruned_index, cleaner, {"casa verde": {1, 2, 3}}, lst_k=[5])
+        self.assertLess(dic_report["pruned_bytes"], dic_report["original_bytes"])
+        self.assertLess(dic_report["postings_ratio"], 0.5)
+        dic_metric = dic_report["queries"]["casa verde"]["nDCG@5"]
+        self.assertAlmostEqual(dic_metric["change"], dic_metric["pruned"] - dic_metric["original"])
+        self.assertIn("P@5", dic_report["queries"]["casa verde"])
+
+    def test_invalid_arguments(self):
+        self.assertRaises(ValueError, self.prune, strategy="xpto", retention=0.5)
+        self.assertRaises(ValueError, self.prune, strategy="term")
+        self.assertRaises(ValueError, self.prune, strategy="term", retention=0.5, threshold=0.1)
+        self.assertRaises(ValueError, self.prune, strategy="term", retention=1.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
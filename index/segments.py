@@ -0,0 +1,302 @@
+"""
+Índice incremental em segmentos (estilo LSM).
+
+Documentos novos entram em um buffer em memória (HashIndex). Quando o buffer
+atinge `max_buffer_docs` documentos ele é gravado como um segmento imutável
+(um FileIndex finalizado). As consultas consultam todos os segmentos e o
+buffer e intercalam as listas de ocorrências por doc_id. Uma política de
+merge (TieredMergePolicy) escolhe segmentos de tamanho parecido para serem
+compactados em um só, opcionalmente em uma thread de fundo e limitados por
+um orçamento de I/O (bytes/s).
+
+Cada segmento tem seus próprios term_ids; o SegmentedIndex mantém o id
+global de cada termo e devolve as ocorrências com o id global.
+"""
+from typing import List, Optional
+from time import perf_counter, sleep
+import heapq
+import math
+import os
+import threading
+
+from index.structure import Index, HashIndex, FileIndex, TermOccurrence
+from util.metrics import metrics
+
+
+class Segment:
+    def __init__(self, segment_id: int, index: FileIndex):
+        self.segment_id = segment_id
+        self.index = index
+
+    @property
+    def size_bytes(self) -> int:
+        if self.index.str_idx_file_name is None:
+            return 0
+        return os.path.getsize(self.index.str_idx_file_name)
+
+    @property
+    def doc_count(self) -> int:
+        return self.index.document_count
+
+    @property
+    def occurrence_count(self) -> int:
+        return sum(self.index.document_count_with_term(term) for term in self.index.dic_index)
+
+    def delete_files(self):
+        if self.index.str_idx_file_name is not None and os.path.exists(self.index.str_idx_file_name):
+            os.remove(self.index.str_idx_file_name)
+
+    def __str__(self):
+        return f"segment {self.segment_id} ({self.doc_count} docs, {self.size_bytes} bytes)"
+
+    def __repr__(self):
+        return str(self)
+
+
+class TieredMergePolicy:
+    """
+    Agrupa os segmentos em camadas de tamanho (cada camada é `segments_per_tier`
+    vezes maior que a anterior, a partir de `floor_segment_bytes`) e propõe o
+    merge quando uma camada acumula `segments_per_tier` segmentos.
+    """
+    def __init__(self, segments_per_tier: int = 4, max_merge_at_once: int = 10,
+                 floor_segment_bytes: int = 64 * 1024):
+        self.segments_per_tier = segments_per_tier
+        self.max_merge_at_once = max_merge_at_once
+        self.floor_segment_bytes = floor_segment_bytes
+
+    def tier(self, segment: Segment) -> int:
+        size = max(segment.size_bytes, self.floor_segment_bytes)
+        return int(math.log(size / self.floor_segment_bytes, self.segments_per_tier))
+
+    def find_merge(self, lst_segments: List[Segment]) -> Optional[List[Segment]]:
+        dic_tiers = {}
+        for segment in lst_segments:
+            dic_tiers.setdefault(self.tier(segment), []).append(segment)
+        for tier in sorted(dic_tiers):
+            lst_tier = dic_tiers[tier]
+            if len(lst_tier) >= self.segments_per_tier:
+                lst_tier.sort(key=lambda segment: segment.size_bytes)
+                return lst_tier[:self.max_merge_at_once]
+        return None
+
+
+class IOThrottle:
+    """
+    Limita a taxa de bytes processados; sem limite quando bytes_per_second é None.
+    clock e sleep podem ser substituídos (ex.: por um relógio simulado nos testes).
+    """
+    def __init__(self, bytes_per_second: Optional[float] = None, clock=perf_counter, sleep=sleep):
+        self.bytes_per_second = bytes_per_second
+        self.clock = clock
+        self.sleep = sleep
+        self.reset()
+
+    def reset(self):
+        self.start = self.clock()
+        self.consumed = 0
+
+    def consume(self, num_bytes: float) -> float:
+        """Contabiliza num_bytes e espera o necessário para manter a taxa; retorna a espera (s)"""
+        if self.bytes_per_second is None:
+            return 0.0
+        self.consumed += num_bytes
+        wait = self.consumed / self.bytes_per_second - (self.clock() - self.start)
+        if wait <= 0:
+            return 0.0
+        self.sleep(wait)
+        return wait
+
+
+class SegmentedIndex(Index):
+    def __init__(self, str_dir: str, max_buffer_docs: int = 1000,
+                 merge_policy: TieredMergePolicy = None, io_bytes_per_second: Optional[float] = None):
+        super().__init__()
+        self.str_dir = str_dir
+        os.makedirs(str_dir, exist_ok=True)
+        self.max_buffer_docs = max_buffer_docs
+        self.merge_policy = merge_policy if merge_policy is not None else TieredMergePolicy()
+        self.throttle = IOThrottle(io_bytes_per_second)
+
+        self.buffer = HashIndex()
+        self.set_buffer_docs = set()
+        self.lst_segments = []
+        self.segment_counter = 0
+
+        self.lock_counter = threading.Lock()
+        self.lock_merge = threading.Lock()
+        self.merge_requested = threading.Event()
+        self.bol_closing = False
+        self.merge_thread = None
+
+    def get_term_id(self, term: str):
+        return self.dic_index[term]
+
+    def index(self, term: str, doc_id: int, term_freq: int):
+        if term not in self.dic_index:
+            # o dicionario guarda apenas o id global do termo
+            self.dic_index[term] = len(self.dic_index)
+        # os documentos devem ser indexados um de cada vez: o buffer só é
+        # gravado quando começa um documento novo
+        if doc_id not in self.set_buffer_docs:
+            if len(self.set_buffer_docs) >= self.max_buffer_docs:
+                self.flush()
+            self.set_buffer_docs.add(doc_id)
+        self.set_documents.add(doc_id)
+        self.buffer.index(term, doc_id, term_freq)
+
+    def delete_document(self, doc_id: int) -> bool:
+        """
+        Marca o documento como removido em cada segmento (que continua imutável;
+        a marca fica no deleted_docs do segmento) e o retira do buffer. As
+        ocorrências são descartadas de fato no próximo merge que envolver o
+        segmento ou em compact().
+        """
+        with self.rw_lock.writing():
+            if doc_id not in self.set_documents:
+                return False
+            self.set_documents.discard(doc_id)
+            for segment in self.lst_segments:
+                segment.index.delete_document(doc_id)
+            if doc_id in self.set_buffer_docs:
+                self.buffer.delete_document(doc_id)
+                self.buffer.compact()
+                self.set_buffer_docs.discard(doc_id)
+        return True
+
+    def compact(self):
+        """Grava o buffer e junta todos os segmentos em um só, sem os documentos removidos"""
+        self.flush()
+        with self.lock_merge:
+            lst_segments = self.lst_segments
+            if len(lst_segments) > 1 or any(segment.index.deleted_docs for segment in lst_segments):
+                self.merge_segments(lst_segments)
+
+    def new_segment(self) -> Segment:
+        # flush (thread escritora) e merge (thread de fundo) criam segmentos
+        with self.lock_counter:
+            self.segment_counter += 1
+            segment_id = self.segment_counter
+        return Segment(segment_id, FileIndex(os.path.join(self.str_dir, f"segment_{segment_id}")))
+
+    @metrics.timed("segments.flush")
+    def flush(self):
+        """Grava o buffer como um novo segmento imutável"""
+        if not self.set_buffer_docs:
+            return
+        segment = self.new_segment()
+        for term, lst_occurrences in self.buffer.dic_index.items():
+            for occurrence in lst_occurrences:
+                segment.index.index(term, occurrence.doc_id, occurrence.term_freq)
+        segment.index.finish_indexing()
+
+        with self.rw_lock.writing():
+            self.lst_segments = self.lst_segments + [segment]
+            self.buffer = HashIndex()
+            self.set_buffer_docs = set()
+        metrics.inc("segments.flushes")
+        self.merge_requested.set()
+
+    def finish_indexing(self):
+        self.flush()
+        if self.merge_thread is None:
+            self.maybe_merge()
+        self.build_auxiliary_indexes()
+
+    def maybe_merge(self) -> int:
+        """Executa os merges propostos pela política até não haver mais; retorna quantos foram feitos"""
+        num_merges = 0
+        with self.lock_merge:
+            while not self.bol_closing:
+                lst_to_merge = self.merge_policy.find_merge(self.lst_segments)
+                if lst_to_merge is None:
+                    break
+                self.merge_segments(lst_to_merge)
+                num_merges += 1
+        return num_merges
+
+    @metrics.timed("segments.merge")
+    def merge_segments(self, lst_to_merge: List[Segment]) -> Segment:
+        merged_segment = self.new_segment()
+        total_bytes = sum(segment.size_bytes for segment in lst_to_merge)
+        total_occurrences = sum(segment.occurrence_count for segment in lst_to_merge)
+        bytes_per_occurrence = total_bytes / total_occurrences if total_occurrences else 0
+
+        # remoções já marcadas neste momento ficam de fora do segmento novo
+        lst_deleted_before = [set(segment.index.deleted_docs) for segment in lst_to_merge]
+
+        self.throttle.reset()
+        set_terms = set()
+        for segment in lst_to_merge:
+            set_terms.update(segment.index.dic_index)
+        for term in sorted(set_terms):
+            lst_occurrences = [segment.index.get_occurrence_list(term) for segment in lst_to_merge]
+            for occurrence in heapq.merge(*lst_occurrences, key=lambda occur: occur.doc_id):
+                merged_segment.index.index(term, occurrence.doc_id, occurrence.term_freq)
+            self.throttle.consume(bytes_per_occurrence * sum(len(lst) for lst in lst_occurrences))
+        merged_segment.index.finish_indexing()
+
+        # troca atômica: quem consulta segura a trava de leitura durante toda a
+        # consulta, então após a troca nenhum leitor usa mais os arquivos antigos
+        set_merged = set(lst_to_merge)
+        with self.rw_lock.writing():
+            # remoções feitas durante o merge foram marcadas apenas nos segmentos antigos
+            for segment, set_deleted_before in zip(lst_to_merge, lst_deleted_before):
+                for doc_id in segment.index.deleted_docs:
+                    if doc_id not in set_deleted_before and doc_id in merged_segment.index.set_documents:
+                        merged_segment.index.delete_document(doc_id)
+            lst_segments = [segment for segment in self.lst_segments if segment not in set_merged]
+            self.lst_segments = lst_segments + [merged_segment]
+        for segment in lst_to_merge:
+            segment.delete_files()
+        metrics.inc("segments.merges")
+        return merged_segment
+
+    def start_background_merges(self):
+        if self.merge_thread is not None:
+            return
+        self.merge_thread = threading.Thread(target=self.merge_loop, name="segment-merges", daemon=True)
+        self.merge_thread.start()
+
+    def merge_loop(self):
+        while not self.bol_closing:
+            self.merge_requested.wait()
+            self.merge_requested.clear()
+            self.maybe_merge()
+
+    def close(self):
+        self.bol_closing = True
+        self.merge_requested.set()
+        if self.merge_thread is not None:
+            self.merge_thread.join()
+            self.merge_thread = None
+
+    def get_occurrence_list(self, term: str) -> List:
+        if term not in self.dic_index:
+            return []
+        term_id = self.dic_index[term]
+        with self.rw_lock.reading():
+            lst_occurrences = [segment.index.get_occurrence_list(term) for segment in self.lst_segments]
+            # no buffer um documento atualizado volta para o fim da lista
+            lst_occurrences.append(sorted(self.buffer.get_occurrence_list(term), key=lambda occur: occur.doc_id))
+        return [TermOccurrence(occur.doc_id, term_id, occur.term_freq)
+                for occur in heapq.merge(*lst_occurrences, key=lambda occur: occur.doc_id)]
+
+    def document_count_with_term(self, term: str) -> int:
+        with self.rw_lock.reading():
+            return sum(segment.index.document_count_with_term(term) for segment in self.lst_segments) + \
+                   self.buffer.document_count_with_term(term)
+
+    def __getstate__(self):
+        dic_state = super().__getstate__()
+        for attr in ("lock_counter", "lock_merge", "merge_requested", "merge_thread"):
+            del dic_state[attr]
+        dic_state["str_dir"] = os.path.abspath(self.str_dir)
+        return dic_state
+
+    def __setstate__(self, dic_state):
+        super().__setstate__(dic_state)
+        self.lock_counter = threading.Lock()
+        self.lock_merge = threading.Lock()
+        self.merge_requested = threading.Event()
+        self.merge_thread = None
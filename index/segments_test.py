@@ -0,0 +1,136 @@
+from index.segments import SegmentedIndex, TieredMergePolicy, IOThrottle
+from index.structure import HashIndex
+from random import randrange, seed
+import os
+import tempfile
+import unittest
+
+
+class FakeClock:
+    """Relógio simulado: sleep apenas avança o tempo"""
+    def __init__(self):
+        self.now = 0.0
+        self.lst_sleeps = []
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.lst_sleeps.append(seconds)
+        self.now += seconds
+
+
+class SegmentedIndexTest(unittest.TestCase):
+    NUM_DOCS = 40
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def create_index(self, **kwargs) -> SegmentedIndex:
+        return SegmentedIndex(self.tmp_dir.name, max_buffer_docs=4,
+                              merge_policy=TieredMergePolicy(segments_per_tier=3, floor_segment_bytes=10**9),
+                              **kwargs)
+
+    def index_docs(self, lst_indexes):
+        seed(7)
+        vocabulary = ["casa", "verde", "azul", "predio", "rua", "janela", "porta"]
+        for doc_id in range(1, SegmentedIndexTest.NUM_DOCS + 1):
+            for term in set(vocabulary[randrange(len(vocabulary))] for i in range(4)):
+                freq = randrange(1, 5)
+                for index in lst_indexes:
+                    index.index(term, doc_id, freq)
+
+    def assert_same_index(self, index, expected_index):
+        self.assertEqual(index.document_count, expected_index.document_count)
+        self.assertCountEqual(index.vocabulary, expected_index.vocabulary)
+        for term in expected_index.vocabulary:
+            lst_expected = sorted((occur.doc_id, occur.term_freq) for occur in expected_index.get_occurrence_list(term))
+            lst_occur = index.get_occurrence_list(term)
+            self.assertListEqual([(occur.doc_id, occur.term_freq) for occur in lst_occur], lst_expected,
+                                 f"Ocorrências inesperadas do termo {term}")
+            self.assertTrue(all(occur.term_id == index.get_term_id(term) for occur in lst_occur))
+            self.assertEqual(index.document_count_with_term(term), len(lst_expected))
+
+    def test_flush_and_fan_out(self):
+        index = SegmentedIndex(self.tmp_dir.name, max_buffer_docs=4, merge_policy=TieredMergePolicy(segments_per_tier=1000))
+        expected_index = HashIndex()
+        self.index_docs([index, expected_index])
+
+        #os documentos ainda no buffer também são consultados
+        self.assertEqual(len(index.lst_segments), SegmentedIndexTest.NUM_DOCS // 4 - 1)
+        self.assert_same_index(index, expected_index)
+
+        index.finish_indexing()
+        self.assertEqual(len(index.lst_segments), SegmentedIndexTest.NUM_DOCS // 4)
+        self.assert_same_index(index, expected_index)
+
+    def test_merge_policy(self):
+        index = self.create_index()
+        expected_index = HashIndex()
+        self.index_docs([index, expected_index])
+        index.finish_indexing()
+
+        #com segments_per_tier=3 e todos na mesma camada, sobram menos de 3 segmentos
+        self.assertLess(len(index.lst_segments), 3)
+        self.assert_same_index(index, expected_index)
+
+        #arquivos dos segmentos compactados são removidos
+        set_files = set(os.listdir(self.tmp_dir.name))
+        set_expected = {os.path.basename(segment.index.str_idx_file_name) for segment in index.lst_segments}
+        self.assertSetEqual(set_files, set_expected)
+
+    def test_background_merges(self):
+        index = self.create_index()
+        index.start_background_merges()
+        expected_index = HashIndex()
+        self.index_docs([index, expected_index])
+        self.assert_same_index(index, expected_index)
+        index.finish_indexing()
+        index.close()
+        index.maybe_merge()
+        self.assert_same_index(index, expected_index)
+
+    def test_delete_and_update(self):
+        index = SegmentedIndex(self.tmp_dir.name, max_buffer_docs=4, merge_policy=TieredMergePolicy(segments_per_tier=1000))
+        expected_index = HashIndex()
+        self.index_docs([index, expected_index])
+
+        #doc. 2 está em um segmento, doc. 40 ainda está no buffer
+        for doc_id in [2, 40, 13]:
+            self.assertTrue(index.delete_document(doc_id))
+            expected_index.delete_document(doc_id)
+        self.assertFalse(index.delete_document(2))
+        self.assert_same_index(index, expected_index)
+
+        index.update_document(7, {"casa": 3, "xicara": 1})
+        expected_index.update_document(7, {"casa": 3, "xicara": 1})
+        self.assert_same_index(index, expected_index)
+
+        index.compact()
+        self.assertEqual(len(index.lst_segments), 1)
+        self.assertEqual(len(index.lst_segments[0].index.deleted_docs), 0)
+        self.assert_same_index(index, expected_index)
+
+    def test_io_throttle(self):
+        clock = FakeClock()
+        throttle = IOThrottle(bytes_per_second=1000, clock=clock.time, sleep=clock.sleep)
+        self.assertAlmostEqual(throttle.consume(50), 0.05)
+        self.assertAlmostEqual(throttle.consume(50), 0.05)
+        self.assertAlmostEqual(clock.now, 0.1)
+        #o tempo gasto fora do throttle já conta para a taxa
+        clock.now += 0.5
+        self.assertEqual(throttle.consume(100), 0.0)
+        self.assertAlmostEqual(throttle.consume(500), 0.1)
+        self.assertEqual(len(clock.lst_sleeps), 3)
+
+        clock = FakeClock()
+        throttle = IOThrottle(clock=clock.time, sleep=clock.sleep)
+        self.assertEqual(throttle.consume(10**9), 0.0)
+        self.assertListEqual(clock.lst_sleeps, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,223 @@
+"""
+Índice particionado por documento (shards) com consulta scatter-gather.
+
+Cada documento pertence a um único shard (`doc_id % num_shards`). Os shards
+são índices comuns, construídos de forma independente (inclusive em
+processos separados com `build_shards`). As estatísticas da coleção (número
+de documentos e df de cada termo) são somadas em um `CollectionStats`, que é
+passado ao IndexPreComputedVals de cada shard para que idf e normas sejam os
+mesmos de um índice único.
+
+O `ShardCoordinator` envia a consulta a todos os shards (threads ou um
+processo por shard), cada um devolve seu top-k e o coordenador intercala
+os resultados.
+"""
+from typing import Callable, List, Mapping, Tuple
+from concurrent.futures import Future, Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import heapq
+import os
+
+from index.structure import Index, FileIndex
+
+
+class ShardFilter:
+    """Seleciona os doc_ids de um shard (objeto serializável, para uso em outro processo)"""
+    def __init__(self, shard: int, num_shards: int):
+        self.shard = shard
+        self.num_shards = num_shards
+
+    def __call__(self, doc_id: int) -> bool:
+        return doc_id % self.num_shards == self.shard
+
+
+class CollectionStats:
+    def __init__(self, document_count: int = 0, dic_doc_count_with_term: Mapping[str, int] = None):
+        self.document_count = document_count
+        self.dic_doc_count_with_term = dic_doc_count_with_term if dic_doc_count_with_term is not None else {}
+
+    @classmethod
+    def merge(cls, lst_indexes: List[Index]) -> "CollectionStats":
+        stats = cls()
+        for index in lst_indexes:
+            stats.add(index)
+        return stats
+
+    def add(self, index: Index):
+        self.document_count += index.document_count
+        for term in index.vocabulary:
+            self.dic_doc_count_with_term[term] = self.dic_doc_count_with_term.get(term, 0) + \
+                                                 index.document_count_with_term(term)
+
+    def document_count_with_term(self, term: str) -> int:
+        return self.dic_doc_count_with_term.get(term, 0)
+
+
+class ShardedIndex(Index):
+    """
+    Índice que distribui os documentos entre `num_shards` índices. Pode ser
+    usado diretamente pelo HTMLIndexer (tudo no mesmo processo); para consultar,
+    use os shards com um ShardCoordinator.
+    """
+    def __init__(self, num_shards: int, index_factory: Callable[[int], Index] = None):
+        super().__init__()
+        self.num_shards = num_shards
+        if index_factory is None:
+            index_factory = lambda shard: FileIndex(f"occur_index_shard_{shard}")
+        self.lst_shards = [index_factory(shard) for shard in range(num_shards)]
+
+    def shard_of(self, doc_id: int) -> int:
+        return doc_id % self.num_shards
+
+    def index(self, term: str, doc_id: int, term_freq: int):
+        self.dic_index[term] = None
+        self.set_documents.add(doc_id)
+        self.lst_shards[self.shard_of(doc_id)].index(term, doc_id, term_freq)
+
+    def finish_indexing(self):
+        for shard in self.lst_shards:
+            shard.finish_indexing()
+        self.build_auxiliary_indexes()
+
+    def delete_document(self, doc_id: int) -> bool:
+        if not self.lst_shards[self.shard_of(doc_id)].delete_document(doc_id):
+            return False
+        self.set_documents.discard(doc_id)
+        return True
+
+    def compact(self):
+        for shard in self.lst_shards:
+            shard.compact()
+
+    def get_term_id(self, term: str):
+        raise NotImplementedError("Cada shard tem seus proprios term_ids")
+
+    def get_occurrence_list(self, term: str) -> List:
+        return list(heapq.merge(*[shard.get_occurrence_list(term) for shard in self.lst_shards],
+                                key=lambda occur: occur.doc_id))
+
+    def document_count_with_term(self, term: str) -> int:
+        return sum(shard.document_count_with_term(term) for shard in self.lst_shards)
+
+    @property
+    def collection_stats(self) -> CollectionStats:
+        return CollectionStats.merge(self.lst_shards)
+
+    def save_shards(self, str_dir: str) -> List[str]:
+        os.makedirs(str_dir, exist_ok=True)
+        lst_files = []
+        for shard, index in enumerate(self.lst_shards):
+            str_file = os.path.join(str_dir, f"shard_{shard}.pickle")
+            index.save(str_file)
+            lst_files.append(str_file)
+        return lst_files
+
+
+def build_shard(path: str, shard: int, num_shards: int, str_dir: str) -> str:
+    """Indexa (em um processo) os documentos do shard `shard` e salva o índice; retorna o arquivo"""
+    from index.indexer import HTMLIndexer
+
+    os.makedirs(str_dir, exist_ok=True)
+    index = FileIndex(os.path.join(str_dir, f"occur_index_shard_{shard}"))
+    HTMLIndexer(index, ShardFilter(shard, num_shards)).index_text_dir(path)
+    index.finish_indexing()
+    str_file = os.path.join(str_dir, f"shard_{shard}.pickle")
+    index.save(str_file)
+    return str_file
+
+
+def build_shards(path: str, num_shards: int, str_dir: str, max_workers: int = None) -> List[str]:
+    """Constrói os shards em paralelo, um processo por shard"""
+    with ProcessPoolExecutor(max_workers or num_shards) as executor:
+        lst_futures = [executor.submit(build_shard, path, shard, num_shards, str_dir) for shard in range(num_shards)]
+        return [future.result() for future in lst_futures]
+
+
+def top_k(query_runner, query: str, k: int) -> List[Tuple[float, int]]:
+    lst_docs, dic_weights = query_runner.get_docs_term(query)
+    if dic_weights is None:
+        return [(0.0, doc_id) for doc_id in sorted(lst_docs)[:k]]
+    return [(dic_weights[doc_id], doc_id) for doc_id in lst_docs[:k]]
+
+
+def create_query_runner(index: Index, collection_stats: CollectionStats, cleaner):
+    from query.processing import QueryRunner
+    from query.ranking_models import IndexPreComputedVals, SharedPreComputedVals, VectorRankingModel
+    from index.shared import SharedIndex
+
+    # o SharedIndex já traz as normas publicadas: não há o que recalcular
+    if isinstance(index, SharedIndex):
+        precomp = SharedPreComputedVals(index, collection_stats)
+    else:
+        precomp = IndexPreComputedVals(index, collection_stats)
+    return QueryRunner(VectorRankingModel(precomp), index, cleaner)
+
+
+class LocalShardWorker:
+    """Shard consultado no próprio processo, por meio de um pool de threads compartilhado"""
+    def __init__(self, query_runner, executor: Executor):
+        self.query_runner = query_runner
+        self.executor = executor
+
+    def submit(self, query: str, k: int) -> Future:
+        return self.executor.submit(top_k, self.query_runner, query, k)
+
+    def close(self):
+        pass
+
+
+# QueryRunner do shard carregado no processo trabalhador (ProcessShardWorker)
+_process_query_runner = None
+
+
+def _init_process_worker(str_index_file: str, collection_stats: CollectionStats, cleaner):
+    global _process_query_runner
+    _process_query_runner = create_query_runner(Index.load(str_index_file), collection_stats, cleaner)
+
+
+def _process_top_k(query: str, k: int) -> List[Tuple[float, int]]:
+    return top_k(_process_query_runner, query, k)
+
+
+class ProcessShardWorker:
+    """Shard carregado uma única vez em um processo próprio"""
+    def __init__(self, str_index_file: str, collection_stats: CollectionStats, cleaner):
+        self.executor = ProcessPoolExecutor(1, initializer=_init_process_worker,
+                                            initargs=(str_index_file, collection_stats, cleaner))
+
+    def submit(self, query: str, k: int) -> Future:
+        return self.executor.submit(_process_top_k, query, k)
+
+    def close(self):
+        self.executor.shutdown()
+
+
+class ShardCoordinator:
+    def __init__(self, lst_workers: List):
+        self.lst_workers = lst_workers
+
+    @classmethod
+    def local(cls, lst_shards: List[Index], cleaner, max_workers: int = None) -> "ShardCoordinator":
+        collection_stats = CollectionStats.merge(lst_shards)
+        executor = ThreadPoolExecutor(max_workers or len(lst_shards))
+        return cls([LocalShardWorker(create_query_runner(shard, collection_stats, cleaner), executor)
+                    for shard in lst_shards])
+
+    @classmethod
+    def multiprocess(cls, lst_index_files: List[str], cleaner) -> "ShardCoordinator":
+        collection_stats = CollectionStats.merge([Index.load(str_file) for str_file in lst_index_files])
+        return cls([ProcessShardWorker(str_file, collection_stats, cleaner) for str_file in lst_index_files])
+
+    def search(self, query: str, k: int = 10) -> (List[int], Mapping[int, float]):
+        lst_futures = [worker.submit(query, k) for worker in self.lst_workers]
+        lst_top = heapq.nlargest(k, (item for future in lst_futures for item in future.result()),
+                                 key=lambda item: (item[0], -item[1]))
+        return [doc_id for score, doc_id in lst_top], {doc_id: score for score, doc_id in lst_top}
+
+    def close(self):
+        lst_executors = set()
+        for worker in self.lst_workers:
+            worker.close()
+            if isinstance(worker, LocalShardWorker):
+                lst_executors.add(worker.executor)
+        for executor in lst_executors:
+            executor.shutdown()
@@ -0,0 +1,80 @@
+from index.sharding import ShardedIndex, ShardCoordinator, ShardFilter
+from index.structure import HashIndex, FileIndex
+from index.indexer import Cleaner
+from query.processing import QueryRunner
+from query.ranking_models import VectorRankingModel, IndexPreComputedVals
+from random import randrange, seed
+import os
+import tempfile
+import unittest
+
+
+class ShardedIndexTest(unittest.TestCase):
+    NUM_DOCS = 30
+    QUERIES = ["casa verde", "azul", "rua janela porta", "predio casa azul", "crocodilo"]
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cleaner = Cleaner(stop_words_file="stopwords.txt",language="portuguese",
+                        perform_stop_words_removal=False,perform_accents_removal=False,
+                        perform_stemming=False)
+        self.index = ShardedIndex(3, lambda shard: FileIndex(os.path.join(self.tmp_dir.name, f"shard_{shard}")))
+        self.expected_index = HashIndex()
+        seed(11)
+        vocabulary = ["casa", "verde", "azul", "predio", "rua", "janela", "porta"]
+        for doc_id in range(1, ShardedIndexTest.NUM_DOCS + 1):
+            for term in set(vocabulary[randrange(len(vocabulary))] for i in range(4)):
+                freq = randrange(1, 5)
+                self.index.index(term, doc_id, freq)
+                self.expected_index.index(term, doc_id, freq)
+        self.index.finish_indexing()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_partitioning_and_stats(self):
+        self.assertTrue(ShardFilter(1, 3)(4))
+        self.assertFalse(ShardFilter(1, 3)(5))
+        for shard, shard_index in enumerate(self.index.lst_shards):
+            self.assertTrue(all(doc_id % 3 == shard for doc_id in shard_index.set_documents))
+
+        stats = self.index.collection_stats
+        self.assertEqual(stats.document_count, ShardedIndexTest.NUM_DOCS)
+        for term in self.expected_index.vocabulary:
+            self.assertEqual(stats.document_count_with_term(term), self.expected_index.document_count_with_term(term))
+            self.assertEqual(self.index.document_count_with_term(term), self.expected_index.document_count_with_term(term))
+            self.assertListEqual([occur.doc_id for occur in self.index.get_occurrence_list(term)],
+                                 [occur.doc_id for occur in self.expected_index.get_occurrence_list(term)])
+        self.assertEqual(stats.document_count_with_term("crocodilo"), 0)
+
+    def assert_same_ranking(self, coordinator: ShardCoordinator, k: int):
+        expected_runner = QueryRunner(VectorRankingModel(IndexPreComputedVals(self.expected_index)),
+                                      self.expected_index, self.cleaner)
+        for query in ShardedIndexTest.QUERIES:
+            lst_expected, dic_expected = expected_runner.get_docs_term(query)
+            lst_docs, dic_weights = coordinator.search(query, k)
+            self.assertEqual(len(lst_docs), min(k, len(lst_expected)), f"Consulta: {query}")
+            for doc_id, expected_doc_id in zip(lst_docs, lst_expected):
+                #empates podem ser ordenados de forma diferente; o peso deve ser o mesmo
+                self.assertAlmostEqual(dic_weights[doc_id], dic_expected[expected_doc_id], places=7)
+                self.assertAlmostEqual(dic_weights[doc_id], dic_expected[doc_id], places=7)
+
+    def test_local_coordinator(self):
+        coordinator = ShardCoordinator.local(self.index.lst_shards, self.cleaner)
+        try:
+            self.assert_same_ranking(coordinator, 5)
+            self.assert_same_ranking(coordinator, 100)
+        finally:
+            coordinator.close()
+
+    def test_multiprocess_coordinator(self):
+        lst_files = self.index.save_shards(self.tmp_dir.name)
+        coordinator = ShardCoordinator.multiprocess(lst_files, self.cleaner)
+        try:
+            self.assert_same_ranking(coordinator, 5)
+        finally:
+            coordinator.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,255 @@
+"""
+Índice somente leitura publicado uma única vez em um diretório e aberto com
+mmap por vários processos de consulta, que compartilham as páginas do cache
+do sistema operacional em vez de cada um carregar seus dicionários e normas:
+
+    lexicon.lex:   Lexicon (index/lexicon.py); term_file_start_pos é a posição
+                   da primeira ocorrência do termo nos vetores de postings.bin
+    postings.bin:  MAGIC + quantidade de ocorrências n (uint64), doc_ids
+                   (n uint32) e term_freqs (n uint32), agrupados por termo e
+                   ordenados por doc_id
+    norms.bin:     MAGIC + número de documentos da coleção (uint64) + quantidade
+                   de documentos m (uint64), normas (m float64) e doc_ids
+                   (m uint32, ordenados)
+
+(inteiros little-endian). Os documentos removidos ficam de fora. As normas
+são as do IndexPreComputedVals no momento da publicação (com o
+collection_stats informado, no caso de um shard).
+
+`SharedIndex` abre os arquivos sem copiá-los; ao ser serializado guarda
+apenas o diretório, então passá-lo a outro processo (ou salvá-lo com
+Index.save) custa o mesmo qualquer que seja o tamanho do índice.
+`query.ranking_models.SharedPreComputedVals` lê as normas publicadas em vez
+de recalculá-las e `SharedQueryPool` distribui consultas entre processos que usam o mesmo índice.
+
+Uso: python -m index.shared INDICE DIRETORIO
+"""
+from typing import Iterator, List, Mapping, Tuple
+from collections.abc import Mapping as MappingABC, Set as SetABC
+from concurrent.futures import Future, ProcessPoolExecutor
+from array import array
+import bisect
+import mmap
+import os
+import struct
+import sys
+
+from index.bitmap import RoaringBitmap
+from index.lexicon import Lexicon, LexiconEntry
+from index.structure import Index, TermOccurrence
+from util.threads import ReadWriteLock
+
+POSTINGS_MAGIC = b"RIPOSTS1"
+POSTINGS_HEADER = struct.Struct("<8sQ")
+NORMS_MAGIC = b"RINORMS1"
+NORMS_HEADER = struct.Struct("<8sQQ")
+
+LEXICON_FILE = "lexicon.lex"
+POSTINGS_FILE = "postings.bin"
+NORMS_FILE = "norms.bin"
+
+
+def publish_index(index: Index, str_dir: str, collection_stats=None) -> str:
+    """Grava os arquivos do SharedIndex de `index` em str_dir; retorna o diretório"""
+    if sys.byteorder != "little":
+        raise NotImplementedError("SharedIndex só é suportado em plataformas little-endian")
+    # import local: query.ranking_models depende de index
+    from query.ranking_models import IndexPreComputedVals
+
+    os.makedirs(str_dir, exist_ok=True)
+    precomp = IndexPreComputedVals(index, collection_stats)
+
+    arr_doc_ids = array("I")
+    arr_term_freqs = array("I")
+    lst_entries = []
+    for term_id, term in enumerate(sorted(index.vocabulary)):
+        lst_occurrences = index.get_occurrence_list(term)
+        if not lst_occurrences:
+            continue
+        lst_entries.append((term, LexiconEntry(term_id, len(arr_doc_ids), len(lst_occurrences))))
+        for occurrence in sorted(lst_occurrences, key=lambda occurrence: occurrence.doc_id):
+            arr_doc_ids.append(occurrence.doc_id)
+            arr_term_freqs.append(occurrence.term_freq)
+    Lexicon.build(lst_entries, os.path.join(str_dir, LEXICON_FILE))
+    with open(os.path.join(str_dir, POSTINGS_FILE), "wb") as file:
+        file.write(POSTINGS_HEADER.pack(POSTINGS_MAGIC, len(arr_doc_ids)))
+        arr_doc_ids.tofile(file)
+        arr_term_freqs.tofile(file)
+
+    lst_norm_docs = sorted(precomp.document_norm)
+    with open(os.path.join(str_dir, NORMS_FILE), "wb") as file:
+        file.write(NORMS_HEADER.pack(NORMS_MAGIC, precomp.doc_count, len(lst_norm_docs)))
+        array("d", (precomp.document_norm[doc_id] for doc_id in lst_norm_docs)).tofile(file)
+        array("I", lst_norm_docs).tofile(file)
+    return str_dir
+
+
+def open_mmap(str_file_name: str) -> mmap.mmap:
+    with open(str_file_name, "rb") as file:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class SharedDocIds(SetABC):
+    """Conjunto (somente leitura) sobre um vetor ordenado de doc_ids"""
+    def __init__(self, doc_ids: memoryview):
+        self.doc_ids = doc_ids
+
+    def __contains__(self, doc_id) -> bool:
+        pos = bisect.bisect_left(self.doc_ids, doc_id)
+        return pos < len(self.doc_ids) and self.doc_ids[pos] == doc_id
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.doc_ids)
+
+
+class SharedNorms(MappingABC):
+    """doc_id -> norma, sobre os vetores de norms.bin"""
+    def __init__(self, doc_ids: memoryview, norms: memoryview):
+        self.doc_ids = doc_ids
+        self.norms = norms
+
+    def __getitem__(self, doc_id: int) -> float:
+        pos = bisect.bisect_left(self.doc_ids, doc_id)
+        if pos == len(self.doc_ids) or self.doc_ids[pos] != doc_id:
+            raise KeyError(doc_id)
+        return self.norms[pos]
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.doc_ids)
+
+
+class SharedIndex(Index):
+    def __init__(self, str_dir: str):
+        self.str_dir = str_dir
+        self.open()
+
+    def open(self):
+        self.deleted_docs = RoaringBitmap()
+        self.rw_lock = ReadWriteLock()
+        self.dic_index = Lexicon(os.path.join(self.str_dir, LEXICON_FILE))
+
+        self.mm_postings = open_mmap(os.path.join(self.str_dir, POSTINGS_FILE))
+        magic, count = POSTINGS_HEADER.unpack_from(self.mm_postings)
+        if magic != POSTINGS_MAGIC:
+            raise ValueError(f"{self.str_dir} não possui um arquivo de postings válido")
+        buffer = memoryview(self.mm_postings)
+        pos = POSTINGS_HEADER.size
+        self.posting_doc_ids = buffer[pos:pos + 4 * count].cast("I")
+        self.posting_term_freqs = buffer[pos + 4 * count:pos + 8 * count].cast("I")
+
+        self.mm_norms = open_mmap(os.path.join(self.str_dir, NORMS_FILE))
+        magic, self.norm_doc_count, count = NORMS_HEADER.unpack_from(self.mm_norms)
+        if magic != NORMS_MAGIC:
+            raise ValueError(f"{self.str_dir} não possui um arquivo de normas válido")
+        buffer = memoryview(self.mm_norms)
+        pos = NORMS_HEADER.size
+        self.norms = buffer[pos:pos + 8 * count].cast("d")
+        self.norm_doc_ids = buffer[pos + 8 * count:pos + 12 * count].cast("I")
+        self.set_documents = SharedDocIds(self.norm_doc_ids)
+        self.document_norm = SharedNorms(self.norm_doc_ids, self.norms)
+
+    def close(self):
+        for view in (self.posting_doc_ids, self.posting_term_freqs, self.norms, self.norm_doc_ids):
+            view.release()
+        self.mm_postings.close()
+        self.mm_norms.close()
+        self.dic_index.close()
+
+    def index(self, term: str, doc_id: int, term_freq: int):
+        raise TypeError("O SharedIndex é somente leitura")
+
+    def delete_document(self, doc_id: int) -> bool:
+        raise TypeError("O SharedIndex é somente leitura")
+
+    def finish_indexing(self):
+        pass
+
+    def get_term_id(self, term: str):
+        return self.dic_index[term].term_id
+
+    def get_occurrence_list(self, term: str) -> List:
+        rank = self.dic_index.rank(term)
+        if rank < 0:
+            return []
+        entry = self.dic_index.entry(rank)
+        start = entry.term_file_start_pos
+        end = start + entry.doc_count_with_term
+        return [TermOccurrence(doc_id, entry.term_id, term_freq)
+                for doc_id, term_freq in zip(self.posting_doc_ids[start:end], self.posting_term_freqs[start:end])]
+
+    def document_count_with_term(self, term: str) -> int:
+        return self.dic_index[term].doc_count_with_term if term in self.dic_index else 0
+
+    def __getstate__(self):
+        return {"str_dir": os.path.abspath(self.str_dir)}
+
+    def __setstate__(self, dic_state):
+        self.str_dir = dic_state["str_dir"]
+        self.open()
+
+
+# QueryRunner do processo trabalhador do SharedQueryPool
+_pool_query_runner = None
+
+
+def _init_pool_worker(index: SharedIndex, collection_stats, cleaner):
+    global _pool_query_runner
+    from index.sharding import create_query_runner
+    _pool_query_runner = create_query_runner(index, collection_stats, cleaner)
+
+
+def _pool_top_k(query: str, k: int) -> List[Tuple[float, int]]:
+    from index.sharding import top_k
+    return top_k(_pool_query_runner, query, k)
+
+
+class SharedQueryPool:
+    """Processos de consulta que abrem o mesmo SharedIndex; cada consulta é respondida por um deles"""
+    def __init__(self, str_dir: str, cleaner, num_workers: int = None, collection_stats=None):
+        self.executor = ProcessPoolExecutor(num_workers or os.cpu_count(), initializer=_init_pool_worker,
+                                            initargs=(SharedIndex(str_dir), collection_stats, cleaner))
+
+    def submit(self, query: str, k: int = 10) -> Future:
+        return self.executor.submit(_pool_top_k, query, k)
+
+    def search(self, query: str, k: int = 10) -> (List[int], Mapping[int, float]):
+        lst_top = self.submit(query, k).result()
+        return [doc_id for score, doc_id in lst_top], {doc_id: score for score, doc_id in lst_top}
+
+    def search_many(self, queries: List[str], k: int = 10) -> Mapping[str, tuple]:
+        dic_futures = {query: self.submit(query, k) for query in queries}
+        dic_responses = {}
+        for query, future in dic_futures.items():
+            lst_top = future.result()
+            dic_responses[query] = ([doc_id for score, doc_id in lst_top], {doc_id: score for score, doc_id in lst_top})
+        return dic_responses
+
+    def close(self):
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Publica um índice salvo com Index.save para os processos de consulta")
+    parser.add_argument("index_file")
+    parser.add_argument("output_dir")
+    args = parser.parse_args()
+    publish_index(Index.load(args.index_file), args.output_dir)
+    SharedIndex(args.output_dir).save(os.path.join(args.output_dir, "index.pickle"))
+
+
+if __name__ == '__main__':
+    main()
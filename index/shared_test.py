@@ -0,0 +1,122 @@
+from index.shared import SharedIndex, SharedQueryPool, publish_index
+from index.sharding import ShardCoordinator, ShardedIndex, CollectionStats, create_query_runner
+from index.structure import FileIndex, Index
+from index.indexer import Cleaner
+from query.processing import QueryRunner
+from query.ranking_models import IndexPreComputedVals, SharedPreComputedVals, VectorRankingModel
+from random import randrange, seed
+import os
+import pickle
+import tempfile
+import unittest
+
+
+class SharedIndexTest(unittest.TestCase):
+    QUERIES = ["casa verde", "azul", "rua janela porta", "predio casa azul", "crocodilo"]
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cleaner = Cleaner(stop_words_file="stopwords.txt",language="portuguese",
+                        perform_stop_words_removal=False,perform_accents_removal=False,
+                        perform_stemming=False)
+        self.index = FileIndex(os.path.join(self.tmp_dir.name, "occur_index"))
+        seed(5)
+        vocabulary = ["casa", "verde", "azul", "predio", "rua", "janela", "porta"]
+        for doc_id in range(1, 41):
+            for term in set(vocabulary[randrange(len(vocabulary))] for i in range(4)):
+                self.index.index(term, doc_id, randrange(1, 5))
+        self.index.finish_indexing()
+        self.index.delete_document(7)
+        self.str_dir = publish_index(self.index, os.path.join(self.tmp_dir.name, "shared"))
+        self.shared_index = SharedIndex(self.str_dir)
+
+    def tearDown(self):
+        self.shared_index.close()
+        self.tmp_dir.cleanup()
+
+    def test_structure(self):
+        self.assertListEqual(sorted(self.shared_index.vocabulary), sorted(self.index.vocabulary))
+        self.assertEqual(self.shared_index.document_count, self.index.document_count)
+        self.assertNotIn(7, self.shared_index.set_documents)
+        for term in self.index.vocabulary:
+            self.assertListEqual([(occur.doc_id, occur.term_freq) for occur in self.shared_index.get_occurrence_list(term)],
+                                 [(occur.doc_id, occur.term_freq) for occur in self.index.get_occurrence_list(term)])
+            self.assertEqual(self.shared_index.document_count_with_term(term), self.index.document_count_with_term(term))
+        self.assertListEqual(self.shared_index.get_occurrence_list("crocodilo"), [])
+        self.assertEqual(self.shared_index.document_count_with_term("crocodilo"), 0)
+        self.assertRaises(TypeError, self.shared_index.index, "casa", 50, 1)
+        self.assertRaises(TypeError, self.shared_index.delete_document, 1)
+
+    def test_pickle(self):
+        #serializado, guarda apenas o diretório
+        self.assertLess(len(pickle.dumps(self.shared_index)), 200)
+        str_file = os.path.join(self.tmp_dir.name, "index.pickle")
+        self.shared_index.save(str_file)
+        index = Index.load(str_file)
+        self.assertListEqual(index.get_occurrence_list("casa"), self.shared_index.get_occurrence_list("casa"))
+        index.close()
+
+        #diretório relativo: o pickle guarda o caminho absoluto
+        str_cwd = os.getcwd()
+        try:
+            os.chdir(self.tmp_dir.name)
+            relative_index = SharedIndex("shared")
+            str_data = pickle.dumps(relative_index)
+            relative_index.close()
+            os.chdir(str_cwd)
+            index = pickle.loads(str_data)
+            self.assertListEqual(index.get_occurrence_list("casa"), self.shared_index.get_occurrence_list("casa"))
+            index.close()
+        finally:
+            os.chdir(str_cwd)
+
+    def test_same_ranking(self):
+        precomp = IndexPreComputedVals(self.index)
+        shared_precomp = SharedPreComputedVals(self.shared_index)
+        self.assertEqual(shared_precomp.doc_count, precomp.doc_count)
+        for doc_id, norm in precomp.document_norm.items():
+            self.assertAlmostEqual(shared_precomp.document_norm[doc_id], norm)
+
+        query_runner = QueryRunner(VectorRankingModel(precomp), self.index, self.cleaner)
+        shared_runner = create_query_runner(self.shared_index, None, self.cleaner)
+        self.assertIsInstance(shared_runner.ranking_model.idx_pre_comp_vals, SharedPreComputedVals)
+        for query in SharedIndexTest.QUERIES:
+            lst_docs, dic_weights = query_runner.get_docs_term(query)
+            lst_shared_docs, dic_shared_weights = shared_runner.get_docs_term(query)
+            self.assertListEqual(lst_shared_docs, lst_docs)
+            for doc_id in lst_docs:
+                self.assertAlmostEqual(dic_shared_weights[doc_id], dic_weights[doc_id])
+
+    def test_query_pool(self):
+        query_runner = QueryRunner(VectorRankingModel(IndexPreComputedVals(self.index)), self.index, self.cleaner)
+        with SharedQueryPool(self.str_dir, self.cleaner, num_workers=2) as pool:
+            dic_responses = pool.search_many(SharedIndexTest.QUERIES, k=5)
+            for query in SharedIndexTest.QUERIES:
+                lst_docs, dic_weights = query_runner.get_docs_term(query)
+                self.assertListEqual(dic_responses[query][0], lst_docs[:5])
+            self.assertListEqual(pool.search("azul", 3)[0], query_runner.get_docs_term("azul")[0][:3])
+
+    def test_shards(self):
+        #shards publicados com as estatísticas da coleção inteira
+        index = ShardedIndex(2, lambda shard: FileIndex(os.path.join(self.tmp_dir.name, f"shard_{shard}")))
+        for term in self.index.vocabulary:
+            for occur in self.index.get_occurrence_list(term):
+                index.index(term, occur.doc_id, occur.term_freq)
+        index.finish_indexing()
+        collection_stats = index.collection_stats
+        lst_files = []
+        for shard, shard_index in enumerate(index.lst_shards):
+            shared_index = SharedIndex(publish_index(shard_index, os.path.join(self.tmp_dir.name, f"shared_{shard}"), collection_stats))
+            lst_files.append(os.path.join(self.tmp_dir.name, f"shared_{shard}.pickle"))
+            shared_index.save(lst_files[-1])
+        coordinator = ShardCoordinator.multiprocess(lst_files, self.cleaner)
+        try:
+            query_runner = QueryRunner(VectorRankingModel(IndexPreComputedVals(self.index)), self.index, self.cleaner)
+            for query in SharedIndexTest.QUERIES:
+                self.assertListEqual(coordinator.search(query, 5)[0], query_runner.get_docs_term(query)[0][:5])
+        finally:
+            coordinator.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,16 +1,50 @@
-from IPython.display import clear_output
-from typing import List, Set, Union
+from typing import KeysView, List, Mapping, Set, Union
 from abc import abstractmethod
 from functools import total_ordering
 from os import path, write
 import os
 import pickle
 import gc
+import math
+import tracemalloc
+
+from util.metrics import metrics
+from util.profiling import profiler
+from util.threads import ReadWriteLock, read_locked, write_locked
+from index.lexicon import Lexicon
+from index.kgram import KGramIndex
+from index.champions import ChampionLists, IMPACTS
+from index.bitmap import RoaringBitmap
 
 class Index:
+    """
+    Concorrência: ver util/threads.py. `index()` é chamado por uma única
+    thread escritora; leituras podem ser concorrentes.
+
+    Remoção/atualização: `delete_document` marca o doc_id em `deleted_docs`
+    e as ocorrências dele deixam de ser retornadas; elas só são apagadas de
+    fato em `compact()` (ou no próximo merge do FileIndex).
+    """
+    # índices auxiliares, refeitos em finish_indexing quando habilitados:
+    # k-gramas do vocabulário (index/kgram.py, enable_kgram_index) e
+    # champion lists (index/champions.py, enable_champion_lists) e
+    # bitmaps dos termos mais frequentes (index/bitmap.py, enable_bitmap_cache),
+    # descartados ao indexar ou compactar até o proximo finish_indexing
+    kgram_k = None
+    kgram_index = None
+    champion_r = None
+    champion_impact = "tf"
+    champion_lists = None
+    bitmap_min_doc_count = None
+    bitmap_cache = None
+    # doc_id quase duplicado -> doc_id indexado no lugar dele (index/dedup.py)
+    dic_duplicate_of = None
+
     def __init__(self):
         self.dic_index = {}
         self.set_documents = set()
+        self.deleted_docs = RoaringBitmap()
+        self.rw_lock = ReadWriteLock()
 
     def index(self, term: str, doc_id: int, term_freq: int):
         if term not in self.dic_index:
@@ -19,12 +53,15 @@ class Index:
         else:
             int_term_id = self.get_term_id(term)
 
+        # os bitmaps já não refletem as listas de ocorrências (get_doc_id_bitmap volta a usá-las)
+        self.bitmap_cache = None
         self.set_documents.add(doc_id)
         self.add_index_occur(self.dic_index[term], doc_id, int_term_id, term_freq)
 
     @property
-    def vocabulary(self) -> List:
-        return list(self.dic_index)
+    def vocabulary(self) -> KeysView:
+        # visão das chaves do dicionário (sem cópia)
+        return self.dic_index.keys()
 
     @property
     def document_count(self) -> int:
@@ -51,8 +88,88 @@ class Index:
         raise NotImplementedError("Voce deve criar uma subclasse e a mesma deve sobrepor este método")
 
     def finish_indexing(self):
+        self.build_auxiliary_indexes()
+
+    def enable_kgram_index(self, k: int = 3):
+        self.kgram_k = k
+
+    def enable_champion_lists(self, r: int = 50, impact: str = "tf"):
+        """Champion lists com as r ocorrências de maior impacto ("tf" ou "impact", o peso tf-idf normalizado)"""
+        if impact not in IMPACTS:
+            raise ValueError(f"Impacto desconhecido: {impact} (use {', '.join(IMPACTS)})")
+        self.champion_r = r
+        self.champion_impact = impact
+
+    def enable_bitmap_cache(self, min_doc_count: int = 1000):
+        """Guarda o RoaringBitmap dos termos com df >= min_doc_count (salvo junto com o índice)"""
+        self.bitmap_min_doc_count = min_doc_count
+
+    def build_auxiliary_indexes(self):
+        if self.kgram_k is not None:
+            self.kgram_index = KGramIndex.build(self.vocabulary, self.document_count_with_term, self.kgram_k)
+        if self.champion_r is not None:
+            document_norm = None
+            if self.champion_impact == "impact":
+                # import local: query.ranking_models depende de index
+                from query.ranking_models import IndexPreComputedVals
+                document_norm = IndexPreComputedVals(self).document_norm
+            self.champion_lists = ChampionLists.build(self, self.champion_r, self.champion_impact, document_norm)
+        if self.bitmap_min_doc_count is not None:
+            self.bitmap_cache = {}
+            for term in self.vocabulary:
+                if self.document_count_with_term(term) >= self.bitmap_min_doc_count:
+                    self.bitmap_cache[term] = RoaringBitmap(occur.doc_id for occur in self.get_occurrence_list(term))
+
+    def get_doc_id_bitmap(self, term: str) -> RoaringBitmap:
+        """Doc_ids (não removidos) em que o termo ocorre"""
+        if self.bitmap_cache is not None and term in self.bitmap_cache:
+            metrics.inc("index.bitmap_cache_hits")
+            return self.bitmap_cache[term] - self.deleted_docs if self.deleted_docs else self.bitmap_cache[term]
+        return RoaringBitmap(occur.doc_id for occur in self.get_occurrence_list(term))
+
+    @write_locked
+    def delete_document(self, doc_id: int) -> bool:
+        """Marca o documento como removido; retorna False se ele não estava indexado"""
+        if doc_id not in self.set_documents:
+            return False
+        self.set_documents.discard(doc_id)
+        self.deleted_docs.add(doc_id)
+        return True
+
+    def update_document(self, doc_id: int, dic_term_freq: Mapping[str, int]):
+        """Substitui o conteudo do documento pelas frequencias de termo em dic_term_freq"""
+        self.delete_document(doc_id)
+        for term, term_freq in dic_term_freq.items():
+            self.index(term, doc_id, term_freq)
+
+    def compact(self):
+        """Remove fisicamente as ocorrências dos documentos removidos"""
         pass
 
+    def live_occurrences(self, lst_occurrences: List) -> List:
+        if not self.deleted_docs:
+            return lst_occurrences
+        return [occurrence for occurrence in lst_occurrences if occurrence.doc_id not in self.deleted_docs]
+
+    def save(self, str_file_name: str):
+        """Persiste o indice (dicionario de termos e metadados) para ser reaberto com Index.load"""
+        with open(str_file_name, "wb") as file:
+            pickle.dump(self, file)
+
+    @staticmethod
+    def load(str_file_name: str) -> "Index":
+        with open(str_file_name, "rb") as file:
+            return pickle.load(file)
+
+    def __getstate__(self):
+        dic_state = self.__dict__.copy()
+        del dic_state["rw_lock"]
+        return dic_state
+
+    def __setstate__(self, dic_state):
+        self.__dict__.update(dic_state)
+        self.rw_lock = ReadWriteLock()
+
     def __str__(self):
         arr_index = []
         for str_term in self.vocabulary:
@@ -99,23 +216,44 @@ class TermOccurrence:
         return str(self)
 
 
+class OccurrenceList(list):
+    # lista de ocorrências que guarda o id do termo, para que ele continue
+    # disponível mesmo quando a lista fica vazia após um compact()
+    def __init__(self, term_id: int):
+        super().__init__()
+        self.term_id = term_id
+
+
 # HashIndex é subclasse de Index
 class HashIndex(Index):
     def get_term_id(self, term: str):
-        return self.dic_index[term][0].term_id
+        return self.dic_index[term].term_id
 
     def create_index_entry(self, term_id: int) -> List:
-        return list()  # não entendi a necessidade do term_id, caso for necessário no futuro a gente corrige
+        return OccurrenceList(term_id)
 
     def add_index_occur(self, entry_dic_index: List[TermOccurrence], doc_id: int, term_id: int, term_freq: int):
+        if doc_id in self.deleted_docs:
+            # documento atualizado: as ocorrências antigas precisam sair antes,
+            # senão a marca de removido também esconderia as novas
+            self.compact()
         entry_dic_index.append(TermOccurrence(doc_id, term_id, term_freq))
 
     def get_occurrence_list(self, term: str) -> List:
-        return list() if term not in self.dic_index else self.dic_index[term]
+        return list() if term not in self.dic_index else self.live_occurrences(self.dic_index[term])
 
     def document_count_with_term(self, term: str) -> int:
         return len(self.get_occurrence_list(term))
 
+    @write_locked
+    def compact(self):
+        if not self.deleted_docs:
+            return
+        for lst_occurrences in self.dic_index.values():
+            lst_occurrences[:] = self.live_occurrences(lst_occurrences)
+        self.deleted_docs.clear()
+        self.bitmap_cache = None
+
 
 class TermFilePosition:
     def __init__(self, term_id: int, term_file_start_pos: int = None, doc_count_with_term: int = None):
@@ -132,31 +270,107 @@ class TermFilePosition:
         return str(self)
 
 
-class FileIndex(Index):
-    TMP_OCCURRENCES_LIMIT = 1000000
+def estimate_occurrence_bytes(sample_size: int = 1000) -> int:
+    """
+    Bytes ocupados por uma ocorrência na lista temporária (objeto, atributos,
+    inteiros e ponteiro na lista), medidos com tracemalloc em sample_size
+    ocorrências. Se o tracemalloc já estiver ativo, apenas lê a diferença.
+    """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        lst_sample = [TermOccurrence(2 ** 20 + i, 2 ** 20 + i, 1) for i in range(sample_size)]
+        size = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        if started:
+            tracemalloc.stop()
+    return max(math.ceil(size / len(lst_sample)), 1)
 
-    def __init__(self):
+
+class FileIndex(Index):
+    # orçamento padrão (em bytes) das ocorrências mantidas em memória antes de
+    # serem gravadas no arquivo do índice
+    DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+    # medido na criação do primeiro FileIndex (estimate_occurrence_bytes)
+    OCCURRENCE_BYTES = None
+    # chamado com o índice após cada gravação das ocorrências em memória, antes
+    # de o arquivo anterior ser apagado (ex.: index.journal.IndexingJournal.checkpoint)
+    flush_listener = None
+
+    def __init__(self, str_file_prefix: str = "occur_index", memory_budget: int = None):
         super().__init__()
 
+        # prefixo (pode incluir diretório) dos arquivos de ocorrências; instâncias
+        # que convivem no mesmo processo devem usar prefixos diferentes
+        self.str_file_prefix = str_file_prefix
+
+        self.memory_budget = memory_budget if memory_budget is not None else FileIndex.DEFAULT_MEMORY_BUDGET
+        if FileIndex.OCCURRENCE_BYTES is None:
+            FileIndex.OCCURRENCE_BYTES = estimate_occurrence_bytes()
         self.lst_occurrences_tmp = []
+        # tamanho estimado de lst_occurrences_tmp e o maior valor que ele atingiu
+        self.tmp_occurrences_bytes = 0
+        self.peak_tmp_occurrences_bytes = 0
+        # próxima ocorrência de lst_occurrences_tmp a ser lida por next_from_list
+        self.tmp_occurrence_pos = 0
         self.idx_file_counter = 0
         self.str_idx_file_name = None # primeira vez é vazio, então ja cria como None
 
+        # quantidade de documentos por termo descontando os removidos (cache)
+        self.dic_live_doc_count = {}
+
     def get_term_id(self, term: str):
         return self.dic_index[term].term_id
 
+    def index(self, term: str, doc_id: int, term_freq: int):
+        if isinstance(self.dic_index, Lexicon):
+            self.thaw_lexicon()
+        super().index(term, doc_id, term_freq)
+
+    @write_locked
+    def freeze_lexicon(self, str_file_name: str = None):
+        """
+        Troca o dic_index pelo léxico compacto (index/lexicon.py), gravado em
+        str_file_name. Indexar ou remover documentos depois disso volta a usar
+        um dicionário (thaw_lexicon), que pode ser compactado de novo após o
+        finish_indexing.
+        """
+        if self.lst_occurrences_tmp or self.deleted_docs:
+            self.finish_indexing()
+        if str_file_name is None:
+            str_file_name = f"{self.str_file_prefix}.lex"
+        lexicon = self.dic_index if isinstance(self.dic_index, Lexicon) else None
+        Lexicon.build(self.dic_index.items(), str_file_name + ".tmp")
+        if lexicon is not None:
+            lexicon.close()
+        os.replace(str_file_name + ".tmp", str_file_name)
+        self.dic_index = Lexicon(str_file_name)
+
+    @write_locked
+    def thaw_lexicon(self):
+        if isinstance(self.dic_index, Lexicon):
+            lexicon = self.dic_index
+            self.dic_index = {term: TermFilePosition(entry.term_id, entry.term_file_start_pos, entry.doc_count_with_term)
+                              for term, entry in lexicon.items()}
+            lexicon.close()
+
     def create_index_entry(self, term_id: int) -> TermFilePosition:
         return TermFilePosition(term_id)
 
     def add_index_occur(self, entry_dic_index: TermFilePosition, doc_id: int, term_id: int, term_freq: int):
         self.lst_occurrences_tmp.append(TermOccurrence(doc_id, term_id, term_freq))
-        if len(self.lst_occurrences_tmp) >= FileIndex.TMP_OCCURRENCES_LIMIT:
+        self.tmp_occurrences_bytes += FileIndex.OCCURRENCE_BYTES
+        if self.tmp_occurrences_bytes >= self.memory_budget:
             self.save_tmp_occurrences()
 
     def next_from_list(self) -> TermOccurrence or None:
-        if len(self.lst_occurrences_tmp) == 0:
+        # percorre a lista com um cursor (remover do início da lista é O(n))
+        if self.tmp_occurrence_pos >= len(self.lst_occurrences_tmp):
             return None
-        return self.lst_occurrences_tmp.pop(0)
+        self.tmp_occurrence_pos += 1
+        return self.lst_occurrences_tmp[self.tmp_occurrence_pos - 1]
 
     def next_from_file(self, file_idx) -> TermOccurrence or None:
         try:
@@ -168,14 +382,23 @@ class FileIndex(Index):
                 return None
             return TermOccurrence(next_occurrence.doc_id, next_occurrence.term_id, next_occurrence.term_freq)
 
+    @metrics.timed("file_index.flush")
+    @write_locked
     def save_tmp_occurrences(self):
         # ordena pelo term_id, doc_id
         # Para eficiencia, todo o codigo deve ser feito com o garbage
         # collector desabilitado
         gc.disable()
+        tmp_bytes = len(self.lst_occurrences_tmp) * FileIndex.OCCURRENCE_BYTES
+        self.peak_tmp_occurrences_bytes = max(self.peak_tmp_occurrences_bytes, tmp_bytes)
+        metrics.inc("file_index.flushes")
+        metrics.inc("file_index.occurrences_flushed", len(self.lst_occurrences_tmp))
+        metrics.inc("file_index.bytes_flushed", tmp_bytes)
+        self.tmp_occurrence_pos = 0
 
         # ordena pelo term_id
-        self.lst_occurrences_tmp.sort()
+        with metrics.span("file_index.sort"):
+            self.lst_occurrences_tmp.sort()
         
         # self.idx_file_counter
         '''
@@ -189,41 +412,57 @@ class FileIndex(Index):
         if self.str_idx_file_name == None:
             # primeira vez acessando save_tmp_occurrences
             # nao existe arquivo antigo
-            self.str_idx_file_name = f"occur_index_{self.idx_file_counter}.idx"
+            self.str_idx_file_name = f"{self.str_file_prefix}_{self.idx_file_counter}.idx"
             file = None # nao existe arquivo antigo 
         else:
             # ja ocorreu acesso ao save_tmp_occurrences
             file = open(self.str_idx_file_name, "rb") # abrir o arquivo antigo
             self.idx_file_counter = self.idx_file_counter + 1 # atualiza contagem pra abrir novo
-            self.str_idx_file_name = f"occur_index_{self.idx_file_counter}.idx" # novo nome
+            self.str_idx_file_name = f"{self.str_file_prefix}_{self.idx_file_counter}.idx" # novo nome
             
         ### Abra um arquivo novo faça a ordenação externa: compar sempre a primeira posição
         new_file = open(self.str_idx_file_name, 'wb')
 
         ### da lista com a primeira possição do arquivo usando os métodos next_from_list e next_from_file
-        next_term_from_file = self.next_from_file(file)
-        next_term_from_list = self.next_from_list()
-        while next_term_from_file is not None or next_term_from_list is not None:
-            if next_term_from_list < next_term_from_file or next_term_from_file is None:
-                next_term_from_list.write(new_file)
-                next_term_from_list = self.next_from_list()
-            else:
-                print(next_term_from_file)
-                next_term_from_file.write(new_file)
-                next_term_from_file = self.next_from_file(file)
-            ### para armazenar no novo indice ordenado
+        with metrics.span("file_index.merge"):
+            next_term_from_file = self.next_from_file(file)
+            next_term_from_list = self.next_from_list()
+            while next_term_from_file is not None or next_term_from_list is not None:
+                if next_term_from_list < next_term_from_file or next_term_from_file is None:
+                    next_term_from_list.write(new_file)
+                    next_term_from_list = self.next_from_list()
+                else:
+                    # ocorrências de documentos removidos não são copiadas
+                    if next_term_from_file.doc_id not in self.deleted_docs:
+                        next_term_from_file.write(new_file)
+                    next_term_from_file = self.next_from_file(file)
+                ### para armazenar no novo indice ordenado
 
         # limpar a lista e fechar o arquivo
         self.lst_occurrences_tmp = []
+        self.tmp_occurrences_bytes = 0
+        self.tmp_occurrence_pos = 0
+        self.deleted_docs.clear()
+        self.dic_live_doc_count = {}
+        new_file.close()
+        if self.flush_listener is not None:
+            self.flush_listener(self)
         try:
             file.close()
         except:
             pass
-        new_file.close()
+        else:
+            # o arquivo antigo já foi todo copiado para o novo
+            os.remove(file.name)
         gc.enable()
 
+    @profiler.profiled("finish_indexing")
+    @write_locked
     def finish_indexing(self):
-        if len(self.lst_occurrences_tmp) > 0:
+        if isinstance(self.dic_index, Lexicon):
+            # com o léxico compacto não há ocorrências pendentes (ver freeze_lexicon)
+            return
+        if len(self.lst_occurrences_tmp) > 0 or (self.deleted_docs and self.str_idx_file_name is not None):
             self.save_tmp_occurrences()
 
         # Sugestão: faça a navegação e obtenha um mapeamento
@@ -231,11 +470,19 @@ class FileIndex(Index):
         dic_ids_por_termo = {} # ids sao as chaves e as palavras sao os itens
         for str_term, obj_term in self.dic_index.items():
             dic_ids_por_termo[obj_term.term_id] = str_term
+            # finish_indexing pode ser chamado de novo após novas ocorrências:
+            # as posições e contagens são sempre refeitas a partir do arquivo
+            obj_term.doc_count_with_term = None
+            obj_term.term_file_start_pos = None
+
+        if self.str_idx_file_name is None:
+            self.build_auxiliary_indexes()
+            return
 
         with open(self.str_idx_file_name, 'rb') as idx_file:
             # Usar o next_from_file pra ir pegando cada registro
+            seek_file = idx_file.tell()
             next_term_from_file = self.next_from_file(idx_file)
-            seek_file = 0
             while next_term_from_file is not None:
                 # pegando chave do dic_index
                 str_term = dic_ids_por_termo[next_term_from_file.term_id]
@@ -255,14 +502,16 @@ class FileIndex(Index):
                     self.dic_index[str_term].term_file_start_pos = seek_file
                 
                 # Chamar o proximo e andar com o seeker do arquivo
+                # (o tamanho de cada registro varia com os valores serializados)
+                seek_file = idx_file.tell()
                 next_term_from_file = self.next_from_file(idx_file)
-                # Cada registro tem tamanho 94
-                seek_file = seek_file + 94         
+        self.build_auxiliary_indexes()
 
+    @read_locked
     def get_occurrence_list(self, term: str) -> List:
         occurrence_list = []
         # existe no dicionario?
-        if term in self.dic_index.keys():
+        if term in self.dic_index.keys() and self.dic_index[term].term_file_start_pos is not None:
             # entao o termo existe e ele tem um id
             term_id = self.dic_index[term].term_id
 
@@ -284,9 +533,43 @@ class FileIndex(Index):
             idx_file.close()         
         else:
             pass # se nao ta no dicionario, o termo nao ocorre no arquivo
-        return occurrence_list
+        return self.live_occurrences(occurrence_list)
 
+    @read_locked
     def document_count_with_term(self, term: str) -> int:
         if term in self.dic_index:
-            return self.dic_index[term].doc_count_with_term
+            if self.deleted_docs:
+                if term not in self.dic_live_doc_count:
+                    self.dic_live_doc_count[term] = len(self.get_occurrence_list(term))
+                return self.dic_live_doc_count[term]
+            return self.dic_index[term].doc_count_with_term or 0
         return 0
+
+    @write_locked
+    def delete_document(self, doc_id: int) -> bool:
+        """
+        As ocorrências ja gravadas no arquivo ficam marcadas em deleted_docs até o
+        proximo merge (save_tmp_occurrences/finish_indexing/compact); as que ainda
+        estão em memória são descartadas na hora. Um documento reindexado depois
+        de removido (update_document) fica visível após finish_indexing.
+        """
+        if not super().delete_document(doc_id):
+            return False
+        self.thaw_lexicon()
+        self.lst_occurrences_tmp = [occurrence for occurrence in self.lst_occurrences_tmp
+                                    if occurrence.doc_id != doc_id]
+        self.tmp_occurrences_bytes = len(self.lst_occurrences_tmp) * FileIndex.OCCURRENCE_BYTES
+        self.dic_live_doc_count = {}
+        return True
+
+    def compact(self):
+        self.finish_indexing()
+
+    def __getstate__(self):
+        dic_state = super().__getstate__()
+        dic_state.pop("flush_listener", None)
+        # caminhos absolutos: o índice salvo pode ser aberto a partir de outro diretório
+        dic_state["str_file_prefix"] = os.path.abspath(self.str_file_prefix)
+        if self.str_idx_file_name is not None:
+            dic_state["str_idx_file_name"] = os.path.abspath(self.str_idx_file_name)
+        return dic_state
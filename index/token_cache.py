@@ -0,0 +1,165 @@
+"""
+Cache dos tokens de cada documento (saída do word_tokenize, antes do
+Cleaner.preprocess_word), para reindexar a coleção com outras opções do
+Cleaner (stemming, remoção de acentos e de stopwords) sem ler o HTML, rodar
+o BeautifulSoup e tokenizar de novo. Arquivos do diretório do cache:
+
+    tokens.dic:  um token por linha (string JSON); o id do token é o número da linha
+    tokens.bin:  MAGIC + quantidade de tokens n (uint64) e os ids dos tokens
+                 dos documentos, em sequência (n uint32)
+    docs.bin:    MAGIC + quantidade de documentos m (uint64), doc_ids (m
+                 uint32) e a posição em tokens.bin do início de cada
+                 documento, mais a posição final ((m + 1) uint64)
+
+(inteiros little-endian). Os documentos ficam na ordem em que foram
+indexados. O TokenCacheWriter é passado ao HTMLIndexer (token_cache=) na
+primeira indexação; as seguintes usam HTMLIndexer.index_token_cache com um
+TokenCache, que lê os arquivos com mmap.
+
+Uso: python -m index.token_cache CACHE [--output INDICE] [--no-stemming]
+     [--no-accents-removal] [--no-stop-words-removal]
+"""
+from typing import Iterator, List, Tuple
+from array import array
+import json
+import mmap
+import os
+import struct
+import sys
+
+TOKENS_MAGIC = b"RITOKNS1"
+DOCS_MAGIC = b"RITKDOC1"
+HEADER = struct.Struct("<8sQ")
+
+DICTIONARY_FILE = "tokens.dic"
+TOKENS_FILE = "tokens.bin"
+DOCS_FILE = "docs.bin"
+
+
+class TokenCacheWriter:
+    def __init__(self, str_dir: str):
+        if sys.byteorder != "little":
+            raise NotImplementedError("O cache de tokens só é suportado em plataformas little-endian")
+        os.makedirs(str_dir, exist_ok=True)
+        self.str_dir = str_dir
+        self.dic_token_ids = {}
+        self.arr_doc_ids = array("I")
+        self.arr_doc_starts = array("Q")
+        self.token_count = 0
+        self.tokens_file = open(os.path.join(str_dir, TOKENS_FILE), "wb")
+        # o cabeçalho é reescrito em close() com a quantidade de tokens
+        self.tokens_file.write(HEADER.pack(TOKENS_MAGIC, 0))
+
+    def add_document(self, doc_id: int, lst_tokens: List[str]):
+        arr_token_ids = array("I")
+        for token in lst_tokens:
+            token_id = self.dic_token_ids.get(token)
+            if token_id is None:
+                token_id = self.dic_token_ids[token] = len(self.dic_token_ids)
+            arr_token_ids.append(token_id)
+        self.arr_doc_ids.append(doc_id)
+        self.arr_doc_starts.append(self.token_count)
+        arr_token_ids.tofile(self.tokens_file)
+        self.token_count += len(arr_token_ids)
+
+    def close(self):
+        self.tokens_file.seek(0)
+        self.tokens_file.write(HEADER.pack(TOKENS_MAGIC, self.token_count))
+        self.tokens_file.close()
+        with open(os.path.join(self.str_dir, DICTIONARY_FILE), "w", encoding="utf-8") as file:
+            for token in self.dic_token_ids:
+                file.write(json.dumps(token, ensure_ascii=False) + "\n")
+        with open(os.path.join(self.str_dir, DOCS_FILE), "wb") as file:
+            file.write(HEADER.pack(DOCS_MAGIC, len(self.arr_doc_ids)))
+            self.arr_doc_ids.tofile(file)
+            self.arr_doc_starts.tofile(file)
+            array("Q", [self.token_count]).tofile(file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_mmap(str_file_name: str) -> mmap.mmap:
+    with open(str_file_name, "rb") as file:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class TokenCache:
+    def __init__(self, str_dir: str):
+        self.str_dir = str_dir
+        with open(os.path.join(str_dir, DICTIONARY_FILE), encoding="utf-8") as file:
+            self.lst_tokens = [json.loads(line) for line in file]
+
+        self.mm_tokens = open_mmap(os.path.join(str_dir, TOKENS_FILE))
+        magic, count = HEADER.unpack_from(self.mm_tokens)
+        if magic != TOKENS_MAGIC:
+            raise ValueError(f"{str_dir} não possui um arquivo de tokens válido")
+        self.token_ids = memoryview(self.mm_tokens)[HEADER.size:HEADER.size + 4 * count].cast("I")
+
+        self.mm_docs = open_mmap(os.path.join(str_dir, DOCS_FILE))
+        magic, count = HEADER.unpack_from(self.mm_docs)
+        if magic != DOCS_MAGIC:
+            raise ValueError(f"{str_dir} não possui um arquivo de documentos válido")
+        buffer = memoryview(self.mm_docs)
+        pos = HEADER.size
+        self.doc_ids = buffer[pos:pos + 4 * count].cast("I")
+        self.doc_starts = buffer[pos + 4 * count:pos + 4 * count + 8 * (count + 1)].cast("Q")
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def document_tokens(self, pos: int) -> List[str]:
+        """Tokens do pos-ésimo documento do cache"""
+        lst_tokens = self.lst_tokens
+        return [lst_tokens[token_id] for token_id in self.token_ids[self.doc_starts[pos]:self.doc_starts[pos + 1]]]
+
+    def __iter__(self) -> Iterator[Tuple[int, List[str]]]:
+        for pos, doc_id in enumerate(self.doc_ids):
+            yield doc_id, self.document_tokens(pos)
+
+    def close(self):
+        for view in (self.token_ids, self.doc_ids, self.doc_starts):
+            view.release()
+        self.mm_tokens.close()
+        self.mm_docs.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main():
+    import argparse
+    from index.indexer import Cleaner, DEFAULT_STOP_WORDS_FILE, HTMLIndexer
+    from index.structure import FileIndex
+
+    parser = argparse.ArgumentParser(description="Reindexa a coleção a partir do cache de tokens (sem ler o HTML)")
+    parser.add_argument("cache_dir", help="diretório do cache gravado pelo TokenCacheWriter")
+    parser.add_argument("--output", default=None, help="arquivo onde o indice finalizado será salvo (Index.load)")
+    parser.add_argument("--no-stemming", action="store_true")
+    parser.add_argument("--no-accents-removal", action="store_true")
+    parser.add_argument("--no-stop-words-removal", action="store_true")
+    parser.add_argument("--memory-budget", type=float, default=None,
+                        help="MB de ocorrências mantidas em memória antes de gravá-las em disco")
+    args = parser.parse_args()
+
+    indexer = HTMLIndexer(FileIndex(memory_budget=int(args.memory_budget * 1024 * 1024) if args.memory_budget else None))
+    indexer.cleaner = Cleaner(stop_words_file=DEFAULT_STOP_WORDS_FILE, language="portuguese",
+                              perform_stop_words_removal=not args.no_stop_words_removal,
+                              perform_accents_removal=not args.no_accents_removal,
+                              perform_stemming=not args.no_stemming)
+    with TokenCache(args.cache_dir) as token_cache:
+        indexer.index_token_cache(token_cache)
+    indexer.index.finish_indexing()
+    print(f"{indexer.index.document_count} documentos, {len(indexer.index.dic_index)} termos indexados em {indexer.index.str_idx_file_name}")
+    if args.output is not None:
+        indexer.index.save(args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+from index.token_cache import TokenCache, TokenCacheWriter
+from index.indexer import Cleaner, HTMLIndexer
+from index.ingest import ingest
+from index.structure import HashIndex
+from random import Random
+import os
+import tempfile
+import unittest
+
+
+class SplitIndexer(HTMLIndexer):
+    """Tokeniza por espaços (sem o nltk)"""
+    def tokenize(self, plain_text: str):
+        return plain_text.split()
+
+
+class TokenCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.str_cache_dir = os.path.join(self.tmp_dir.name, "cache")
+        random = Random(11)
+        vocabulary = ["Casa", "casas", "verde", "Árvore", "arvore", "ação", "é", "rua", "janela ", "\"aspas\""]
+        self.dic_docs = {doc_id: "<html><body><p>" + " ".join(random.choice(vocabulary) for i in range(12)) + "</p></body></html>"
+                         for doc_id in range(1, 21)}
+        self.cleaner = Cleaner(stop_words_file="stopwords.txt", language="portuguese",
+                               perform_stop_words_removal=False, perform_accents_removal=False,
+                               perform_stemming=False)
+        self.other_cleaner = Cleaner(stop_words_file="stopwords.txt", language="portuguese",
+                                     perform_stop_words_removal=True, perform_accents_removal=True,
+                                     perform_stemming=True)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def postings(self, index):
+        return {term: sorted((occur.doc_id, occur.term_freq) for occur in index.get_occurrence_list(term))
+                for term in index.vocabulary}
+
+    def build(self, cleaner, token_cache=None):
+        index = HashIndex()
+        indexer = SplitIndexer(index, token_cache=token_cache)
+        indexer.cleaner = cleaner
+        for doc_id, html in self.dic_docs.items():
+            indexer.index_text(doc_id, html)
+        return index
+
+    def test_write_read(self):
+        with TokenCacheWriter(self.str_cache_dir) as writer:
+            writer.add_document(3, ["a", "casa", "a"])
+            writer.add_document(1, [])
+            writer.add_document(2, ["linha\nquebrada", "casa"])
+        with TokenCache(self.str_cache_dir) as token_cache:
+            self.assertEqual(len(token_cache), 3)
+            self.assertListEqual(list(token_cache), [(3, ["a", "casa", "a"]), (1, []), (2, ["linha\nquebrada", "casa"])])
+            self.assertListEqual(token_cache.lst_tokens, ["a", "casa", "linha\nquebrada"])
+
+    def test_reindex_from_cache(self):
+        with TokenCacheWriter(self.str_cache_dir) as writer:
+            first_index = self.build(self.cleaner, writer)
+        self.assertDictEqual(self.postings(first_index), self.postings(self.build(self.cleaner)))
+
+        # outra configuração do Cleaner, a partir do cache
+        index = HashIndex()
+        indexer = SplitIndexer(index)
+        indexer.cleaner = self.other_cleaner
+        with TokenCache(self.str_cache_dir) as token_cache:
+            indexer.index_token_cache(token_cache)
+        self.assertDictEqual(self.postings(index), self.postings(self.build(self.other_cleaner)))
+        self.assertNotEqual(self.postings(index), self.postings(first_index))
+
+    def test_ingest(self):
+        with TokenCacheWriter(self.str_cache_dir) as writer:
+            indexer = SplitIndexer(HashIndex(), token_cache=writer)
+            indexer.cleaner = self.cleaner
+            ingest(indexer, self.dic_docs.items(), num_workers=2, use_processes=False)
+        with TokenCache(self.str_cache_dir) as token_cache:
+            self.assertListEqual([doc_id for doc_id, lst_tokens in token_cache], list(self.dic_docs))
+            self.assertEqual(sum(len(lst_tokens) for doc_id, lst_tokens in token_cache), 12 * len(self.dic_docs))
+
+
+if __name__ == "__main__":
+    unittest.main()
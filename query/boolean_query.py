@@ -0,0 +1,320 @@
+"""
+Consultas booleanas com AND, OR, NOT e parênteses, por exemplo:
+
+    belo AND (horizonte OR cidade) AND NOT praia
+
+Precedência: NOT > AND > OR. Termos lado a lado, sem operador, são unidos
+por AND. Os operadores só são reconhecidos em maiúsculas ("and" é um termo).
+
+`parse_query` gera a árvore da consulta (QueryTerm, QueryAnd, QueryOr,
+QueryNot). `plan_query` preprocessa os termos e reescreve a árvore a partir do
+df de cada termo (document_count_with_term), guardando o custo estimado
+(tamanho do resultado) em cada nó:
+
+    - os operandos de um AND são ordenados do menor custo para o maior e os
+      NOT ficam por último, avaliados como diferença do resultado parcial
+    - um AND com um termo que não está no índice vira a consulta vazia
+      (QueryEmpty), sem ler nenhuma lista; os vazios de um OR são removidos
+    - AND/OR aninhados do mesmo tipo são achatados e NOT NOT x vira x
+
+`execute_plan` avalia o plano sobre listas ordenadas de doc_ids: a
+interseção parte do resultado parcial (o menor) com busca binária na outra
+lista e para assim que ele fica vazio, sem avaliar os operandos restantes; a
+diferença é feita em uma única passada pela lista negada e o OR intercala as
+listas (heapq.merge). Apenas um NOT sem operando positivo é avaliado contra
+todos os documentos do índice.
+
+`execute_plan_bitmap` avalia o mesmo plano com RoaringBitmap
+(index/bitmap.py), usado quando o índice guarda os bitmaps dos termos mais
+frequentes (Index.enable_bitmap_cache): OR de listas grandes vira OR de
+inteiros, sem intercalar doc_id por doc_id.
+"""
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+import bisect
+import heapq
+import re
+
+from index.bitmap import RoaringBitmap
+from util.metrics import metrics
+
+OPERATORS = ("AND", "OR", "NOT")
+TOKEN_PATTERN = re.compile(r"\(|\)|[^\s()]+")
+
+
+class QuerySyntaxError(ValueError):
+    pass
+
+
+class QueryNode:
+    # tamanho estimado do resultado, definido por plan_query
+    cost = 0
+
+    def key(self) -> tuple:
+        return ()
+
+    def __eq__(self, other) -> bool:
+        return type(self) is type(other) and self.key() == other.key()
+
+    def __repr__(self):
+        return str(self)
+
+
+class QueryEmpty(QueryNode):
+    def __str__(self):
+        return "()"
+
+
+class QueryTerm(QueryNode):
+    def __init__(self, term: str):
+        self.term = term
+
+    def key(self) -> tuple:
+        return (self.term,)
+
+    def __str__(self):
+        return self.term
+
+
+class QueryNot(QueryNode):
+    def __init__(self, operand: QueryNode):
+        self.operand = operand
+
+    def key(self) -> tuple:
+        return (self.operand,)
+
+    def __str__(self):
+        return f"NOT {self.operand}"
+
+
+class QueryOperator(QueryNode):
+    operator = None
+
+    def __init__(self, lst_operands: List[QueryNode]):
+        self.lst_operands = lst_operands
+
+    def key(self) -> tuple:
+        return tuple(self.lst_operands)
+
+    def __str__(self):
+        return "(" + f" {self.operator} ".join(str(operand) for operand in self.lst_operands) + ")"
+
+
+class QueryAnd(QueryOperator):
+    operator = "AND"
+
+
+class QueryOr(QueryOperator):
+    operator = "OR"
+
+
+def tokenize(query: str) -> List[str]:
+    return TOKEN_PATTERN.findall(query)
+
+
+def parse_query(query: str) -> QueryNode:
+    lst_tokens = tokenize(query)
+    if not lst_tokens:
+        raise QuerySyntaxError("Consulta vazia")
+    node, pos = parse_or(lst_tokens, 0)
+    if pos < len(lst_tokens):
+        raise QuerySyntaxError(f"Token inesperado na posição {pos}: {lst_tokens[pos]}")
+    return node
+
+
+def parse_or(lst_tokens: List[str], pos: int) -> Tuple[QueryNode, int]:
+    node, pos = parse_and(lst_tokens, pos)
+    lst_operands = [node]
+    while pos < len(lst_tokens) and lst_tokens[pos] == "OR":
+        node, pos = parse_and(lst_tokens, pos + 1)
+        lst_operands.append(node)
+    return (lst_operands[0] if len(lst_operands) == 1 else QueryOr(lst_operands)), pos
+
+
+def parse_and(lst_tokens: List[str], pos: int) -> Tuple[QueryNode, int]:
+    node, pos = parse_not(lst_tokens, pos)
+    lst_operands = [node]
+    while pos < len(lst_tokens) and lst_tokens[pos] not in ("OR", ")"):
+        if lst_tokens[pos] == "AND":
+            pos += 1
+        node, pos = parse_not(lst_tokens, pos)
+        lst_operands.append(node)
+    return (lst_operands[0] if len(lst_operands) == 1 else QueryAnd(lst_operands)), pos
+
+
+def parse_not(lst_tokens: List[str], pos: int) -> Tuple[QueryNode, int]:
+    if pos >= len(lst_tokens):
+        raise QuerySyntaxError("Fim inesperado da consulta")
+    token = lst_tokens[pos]
+    if token == "NOT":
+        operand, pos = parse_not(lst_tokens, pos + 1)
+        return QueryNot(operand), pos
+    if token == "(":
+        node, pos = parse_or(lst_tokens, pos + 1)
+        if pos >= len(lst_tokens) or lst_tokens[pos] != ")":
+            raise QuerySyntaxError("Parêntese não fechado")
+        return node, pos + 1
+    if token in OPERATORS or token == ")":
+        raise QuerySyntaxError(f"Token inesperado na posição {pos}: {token}")
+    return QueryTerm(token), pos + 1
+
+
+def plan_query(node: QueryNode, document_count_with_term: Callable[[str], int], document_count: int,
+               preprocess: Callable[[str], Optional[str]] = None) -> Optional[QueryNode]:
+    """
+    Plano de execução da árvore `node`. Termos que o preprocessamento descarta
+    (ex.: stopwords) são removidos da consulta; se nada sobrar, retorna None.
+    """
+    if isinstance(node, QueryEmpty):
+        return node
+    if isinstance(node, QueryTerm):
+        term = preprocess(node.term) if preprocess is not None else node.term
+        if not term:
+            return None
+        df = document_count_with_term(term)
+        if not df:
+            return QueryEmpty()
+        planned = QueryTerm(term)
+        planned.cost = df
+        return planned
+    if isinstance(node, QueryNot):
+        operand = plan_query(node.operand, document_count_with_term, document_count, preprocess)
+        if operand is None:
+            return None
+        if isinstance(operand, QueryNot):
+            return operand.operand
+        planned = QueryNot(operand)
+        planned.cost = max(document_count - operand.cost, 0)
+        return planned
+
+    lst_operands = []
+    for operand in node.lst_operands:
+        planned = plan_query(operand, document_count_with_term, document_count, preprocess)
+        if planned is None:
+            continue
+        if type(planned) is type(node):
+            lst_operands += planned.lst_operands
+        else:
+            lst_operands.append(planned)
+
+    if isinstance(node, QueryAnd):
+        if any(isinstance(operand, QueryEmpty) for operand in lst_operands):
+            return QueryEmpty()
+        # NOT de um termo que não está no índice não remove nada
+        lst_operands = [operand for operand in lst_operands
+                        if not (isinstance(operand, QueryNot) and isinstance(operand.operand, QueryEmpty))]
+        lst_positive = sorted((operand for operand in lst_operands if not isinstance(operand, QueryNot)),
+                              key=lambda operand: operand.cost)
+        lst_negative = sorted((operand for operand in lst_operands if isinstance(operand, QueryNot)),
+                              key=lambda operand: operand.operand.cost)
+        lst_operands = lst_positive + lst_negative
+        if not lst_operands:
+            return None
+        if len(lst_operands) == 1:
+            return lst_operands[0]
+        planned = QueryAnd(lst_operands)
+        planned.cost = lst_positive[0].cost if lst_positive else min(operand.cost for operand in lst_negative)
+        return planned
+
+    if not lst_operands:
+        return None
+    lst_operands = [operand for operand in lst_operands if not isinstance(operand, QueryEmpty)]
+    if not lst_operands:
+        return QueryEmpty()
+    if len(lst_operands) == 1:
+        return lst_operands[0]
+    lst_operands.sort(key=lambda operand: operand.cost)
+    planned = QueryOr(lst_operands)
+    planned.cost = min(sum(operand.cost for operand in lst_operands), document_count)
+    return planned
+
+
+def intersection(lst_docs: List[int], lst_other_docs: List[int]) -> List[int]:
+    """Interseção de duas listas ordenadas: percorre a menor e faz busca binária na maior"""
+    if len(lst_docs) > len(lst_other_docs):
+        lst_docs, lst_other_docs = lst_other_docs, lst_docs
+    lst_result = []
+    pos = 0
+    for doc_id in lst_docs:
+        pos = bisect.bisect_left(lst_other_docs, doc_id, pos)
+        if pos == len(lst_other_docs):
+            break
+        if lst_other_docs[pos] == doc_id:
+            lst_result.append(doc_id)
+    return lst_result
+
+
+def difference(iter_docs: Iterable[int], iter_excluded: Iterable[int]) -> Iterator[int]:
+    """Documentos de iter_docs que não estão em iter_excluded (ambos ordenados), em uma passada"""
+    iter_excluded = iter(iter_excluded)
+    excluded = next(iter_excluded, None)
+    for doc_id in iter_docs:
+        while excluded is not None and excluded < doc_id:
+            excluded = next(iter_excluded, None)
+        if doc_id != excluded:
+            yield doc_id
+
+
+def union(lst_lists: List[Iterable[int]]) -> Iterator[int]:
+    previous = None
+    for doc_id in heapq.merge(*lst_lists):
+        if doc_id != previous:
+            yield doc_id
+            previous = doc_id
+
+
+def execute_plan(node: Optional[QueryNode], get_doc_ids: Callable[[str], List[int]],
+                 get_all_doc_ids: Callable[[], List[int]]) -> List[int]:
+    """
+    Doc_ids (ordenados) que satisfazem o plano. get_doc_ids retorna os
+    doc_ids ordenados de um termo e get_all_doc_ids os de todo o índice.
+    """
+    if node is None or isinstance(node, QueryEmpty):
+        return []
+    if isinstance(node, QueryTerm):
+        return get_doc_ids(node.term)
+    if isinstance(node, QueryNot):
+        return list(difference(get_all_doc_ids(), execute_plan(node.operand, get_doc_ids, get_all_doc_ids)))
+    if isinstance(node, QueryOr):
+        return list(union([execute_plan(operand, get_doc_ids, get_all_doc_ids) for operand in node.lst_operands]))
+
+    lst_result = None
+    for operand in node.lst_operands:
+        if isinstance(operand, QueryNot):
+            if lst_result is None:
+                lst_result = get_all_doc_ids()
+            lst_result = list(difference(lst_result, execute_plan(operand.operand, get_doc_ids, get_all_doc_ids)))
+        else:
+            lst_docs = execute_plan(operand, get_doc_ids, get_all_doc_ids)
+            lst_result = lst_docs if lst_result is None else intersection(lst_result, lst_docs)
+        if not lst_result:
+            metrics.inc("query.boolean_short_circuits")
+            return []
+    return lst_result
+
+
+def execute_plan_bitmap(node: Optional[QueryNode], get_bitmap: Callable[[str], RoaringBitmap],
+                        get_all_bitmap: Callable[[], RoaringBitmap]) -> RoaringBitmap:
+    """Igual a execute_plan, com os doc_ids de cada termo (get_bitmap) e do índice (get_all_bitmap) em bitmaps"""
+    if node is None or isinstance(node, QueryEmpty):
+        return RoaringBitmap()
+    if isinstance(node, QueryTerm):
+        return get_bitmap(node.term)
+    if isinstance(node, QueryNot):
+        return get_all_bitmap() - execute_plan_bitmap(node.operand, get_bitmap, get_all_bitmap)
+    if isinstance(node, QueryOr):
+        return RoaringBitmap.union_all([execute_plan_bitmap(operand, get_bitmap, get_all_bitmap)
+                                        for operand in node.lst_operands])
+
+    result = None
+    for operand in node.lst_operands:
+        if isinstance(operand, QueryNot):
+            if result is None:
+                result = get_all_bitmap()
+            result = result - execute_plan_bitmap(operand.operand, get_bitmap, get_all_bitmap)
+        else:
+            bitmap = execute_plan_bitmap(operand, get_bitmap, get_all_bitmap)
+            result = bitmap if result is None else result & bitmap
+        if not result:
+            metrics.inc("query.boolean_short_circuits")
+            return RoaringBitmap()
+    return result
@@ -0,0 +1,199 @@
+"""
+Matriz documento x termo (CSR) com os pesos tf-idf do VectorRankingModel já
+divididos pela norma do documento (IndexPreComputedVals), para pontuar
+muitas consultas de uma vez (avaliação offline).
+
+Formato CSR: as entradas da linha i (documento lst_doc_ids[i]) estão em
+indices[indptr[i]:indptr[i + 1]] (colunas, ordenadas) e nos mesmos
+intervalos de data (pesos). As colunas são os termos do vocabulário em
+ordem (dic_term_column). Termos com idf 0 (presentes em todos os
+documentos) não geram entradas.
+
+`rank_batch` monta a matriz das consultas Q (peso tf-idf de cada termo da
+consulta, como em VectorRankingModel.get_ordered_docs) e calcula Q x D^T,
+selecionando os k documentos de maior peso de cada linha. O produto usa o
+scipy.sparse quando ele está instalado (opcional); senão é feito em Python
+sobre a transposta de D (uma lista de documentos por termo), calculada uma
+vez e reaproveitada por todas as consultas.
+"""
+from typing import Dict, List, Mapping, Tuple
+from array import array
+import heapq
+import pickle
+
+from query.ranking_models import IndexPreComputedVals, VectorRankingModel
+from util.metrics import metrics
+
+
+class CSRMatrix:
+    def __init__(self, shape: Tuple[int, int], indptr: array, indices: array, data: array):
+        self.shape = shape
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+
+    @classmethod
+    def from_rows(cls, lst_rows: List[Mapping[int, float]], num_cols: int) -> "CSRMatrix":
+        indptr, indices, data = array("q", [0]), array("I"), array("d")
+        for dic_row in lst_rows:
+            for col in sorted(dic_row):
+                indices.append(col)
+                data.append(dic_row[col])
+            indptr.append(len(indices))
+        return cls((len(lst_rows), num_cols), indptr, indices, data)
+
+    @property
+    def nnz(self) -> int:
+        return len(self.data)
+
+    def row(self, i: int) -> Tuple[array, array]:
+        start, end = self.indptr[i], self.indptr[i + 1]
+        return self.indices[start:end], self.data[start:end]
+
+    def transpose(self) -> "CSRMatrix":
+        num_rows, num_cols = self.shape
+        # contagem por coluna e, a partir dela, o início de cada linha da transposta
+        indptr = array("q", bytes(8 * (num_cols + 1)))
+        for col in self.indices:
+            indptr[col + 1] += 1
+        for col in range(num_cols):
+            indptr[col + 1] += indptr[col]
+        lst_next = list(indptr[:-1])
+        indices = array("I", bytes(4 * self.nnz))
+        data = array("d", bytes(8 * self.nnz))
+        for i in range(num_rows):
+            for pos in range(self.indptr[i], self.indptr[i + 1]):
+                col = self.indices[pos]
+                indices[lst_next[col]] = i
+                data[lst_next[col]] = self.data[pos]
+                lst_next[col] += 1
+        return CSRMatrix((num_cols, num_rows), indptr, indices, data)
+
+    def to_scipy(self):
+        from scipy.sparse import csr_matrix
+        return csr_matrix((self.data, self.indices, self.indptr), shape=self.shape)
+
+
+def scipy_available() -> bool:
+    try:
+        import scipy.sparse
+    except ImportError:
+        return False
+    return True
+
+
+class DocTermMatrix:
+    def __init__(self, matrix: CSRMatrix, lst_doc_ids: List[int], lst_terms: List[str],
+                 lst_dfs: List[int], doc_count: int):
+        self.matrix = matrix
+        self.lst_doc_ids = lst_doc_ids
+        self.lst_terms = lst_terms
+        self.dic_term_column = {term: col for col, term in enumerate(lst_terms)}
+        self.lst_dfs = lst_dfs
+        self.doc_count = doc_count
+        # transposta (termo x documento), calculada no primeiro rank_batch sem scipy
+        self.term_matrix = None
+
+    @classmethod
+    def build(cls, index, idx_pre_comp_vals: IndexPreComputedVals = None) -> "DocTermMatrix":
+        """Exporta o índice (sem os documentos removidos) com as normas de idx_pre_comp_vals"""
+        if idx_pre_comp_vals is None:
+            idx_pre_comp_vals = IndexPreComputedVals(index)
+        doc_count = idx_pre_comp_vals.doc_count
+        lst_doc_ids = sorted(idx_pre_comp_vals.document_norm)
+        dic_doc_row = {doc_id: row for row, doc_id in enumerate(lst_doc_ids)}
+
+        # as listas de ocorrência são por termo: monta a transposta e depois a inverte
+        lst_terms = sorted(term for term in index.vocabulary if term)
+        lst_dfs = []
+        lst_term_rows = []
+        for term in lst_terms:
+            occur_list = index.get_occurrence_list(term)
+            df = idx_pre_comp_vals.document_count_with_term(term, occur_list)
+            lst_dfs.append(df)
+            dic_row = {}
+            for occur in occur_list:
+                norm = idx_pre_comp_vals.document_norm.get(occur.doc_id)
+                if not norm:
+                    continue
+                weight = VectorRankingModel.tf_idf(doc_count, occur.term_freq, df)
+                if weight:
+                    dic_row[dic_doc_row[occur.doc_id]] = weight / norm
+            lst_term_rows.append(dic_row)
+        term_matrix = CSRMatrix.from_rows(lst_term_rows, len(lst_doc_ids))
+        doc_term_matrix = cls(term_matrix.transpose(), lst_doc_ids, lst_terms, lst_dfs, doc_count)
+        doc_term_matrix.term_matrix = term_matrix
+        return doc_term_matrix
+
+    def query_matrix(self, lst_queries: List[Mapping[str, int]]) -> CSRMatrix:
+        """Uma linha por consulta (termo -> frequência na consulta); termos fora do vocabulário são ignorados"""
+        lst_rows = []
+        for dic_query in lst_queries:
+            dic_row = {}
+            for term, term_freq in dic_query.items():
+                col = self.dic_term_column.get(term)
+                if col is not None:
+                    dic_row[col] = VectorRankingModel.tf_idf(self.doc_count, term_freq, self.lst_dfs[col])
+            lst_rows.append(dic_row)
+        return CSRMatrix.from_rows(lst_rows, len(self.lst_terms))
+
+    def rank_batch(self, lst_queries: List[Mapping[str, int]], k: int = 10,
+                   use_scipy: bool = None) -> List[Tuple[List[int], Dict[int, float]]]:
+        """
+        Para cada consulta, os k doc_ids de maior peso (k=None: todos com peso > 0)
+        e seus pesos, no formato de get_ordered_docs.
+        """
+        query_matrix = self.query_matrix(lst_queries)
+        metrics.inc("query.queries", len(lst_queries))
+        if use_scipy is None:
+            use_scipy = scipy_available()
+        with metrics.span("query.batch_score"):
+            if use_scipy:
+                lst_scores = self.scores_scipy(query_matrix)
+            else:
+                lst_scores = self.scores_python(query_matrix)
+        lst_results = []
+        for dic_scores in lst_scores:
+            lst_top = heapq.nlargest(k, dic_scores.items(), key=lambda item: (item[1], -item[0])) if k is not None else \
+                sorted(dic_scores.items(), key=lambda item: (-item[1], item[0]))
+            lst_results.append(([self.lst_doc_ids[row] for row, score in lst_top],
+                                {self.lst_doc_ids[row]: score for row, score in lst_top}))
+        return lst_results
+
+    def scores_python(self, query_matrix: CSRMatrix) -> List[Dict[int, float]]:
+        if self.term_matrix is None:
+            self.term_matrix = self.matrix.transpose()
+        term_matrix = self.term_matrix
+        lst_scores = []
+        for i in range(query_matrix.shape[0]):
+            dic_scores = {}
+            for col, query_weight in zip(*query_matrix.row(i)):
+                for pos in range(term_matrix.indptr[col], term_matrix.indptr[col + 1]):
+                    row = term_matrix.indices[pos]
+                    dic_scores[row] = dic_scores.get(row, 0.0) + query_weight * term_matrix.data[pos]
+            lst_scores.append({row: score for row, score in dic_scores.items() if score > 0})
+        return lst_scores
+
+    def scores_scipy(self, query_matrix: CSRMatrix) -> List[Dict[int, float]]:
+        scores = (query_matrix.to_scipy() @ self.matrix.to_scipy().T).tocsr()
+        lst_scores = []
+        for i in range(scores.shape[0]):
+            start, end = scores.indptr[i], scores.indptr[i + 1]
+            lst_scores.append({int(row): float(score) for row, score in zip(scores.indices[start:end], scores.data[start:end])
+                               if score > 0})
+        return lst_scores
+
+    def save(self, str_file_name: str):
+        with open(str_file_name, "wb") as file:
+            pickle.dump(self, file)
+
+    @staticmethod
+    def load(str_file_name: str) -> "DocTermMatrix":
+        with open(str_file_name, "rb") as file:
+            return pickle.load(file)
+
+    def __getstate__(self):
+        # a transposta é refeita quando necessário
+        dic_state = self.__dict__.copy()
+        dic_state["term_matrix"] = None
+        return dic_state
@@ -1,15 +1,26 @@
 from typing import List, Set,Mapping
-from nltk.tokenize import word_tokenize
 from util.time import CheckTime
+from util.metrics import metrics
+from util.profiling import profiler
 from query.ranking_models import RankingModel,VectorRankingModel, IndexPreComputedVals
 from index.structure import Index, TermOccurrence
+from index.champions import ChampionList
 from index.indexer import Cleaner
+from index.positions import PositionStore, query_term_offsets, match_phrase
+from query.boolean_query import parse_query, plan_query, execute_plan, execute_plan_bitmap
+from index.bitmap import RoaringBitmap
+import math
+
+#consultas de avaliação -> arquivo (em relevant_docs) com os ids dos documentos relevantes
+DIC_EVALUATION_QUERIES = {"Belo Horizonte": "belo_horizonte", "Irlanda": "irlanda", "São Paulo": "sao_paulo"}
 
 class QueryRunner:
-	def __init__(self,ranking_model:RankingModel,index:Index, cleaner:Cleaner):
+	def __init__(self,ranking_model:RankingModel,index:Index, cleaner:Cleaner, position_store:PositionStore=None):
 		self.ranking_model = ranking_model
 		self.index = index
 		self.cleaner = cleaner
+		#posições dos termos, usadas apenas por get_docs_phrase
+		self.position_store = position_store
 
 
 	def get_relevance_per_query(self) -> Mapping[str,Set[int]]:
@@ -51,6 +62,25 @@ class QueryRunner:
 
 		return precision, recall
 
+	def compute_ndcg(self, n:int, lst_docs:List[int], relevant_docs:Set[int]) -> float:
+		"""
+			nDCG nas top n posições, com relevância binária (1 se o documento está em relevant_docs)
+		"""
+		dcg = sum(1 / math.log2(pos + 2) for pos, doc_id in enumerate(lst_docs[:n]) if doc_id in relevant_docs)
+		idcg = sum(1 / math.log2(pos + 2) for pos in range(min(n, len(relevant_docs))))
+		return dcg / idcg if idcg > 0 else 0
+
+	@staticmethod
+	def load_relevant_docs(str_dir:str = "relevant_docs") -> Mapping[str,Set[int]]:
+		"""
+			Consulta de avaliação (DIC_EVALUATION_QUERIES) -> conjunto de ids (inteiros) dos documentos relevantes
+		"""
+		dic_relevance_docs = {}
+		for query, str_file in DIC_EVALUATION_QUERIES.items():
+			with open(f"{str_dir}/{str_file}.dat") as file:
+				dic_relevance_docs[query] = {int(doc_id) for doc_id in file.read().split(",") if doc_id.strip()}
+		return dic_relevance_docs
+
 	def get_query_term_occurence(self, query:str) -> Mapping[str,TermOccurrence]:
 		"""
 			Preprocesse a consulta da mesma forma que foi preprocessado o texto do documento (use a classe Cleaner para isso).
@@ -92,15 +122,190 @@ class QueryRunner:
 			A partir do indice, retorna a lista de ids de documentos desta consulta
 			usando o modelo especificado pelo atributo ranking_model
 		"""
-		#Obtenha, para cada termo da consulta, sua ocorrencia por meio do método get_query_term_occurence
-		dic_query_occur = self.get_query_term_occurence(query)
+		metrics.inc("query.queries")
+		with metrics.span("query.postings_fetch"):
+			#Obtenha, para cada termo da consulta, sua ocorrencia por meio do método get_query_term_occurence
+			dic_query_occur = self.get_query_term_occurence(query)
 
-		#obtenha a lista de ocorrencia dos termos da consulta
-		terms = query.split(' ')
-		dic_occur_per_term_query = self.get_occurrence_list_per_term(terms)
+			#obtenha a lista de ocorrencia dos termos da consulta
+			terms = query.split(' ')
+			dic_occur_per_term_query = self.get_occurrence_list_per_term(terms)
 
 		#utilize o ranking_model para retornar o documentos ordenados considrando dic_query_occur e dic_occur_per_term_query
-		return self.ranking_model.get_ordered_docs(dic_query_occur, dic_occur_per_term_query)
+		with metrics.span("query.score"):
+			return self.ranking_model.get_ordered_docs(dic_query_occur, dic_occur_per_term_query)
+
+	def expand_query_terms(self, query:str, max_distance:int=1, max_expansions:int=10) -> List[str]:
+		"""
+			Termos do indice para cada termo da consulta, usando o indice de k-gramas (index.kgram_index):
+			termos com `*` são expandidos como wildcard e termos que não estão no indice são trocados
+			pelos termos a até max_distance edições. O mesmo termo pode aparecer mais de uma vez.
+		"""
+		kgram_index = self.index.kgram_index
+		if kgram_index is None:
+			raise ValueError("A expansão de termos precisa do indice de k-gramas (Index.enable_kgram_index)")
+		lst_terms = []
+		for term in query.split(' '):
+			if '*' in term:
+				pattern = term.lower()
+				if self.cleaner.perform_accents_removal:
+					pattern = self.cleaner.remove_accents(pattern)
+				lst_terms += kgram_index.wildcard(pattern, max_expansions)
+				continue
+			preprocessed_term = self.cleaner.preprocess_word(term)
+			if not preprocessed_term:
+				continue
+			if preprocessed_term in self.index.dic_index:
+				lst_terms.append(preprocessed_term)
+			else:
+				lst_terms += kgram_index.similar(preprocessed_term, max_distance, max_expansions)
+		return lst_terms
+
+	def get_docs_term_expanded(self, query:str, max_distance:int=1, max_expansions:int=10) -> (List[int], Mapping[int,float]):
+		"""
+			Igual a get_docs_term, mas com os termos da consulta expandidos por expand_query_terms
+		"""
+		metrics.inc("query.queries")
+		with metrics.span("query.postings_fetch"):
+			dic_query_occur = {}
+			dic_occur_per_term_query = {}
+			for term in self.expand_query_terms(query, max_distance, max_expansions):
+				if term in dic_query_occur:
+					dic_query_occur[term].term_freq += 1
+					continue
+				dic_query_occur[term] = TermOccurrence(None, self.index.get_term_id(term), 1)
+				dic_occur_per_term_query[term] = self.index.get_occurrence_list(term)
+		with metrics.span("query.score"):
+			return self.ranking_model.get_ordered_docs(dic_query_occur, dic_occur_per_term_query)
+
+	def plan_boolean_query(self, query:str):
+		"""
+			Plano de execução (query.boolean_query) da consulta booleana, com os termos preprocessados
+			pelo cleaner e os operandos ordenados pelo df de cada termo
+		"""
+		return plan_query(parse_query(query), self.index.document_count_with_term, self.index.document_count,
+							self.cleaner.preprocess_word)
+
+	def get_live_doc_ids(self, term:str) -> List[int]:
+		return sorted(occur.doc_id for occur in self.index.live_occurrences(self.index.get_occurrence_list(term)))
+
+	def get_all_live_doc_ids(self) -> List[int]:
+		return sorted(doc_id for doc_id in self.index.set_documents if doc_id not in self.index.deleted_docs)
+
+	def get_all_live_doc_bitmap(self) -> RoaringBitmap:
+		return RoaringBitmap(self.get_all_live_doc_ids())
+
+	def get_docs_boolean(self, query:str) -> (List[int], Mapping[int,float]):
+		"""
+			Consulta booleana com AND, OR, NOT e parênteses (ex.: "belo AND (horizonte OR cidade) NOT praia").
+			Retorna os doc_ids em ordem crescente e, como o BooleanRankingModel, nenhum peso.
+			Se o indice guarda bitmaps (Index.enable_bitmap_cache), a avaliação é feita com eles.
+			Lança query.boolean_query.QuerySyntaxError se a consulta for inválida.
+		"""
+		metrics.inc("query.boolean_queries")
+		with metrics.span("query.plan"):
+			plan = self.plan_boolean_query(query)
+		with metrics.span("query.boolean_execute"):
+			if self.index.bitmap_cache is not None:
+				return execute_plan_bitmap(plan, self.index.get_doc_id_bitmap, self.get_all_live_doc_bitmap).to_list(), None
+			return execute_plan(plan, self.get_live_doc_ids, self.get_all_live_doc_ids), None
+
+	def get_docs_term_top_k(self, query:str, k:int=10) -> (List[int], Mapping[int,float]):
+		"""
+			Ranking aproximado: pontua apenas as champion lists (index.champion_lists) dos termos da
+			consulta e usa as listas completas (get_docs_term) só quando elas não rendem k documentos
+		"""
+		champion_lists = self.index.champion_lists
+		if champion_lists is None:
+			raise ValueError("O ranking aproximado precisa das champion lists (Index.enable_champion_lists)")
+		metrics.inc("query.queries")
+		with metrics.span("query.postings_fetch"):
+			dic_query_occur = {}
+			dic_occur_per_term_query = {}
+			for term in query.split(' '):
+				preprocessed_term = self.cleaner.preprocess_word(term)
+				if preprocessed_term not in champion_lists:
+					continue
+				if preprocessed_term in dic_query_occur:
+					dic_query_occur[preprocessed_term].term_freq += 1
+					continue
+				dic_query_occur[preprocessed_term] = TermOccurrence(None, self.index.get_term_id(preprocessed_term), 1)
+				dic_occur_per_term_query[preprocessed_term] = champion_lists.get_occurrence_list(preprocessed_term,
+																								self.index.deleted_docs)
+		with metrics.span("query.score"):
+			lst_docs, dic_weights = self.ranking_model.get_ordered_docs(dic_query_occur, dic_occur_per_term_query)
+		if len(lst_docs) >= k:
+			return lst_docs, dic_weights
+		metrics.inc("query.champion_fallbacks")
+		return self.get_docs_term(query)
+
+	def get_docs_phrase(self, query:str, max_distance:int=0) -> (List[int], Mapping[int,float]):
+		"""
+			Consulta de frase (max_distance=0) ou de proximidade: retorna apenas os documentos em que os
+			termos da consulta aparecem na mesma ordem e distância, com até max_distance tokens a mais
+			entre termos consecutivos. Os candidatos são a interseção das listas de ocorrências; as
+			posições são lidas apenas para eles. Só os documentos que casam são pontuados pelo
+			ranking_model, com o idf das listas completas.
+		"""
+		if self.position_store is None:
+			raise ValueError("Consultas de frase precisam das posições dos termos (position_store)")
+		metrics.inc("query.phrase_queries")
+		terms = query.split(' ')
+		lst_offsets = query_term_offsets(terms, self.cleaner.preprocess_word)
+		with metrics.span("query.postings_fetch"):
+			dic_query_occur = self.get_query_term_occurence(query)
+			dic_occur_per_term_query = self.get_occurrence_list_per_term(terms)
+
+		with metrics.span("query.phrase_match"):
+			#interseção a partir da menor lista
+			set_candidates = None
+			for term in sorted({term for offset, term in lst_offsets}, key=lambda term: len(dic_occur_per_term_query[term])):
+				set_docs = {occur.doc_id for occur in dic_occur_per_term_query[term]}
+				set_candidates = set_docs if set_candidates is None else set_candidates & set_docs
+				if not set_candidates:
+					break
+			set_matches = set()
+			if set_candidates:
+				dic_doc_positions = self.position_store.get_positions(set_candidates, {term for offset, term in lst_offsets})
+				set_matches = {doc_id for doc_id, dic_positions in dic_doc_positions.items()
+								if match_phrase(dic_positions, lst_offsets, max_distance)}
+
+		#só os documentos que casam com a frase são pontuados; como nas champion lists, a lista
+		#parcial informa o df da lista completa, então o idf não muda
+		dic_matches_per_term = {term: ChampionList((occur for occur in lst_occurrences if occur.doc_id in set_matches),
+													len(lst_occurrences))
+								for term, lst_occurrences in dic_occur_per_term_query.items()}
+		with metrics.span("query.score"):
+			return self.ranking_model.get_ordered_docs(dic_query_occur, dic_matches_per_term)
+
+	@profiler.profiled("query_batch")
+	def get_docs_term_batch(self, queries:List[str]) -> Mapping[str,tuple]:
+		"""
+			Executa get_docs_term para cada consulta de `queries`, retornando um dicionario
+			consulta -> (lista de documentos ordenada, pesos)
+		"""
+		dic_responses = {}
+		for query in queries:
+			dic_responses[query] = self.get_docs_term(query)
+			profiler.sample()
+		return dic_responses
+
+	@profiler.profiled("query_matrix_batch")
+	def get_docs_term_matrix_batch(self, queries:List[str], doc_term_matrix, k:int=10) -> Mapping[str,tuple]:
+		"""
+			Como get_docs_term_batch (modelo vetorial), mas pontua todas as consultas de uma vez
+			sobre a matriz documento x termo (query.doc_term_matrix.DocTermMatrix), retornando os k
+			documentos de maior peso de cada consulta (k=None: todos)
+		"""
+		lst_queries = []
+		for query in queries:
+			dic_query = {}
+			for term in query.split(' '):
+				preprocessed_term = self.cleaner.preprocess_word(term)
+				if preprocessed_term:
+					dic_query[preprocessed_term] = dic_query.get(preprocessed_term, 0) + 1
+			lst_queries.append(dic_query)
+		return dict(zip(queries, doc_term_matrix.rank_batch(lst_queries, k)))
 
 	@staticmethod
 	def runQuery(query:str, indice:Index, indice_pre_computado:IndexPreComputedVals , map_relevantes:Mapping[str,Set[int]]):
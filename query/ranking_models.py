@@ -2,19 +2,34 @@ from typing import List
 from abc import abstractmethod
 from typing import List, Set,Mapping
 from index.structure import HashIndex,FileIndex,TermOccurrence
+from index.bitmap import RoaringBitmap
 import math
 from enum import Enum
+from util.metrics import metrics
+from util.profiling import profiler
 
 class IndexPreComputedVals():
-    def __init__(self,index):
+    # valores calculados uma única vez no construtor; depois disso a instância
+    # é somente leitura e compartilhada entre as threads de consulta
+    # collection_stats (ex.: index.sharding.CollectionStats) substitui o numero de
+    # documentos e o df do proprio indice quando este é apenas uma parte da coleção;
+    # por padrão, é o do proprio indice, se houver (ex.: indice podado por index.pruning)
+    def __init__(self,index, collection_stats=None):
         self.index = index
+        self.collection_stats = collection_stats if collection_stats is not None else getattr(index, "collection_stats", None)
         self.precompute_vals()
 
+    def document_count_with_term(self, term:str, occur_list:List[TermOccurrence]) -> int:
+        if self.collection_stats is not None:
+            return self.collection_stats.document_count_with_term(term)
+        # listas parciais (ex.: index.champions.ChampionList) informam o df da lista completa
+        return getattr(occur_list, "doc_count_with_term", len(occur_list))
+
     def weight_dict(self) -> dict:
         dict_w = dict()
         for term in self.index.vocabulary:
             occur_list = self.index.get_occurrence_list(term)
-            num_docs_with_term = len(occur_list)
+            num_docs_with_term = self.document_count_with_term(term, occur_list)
             for occur in occur_list:
                 #print(str(term)+' and '+str(occur.doc_id))
                 if not(occur.doc_id in dict_w):
@@ -24,14 +39,17 @@ class IndexPreComputedVals():
         #print(dict_w)
         return dict_w
 
+    @profiler.profiled("precompute_vals")
     def precompute_vals(self):
         """
         Inicializa os atributos por meio do indice (idx):
             doc_count: o numero de documentos que o indice possui
             document_norm: A norma por documento (cada termo é presentado pelo seu peso (tfxidf))
+        Deve ser chamado novamente após remoções/atualizações de documentos,
+        pois o numero de documentos (e, assim, o idf de todos os termos) muda.
         """
         self.document_norm = dict()
-        self.doc_count = self.index.document_count
+        self.doc_count = self.index.document_count if self.collection_stats is None else self.collection_stats.document_count
         dict_w = self.weight_dict()
         for doc_id, w_list in dict_w.items():
             sum = 0
@@ -39,12 +57,29 @@ class IndexPreComputedVals():
                 sum += w**2
             self.document_norm[doc_id] = math.sqrt(sum)      
 
+class SharedPreComputedVals(IndexPreComputedVals):
+    """Valores pré-calculados lidos de um index.shared.SharedIndex (publicados com publish_index)"""
+    def precompute_vals(self):
+        self.doc_count = self.index.norm_doc_count
+        self.document_norm = self.index.document_norm
+
 class RankingModel():
+    # doc_ids removidos do indice (RoaringBitmap); as ocorrências desses
+    # documentos são ignoradas ao percorrer as listas
+    deleted_docs = None
+
+    def live_occurrences(self, occur_list:List[TermOccurrence]) -> List[TermOccurrence]:
+        # listas parciais (ex.: index.champions.ChampionList) já vêm sem os removidos
+        if not self.deleted_docs or hasattr(occur_list, "doc_count_with_term"):
+            return occur_list
+        return [occur for occur in occur_list if occur.doc_id not in self.deleted_docs]
+
     @abstractmethod
     def get_ordered_docs(self,query:Mapping[str,TermOccurrence],
                               docs_occur_per_term:Mapping[str,List[TermOccurrence]]) -> (List[int], Mapping[int,float]):
         raise NotImplementedError("Voce deve criar uma subclasse e a mesma deve sobrepor este método")
 
+    @metrics.timed("query.rank")
     def rank_document_ids(self,documents_weight):
         doc_ids = list(documents_weight.keys())
         doc_ids.sort(key= lambda x:-documents_weight[x])
@@ -56,42 +91,19 @@ class OPERATOR(Enum):
     
 #Atividade 1
 class BooleanRankingModel(RankingModel):
-    def __init__(self,operator:OPERATOR):
+    def __init__(self,operator:OPERATOR, deleted_docs=None):
         self.operator = operator
+        self.deleted_docs = deleted_docs
 
-    def intersection_all(self,map_lst_occurrences:Mapping[str,List[TermOccurrence]]) -> List[int]:
-        dict_ids = dict()
-        for term, lst_occurrences in map_lst_occurrences.items():
-            for occur in lst_occurrences:
-                if not (occur.term_id in dict_ids):
-                    dict_ids[occur.term_id] = [occur.doc_id]
-                else:
-                    dict_ids[occur.term_id].append(occur.doc_id)
-        list_ids = list()
-        old_list = None
-        for term_id, doc_ids_list in dict_ids.items():
-            if old_list == None:
-                old_list = doc_ids_list
-            else:
-                for doc_id in doc_ids_list:
-                    if doc_id in old_list:
-                        list_ids.append(doc_id)
-        set_ids = set(list_ids)
-        return set_ids
-        
-    def union_all(self,map_lst_occurrences:Mapping[str,List[TermOccurrence]]) -> List[int]:
-        dict_ids = dict()
-        for term, lst_occurrences in map_lst_occurrences.items():
-            for occur in lst_occurrences:
-                if not (occur.term_id in dict_ids):
-                    dict_ids[occur.term_id] = [occur.doc_id]
-                else:
-                    dict_ids[occur.term_id].append(occur.doc_id)
-        list_ids = list()
-        for term_id, doc_ids_list in dict_ids.items():
-            list_ids += doc_ids_list
-        set_ids = set(list_ids)
-        return set_ids
+    def doc_id_bitmaps(self,map_lst_occurrences:Mapping[str,List[TermOccurrence]]) -> List[RoaringBitmap]:
+        return [RoaringBitmap(occur.doc_id for occur in self.live_occurrences(lst_occurrences))
+                for lst_occurrences in map_lst_occurrences.values()]
+
+    def intersection_all(self,map_lst_occurrences:Mapping[str,List[TermOccurrence]]) -> RoaringBitmap:
+        return RoaringBitmap.intersection_all(self.doc_id_bitmaps(map_lst_occurrences))
+
+    def union_all(self,map_lst_occurrences:Mapping[str,List[TermOccurrence]]) -> RoaringBitmap:
+        return RoaringBitmap.union_all(self.doc_id_bitmaps(map_lst_occurrences))
 
     def get_ordered_docs(self,query:Mapping[str,TermOccurrence],
                               map_lst_occurrences:Mapping[str,List[TermOccurrence]]) -> (List[int], Mapping[int,float]):
@@ -106,6 +118,7 @@ class VectorRankingModel(RankingModel):
 
     def __init__(self,idx_pre_comp_vals:IndexPreComputedVals):
         self.idx_pre_comp_vals = idx_pre_comp_vals
+        self.deleted_docs = getattr(idx_pre_comp_vals.index, "deleted_docs", None)
 
     @staticmethod
     def tf(freq_term:int) -> float:
@@ -131,7 +144,8 @@ class VectorRankingModel(RankingModel):
         num_docs_with_term = dict()
         docs_with_term_list = []
         for term, occur_list in docs_occur_per_term.items():
-            num_docs_with_term[term] = len(occur_list)
+            occur_list = self.live_occurrences(occur_list)
+            num_docs_with_term[term] = self.idx_pre_comp_vals.document_count_with_term(term, occur_list)
             for occur in occur_list:
                 docs_with_term_list.append(occur.doc_id)
                 key = term+'|'+str(occur.doc_id)
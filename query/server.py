@@ -0,0 +1,324 @@
+"""
+Servidor de consultas assíncrono sobre um índice persistido.
+
+O índice e os valores pré-computados são carregados uma única vez; cada
+conexão (TCP local ou socket Unix) troca mensagens JSON, uma por linha:
+
+    {"id": 1, "op": "query", "query": "belo horizonte", "k": 10}
+    -> {"id": 1, "ok": true, "docs": [...], "scores": [...], "titles": [...]}
+    {"id": 2, "op": "stats"}
+    -> {"id": 2, "ok": true, "stats": {...}}
+
+A pontuação (CPU) roda em um pool de executores para não bloquear o loop de
+eventos: threads (padrão, ou o `executor` informado) ou, com `num_processes`,
+um ProcessPoolExecutor cujos processos recebem uma cópia do QueryRunner
+uma única vez (use um index.shared.SharedIndex para que a cópia seja apenas
+o diretório do índice) e executam a função `_worker_rank_query` do módulo,
+como em index/shared.py. Em threads, a pontuação em Python puro é
+serializada pelo GIL.
+
+Consultas acima de `max_pending` em execução são rejeitadas imediatamente
+com "overloaded" e as que passam de `timeout` segundos recebem "timeout". A
+vaga de uma consulta só é liberada quando ela termina no executor (mesmo que
+o cliente já tenha recebido "timeout"), então consultas lentas não acumulam
+uma fila sem limite no pool. Os títulos ("titles") só são incluídos quando o servidor recebe
+um TitleStore (query/titles.py). Um índice reconstruído é trocado em funcionamento com `publish`:
+cada consulta usa a geração vigente quando começou.
+"""
+from typing import List, Mapping
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from time import perf_counter
+import asyncio
+import json
+
+from query.processing import QueryRunner
+from query.titles import TitleStore
+from util.metrics import MetricsRegistry
+from util.threads import GenerationPublisher
+
+
+def rank_query(query_runner: QueryRunner, query: str, k: int) -> dict:
+    lst_docs, dic_weights = query_runner.get_docs_term(query)
+    lst_docs = list(lst_docs)[:k]
+    scores = None if dic_weights is None else [dic_weights[doc_id] for doc_id in lst_docs]
+    return {"docs": lst_docs, "scores": scores}
+
+
+# QueryRunner dos processos do QueryServer (num_processes)
+_worker_query_runner = None
+
+
+def _init_query_worker(query_runner: QueryRunner):
+    global _worker_query_runner
+    _worker_query_runner = query_runner
+
+
+def _worker_rank_query(query: str, k: int) -> dict:
+    return rank_query(_worker_query_runner, query, k)
+
+
+class QueryServer:
+    def __init__(self, query_runner: QueryRunner, executor: Executor = None,
+                 max_pending: int = 64, timeout: float = 5.0, default_k: int = 10,
+                 title_store: TitleStore = None, num_processes: int = None):
+        if executor is not None and num_processes is not None:
+            raise ValueError("Informe executor ou num_processes, não ambos")
+        self.runner_publisher = GenerationPublisher(query_runner)
+        self.num_processes = num_processes
+        if num_processes is not None:
+            self.executor = self.create_process_pool(query_runner)
+        else:
+            self.executor = executor if executor is not None else ThreadPoolExecutor()
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.default_k = default_k
+        self.title_store = title_store
+
+        self.pending = 0
+        self.stats = MetricsRegistry(enabled=True, prefix="ri_server")
+        self.server = None
+
+    @property
+    def query_runner(self) -> QueryRunner:
+        return self.runner_publisher.value
+
+    def create_process_pool(self, query_runner: QueryRunner) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(self.num_processes, initializer=_init_query_worker, initargs=(query_runner,))
+
+    def publish(self, query_runner: QueryRunner) -> int:
+        """Troca atomicamente o índice/modelo servido; retorna o número da nova geração"""
+        if self.num_processes is not None:
+            # os processos têm a cópia do runner antigo: as consultas novas vão para um novo pool
+            # e as já submetidas terminam no anterior
+            old_executor = self.executor
+            self.executor = self.create_process_pool(query_runner)
+            old_executor.shutdown(wait=False)
+        return self.runner_publisher.publish(query_runner).number
+
+    def run_query(self, query: str, k: int) -> dict:
+        return rank_query(self.query_runner, query, k)
+
+    def submit_query(self, query: str, k: int) -> Future:
+        if self.num_processes is not None:
+            return self.executor.submit(_worker_rank_query, query, k)
+        return self.executor.submit(self.run_query, query, k)
+
+    def release_slot(self):
+        self.pending -= 1
+
+    async def answer_query(self, dic_request: dict) -> dict:
+        if self.pending >= self.max_pending:
+            self.stats.inc("rejected")
+            return {"ok": False, "error": "overloaded"}
+
+        query, k = str(dic_request["query"]), int(dic_request.get("k", self.default_k))
+        loop = asyncio.get_running_loop()
+        start = perf_counter()
+        self.pending += 1
+        try:
+            future = self.submit_query(query, k)
+        except BaseException:
+            self.pending -= 1
+            raise
+
+        def on_done(future):
+            # a vaga só é liberada quando a consulta sai do executor (não no timeout)
+            try:
+                loop.call_soon_threadsafe(self.release_slot)
+            except RuntimeError:
+                # loop já encerrado
+                pass
+        future.add_done_callback(on_done)
+
+        try:
+            response = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.stats.inc("timeouts")
+            return {"ok": False, "error": "timeout"}
+        self.stats.observe_time("latency", perf_counter() - start)
+        if self.title_store is not None:
+            dic_titles = self.title_store.get_titles(response["docs"])
+            response["titles"] = [dic_titles.get(doc_id) for doc_id in response["docs"]]
+        response["ok"] = True
+        return response
+
+    def get_stats(self) -> dict:
+        dic_stats = {name: snapshot.get("value", snapshot) for name, snapshot in self.stats.snapshot().items()}
+        dic_stats["pending"] = self.pending
+        dic_stats["max_pending"] = self.max_pending
+        generation = self.runner_publisher.current()
+        dic_stats["generation"] = generation.number
+        dic_stats["document_count"] = generation.value.index.document_count
+        return dic_stats
+
+    async def handle_request(self, dic_request: dict) -> dict:
+        self.stats.inc("requests")
+        op = dic_request.get("op", "query")
+        try:
+            if op == "query":
+                response = await self.answer_query(dic_request)
+            elif op == "stats":
+                response = {"ok": True, "stats": self.get_stats()}
+            elif op == "ping":
+                response = {"ok": True}
+            else:
+                response = {"ok": False, "error": f"operação desconhecida: {op}"}
+        except Exception as e:
+            self.stats.inc("errors")
+            response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        if "id" in dic_request:
+            response["id"] = dic_request["id"]
+        return response
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        lock_write = asyncio.Lock()
+        set_tasks = set()
+
+        async def respond(line: bytes):
+            try:
+                dic_request = json.loads(line)
+                if type(dic_request) != dict:
+                    raise ValueError("a requisição deve ser um objeto JSON")
+            except ValueError as e:
+                self.stats.inc("errors")
+                response = {"ok": False, "error": f"JSON inválido: {e}"}
+            else:
+                response = await self.handle_request(dic_request)
+            async with lock_write:
+                writer.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+                await writer.drain()
+
+        try:
+            # requisições de uma mesma conexão são respondidas assim que ficam
+            # prontas (casar pela chave "id")
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    task = asyncio.ensure_future(respond(line))
+                    set_tasks.add(task)
+                    task.add_done_callback(set_tasks.discard)
+            if set_tasks:
+                await asyncio.gather(*set_tasks, return_exceptions=True)
+        finally:
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0):
+        self.server = await asyncio.start_server(self.handle_client, host, port)
+        return self.server
+
+    async def start_unix(self, path: str):
+        self.server = await asyncio.start_unix_server(self.handle_client, path)
+        return self.server
+
+    @property
+    def address(self):
+        return self.server.sockets[0].getsockname()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        self.executor.shutdown(wait=False)
+
+
+class QueryClient:
+    """Cliente simples (asyncio) para o QueryServer"""
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.next_id = 0
+        self.dic_waiting = {}
+        self.reader_task = asyncio.ensure_future(self.read_responses())
+
+    @classmethod
+    async def connect(cls, host: str, port: int) -> "QueryClient":
+        return cls(*await asyncio.open_connection(host, port))
+
+    @classmethod
+    async def connect_unix(cls, path: str) -> "QueryClient":
+        return cls(*await asyncio.open_unix_connection(path))
+
+    async def read_responses(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            future = self.dic_waiting.pop(response.get("id"), None)
+            if future is not None and not future.done():
+                future.set_result(response)
+        for future in self.dic_waiting.values():
+            if not future.done():
+                future.set_exception(ConnectionError("conexão encerrada pelo servidor"))
+
+    async def request(self, dic_request: dict) -> dict:
+        self.next_id += 1
+        dic_request["id"] = self.next_id
+        future = asyncio.get_running_loop().create_future()
+        self.dic_waiting[self.next_id] = future
+        self.writer.write(json.dumps(dic_request, ensure_ascii=False).encode("utf-8") + b"\n")
+        await self.writer.drain()
+        return await future
+
+    async def query(self, query: str, k: int = 10) -> dict:
+        return await self.request({"op": "query", "query": query, "k": k})
+
+    async def query_many(self, queries: List[str], k: int = 10) -> Mapping[str, dict]:
+        lst_responses = await asyncio.gather(*[self.query(query, k) for query in queries])
+        return dict(zip(queries, lst_responses))
+
+    async def stats(self) -> dict:
+        return await self.request({"op": "stats"})
+
+    async def close(self):
+        self.writer.close()
+        self.reader_task.cancel()
+        try:
+            await self.reader_task
+        except asyncio.CancelledError:
+            pass
+
+
+def main():
+    import argparse
+    from index.structure import Index
+    from index.indexer import HTMLIndexer
+    from query.ranking_models import IndexPreComputedVals, VectorRankingModel
+
+    parser = argparse.ArgumentParser(description="Servidor de consultas sobre um índice salvo com Index.save")
+    parser.add_argument("index_file")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None, help="caminho de um socket Unix (em vez de TCP)")
+    parser.add_argument("--workers", type=int, default=None, help="threads que executam as consultas")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="processos que executam as consultas (em vez de threads)")
+    parser.add_argument("--max-pending", type=int, default=64)
+    parser.add_argument("--timeout", type=float, default=5.0)
+    parser.add_argument("--titles", default=None, help="arquivo gerado por query.titles.build_title_store")
+    args = parser.parse_args()
+
+    index = Index.load(args.index_file)
+    precomp = IndexPreComputedVals(index)
+    query_runner = QueryRunner(VectorRankingModel(precomp), index, HTMLIndexer.cleaner)
+    title_store = TitleStore(args.titles) if args.titles is not None else None
+    executor = ThreadPoolExecutor(args.workers) if args.processes is None else None
+    server = QueryServer(query_runner, executor, args.max_pending, args.timeout,
+                         title_store=title_store, num_processes=args.processes)
+
+    async def serve():
+        if args.unix is not None:
+            await server.start_unix(args.unix)
+        else:
+            await server.start(args.host, args.port)
+        print(f"Servindo {index.document_count} documentos em {args.unix or server.address}")
+        async with server.server:
+            await server.server.serve_forever()
+
+    asyncio.run(serve())
+
+
+if __name__ == '__main__':
+    main()
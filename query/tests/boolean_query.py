@@ -0,0 +1,126 @@
+from index.structure import FileIndex, HashIndex
+from index.indexer import Cleaner
+from query.processing import QueryRunner
+from query.ranking_models import BooleanRankingModel, OPERATOR
+from query.boolean_query import (QueryAnd, QueryEmpty, QueryNot, QueryOr, QuerySyntaxError, QueryTerm,
+                                 difference, execute_plan, intersection, parse_query, plan_query, union)
+from util.metrics import metrics
+import os
+import tempfile
+import unittest
+
+
+class BooleanQueryTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.index = FileIndex(os.path.join(self.tmp_dir.name, "occur_index_boolean"))
+        dic_docs = {1: "belo horizonte cidade",
+                    2: "belo horizonte praia",
+                    3: "cidade praia",
+                    4: "belo cidade",
+                    5: "horizonte"}
+        for doc_id, text in dic_docs.items():
+            for term in text.split(" "):
+                self.index.index(term, doc_id, 1)
+        self.index.finish_indexing()
+        cleaner = Cleaner(stop_words_file="stopwords.txt",language="portuguese",
+                        perform_stop_words_removal=True,perform_accents_removal=False,
+                        perform_stemming=False)
+        self.query_runner = QueryRunner(BooleanRankingModel(OPERATOR.AND), self.index, cleaner)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_parse(self):
+        self.assertEqual(parse_query("a"), QueryTerm("a"))
+        self.assertEqual(parse_query("a b OR c"), QueryOr([QueryAnd([QueryTerm("a"), QueryTerm("b")]), QueryTerm("c")]))
+        self.assertEqual(parse_query("a AND (b OR NOT c)"),
+                         QueryAnd([QueryTerm("a"), QueryOr([QueryTerm("b"), QueryNot(QueryTerm("c"))])]))
+        self.assertEqual(parse_query("NOT NOT a"), QueryNot(QueryNot(QueryTerm("a"))))
+        #operadores apenas em maiúsculas
+        self.assertEqual(parse_query("a and b"), QueryAnd([QueryTerm("a"), QueryTerm("and"), QueryTerm("b")]))
+        for query in ["", "(a OR b", "a OR", "a )", "AND a", "()", "NOT"]:
+            self.assertRaises(QuerySyntaxError, parse_query, query)
+
+    def test_plan(self):
+        dic_df = {"a": 10, "b": 2, "c": 5}
+        df = lambda term: dic_df.get(term, 0)
+
+        plan = plan_query(parse_query("a AND NOT c AND b"), df, 20)
+        self.assertEqual(plan, QueryAnd([QueryTerm("b"), QueryTerm("a"), QueryNot(QueryTerm("c"))]))
+        self.assertEqual(plan.cost, 2)
+
+        #termo ausente: o AND inteiro é vazio e o OR o ignora
+        self.assertEqual(plan_query(parse_query("a AND (b AND xpto)"), df, 20), QueryEmpty())
+        self.assertEqual(plan_query(parse_query("a OR xpto OR (c b)"), df, 20),
+                         QueryOr([QueryAnd([QueryTerm("b"), QueryTerm("c")]), QueryTerm("a")]))
+        self.assertEqual(plan_query(parse_query("a NOT xpto"), df, 20), QueryTerm("a"))
+        self.assertEqual(plan_query(parse_query("NOT NOT (a (b c))"), df, 20),
+                         QueryAnd([QueryTerm("b"), QueryTerm("c"), QueryTerm("a")]))
+
+        #termos descartados pelo preprocessamento
+        preprocess = lambda term: None if term == "de" else term
+        self.assertEqual(plan_query(parse_query("a de b"), df, 20, preprocess), QueryAnd([QueryTerm("b"), QueryTerm("a")]))
+        self.assertIsNone(plan_query(parse_query("de OR NOT de"), df, 20, preprocess))
+
+    def test_list_operations(self):
+        self.assertListEqual(intersection([1, 3, 5, 7, 9], [3, 4, 9, 10]), [3, 9])
+        self.assertListEqual(intersection([], [1, 2]), [])
+        self.assertListEqual(list(difference([1, 3, 5, 7, 9], [2, 3, 9, 11])), [1, 5, 7])
+        self.assertListEqual(list(union([[1, 4], [2, 4, 6], []])), [1, 2, 4, 6])
+
+    def test_get_docs_boolean(self):
+        dic_expected = {"belo": [1, 2, 4],
+                        "belo horizonte": [1, 2],
+                        "belo AND NOT praia": [1, 4],
+                        "(belo OR praia) AND NOT (horizonte AND cidade)": [2, 3, 4],
+                        "cidade OR horizonte NOT belo": [1, 3, 4, 5],
+                        "NOT belo": [3, 5],
+                        "NOT (belo OR horizonte OR cidade)": [],
+                        "belo AND crocodilo": [],
+                        "belo OR crocodilo": [1, 2, 4],
+                        "Belo ser Horizonte": [1, 2]}
+        for query, lst_expected in dic_expected.items():
+            lst_docs, dic_weights = self.query_runner.get_docs_boolean(query)
+            self.assertListEqual(lst_docs, lst_expected, msg=f"Consulta: {query}")
+            self.assertIsNone(dic_weights)
+
+        self.index.delete_document(1)
+        self.assertListEqual(self.query_runner.get_docs_boolean("belo horizonte")[0], [2])
+        self.assertListEqual(self.query_runner.get_docs_boolean("NOT praia")[0], [4, 5])
+
+    def test_get_docs_boolean_bitmap(self):
+        lst_queries = ["belo horizonte", "(belo OR praia) AND NOT (horizonte AND cidade)",
+                       "NOT belo", "belo AND crocodilo", "cidade OR horizonte NOT belo"]
+        dic_expected = {query: self.query_runner.get_docs_boolean(query)[0] for query in lst_queries}
+        self.index.enable_bitmap_cache(min_doc_count=2)
+        self.index.finish_indexing()
+        self.assertIsNotNone(self.index.bitmap_cache)
+        for query in lst_queries:
+            self.assertListEqual(self.query_runner.get_docs_boolean(query)[0], dic_expected[query], msg=f"Consulta: {query}")
+
+    def test_short_circuit(self):
+        lst_fetched = []
+        def get_doc_ids(term):
+            lst_fetched.append(term)
+            return {"a": [1, 2], "b": [3], "c": [1, 2, 3]}[term]
+        plan = QueryAnd([QueryTerm("a"), QueryTerm("b"), QueryTerm("c")])
+        metrics.enable()
+        try:
+            self.assertListEqual(execute_plan(plan, get_doc_ids, lambda: [1, 2, 3]), [])
+        finally:
+            metrics.disable()
+        self.assertListEqual(lst_fetched, ["a", "b"])
+
+    def test_hash_index(self):
+        index = HashIndex()
+        index.index("casa", 2, 1)
+        index.index("verde", 2, 1)
+        index.index("casa", 1, 1)
+        index.finish_indexing()
+        query_runner = QueryRunner(BooleanRankingModel(OPERATOR.AND), index, self.query_runner.cleaner)
+        self.assertListEqual(query_runner.get_docs_boolean("casa NOT verde")[0], [1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+from query.doc_term_matrix import CSRMatrix, DocTermMatrix, scipy_available
+from query.ranking_models import IndexPreComputedVals, VectorRankingModel
+from query.processing import QueryRunner
+from index.structure import FileIndex, TermOccurrence
+from index.indexer import Cleaner
+from random import randrange, seed
+import os
+import tempfile
+import unittest
+
+
+class DocTermMatrixTest(unittest.TestCase):
+    def setUp(self):
+        seed(23)
+        self.vocabulary = ["casa", "verde", "azul", "predio", "rua", "janela", "porta", "xicara"]
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.index = FileIndex(os.path.join(self.tmp_dir.name, "occur_index_doc_term_matrix"))
+        for doc_id in range(1, 81):
+            for term in set(self.vocabulary[randrange(len(self.vocabulary))] for i in range(4)):
+                self.index.index(term, doc_id, randrange(1, 10))
+        # termo presente em todos os documentos (idf 0)
+        for doc_id in range(1, 81):
+            self.index.index("todos", doc_id, 1)
+        self.index.finish_indexing()
+        self.index.delete_document(7)
+        self.precomp = IndexPreComputedVals(self.index)
+        self.doc_term_matrix = DocTermMatrix.build(self.index, self.precomp)
+        self.cleaner = Cleaner(stop_words_file="stopwords.txt", language="portuguese",
+                               perform_stop_words_removal=False, perform_accents_removal=False,
+                               perform_stemming=False)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_csr(self):
+        matrix = CSRMatrix.from_rows([{2: 1.0, 0: 3.0}, {}, {1: 2.0}], 3)
+        self.assertListEqual(list(matrix.indptr), [0, 2, 2, 3])
+        self.assertListEqual(list(matrix.indices), [0, 2, 1])
+        transposed = matrix.transpose()
+        self.assertEqual(transposed.shape, (3, 3))
+        self.assertListEqual(list(transposed.indptr), [0, 1, 2, 3])
+        self.assertListEqual(list(transposed.indices), [0, 2, 0])
+        self.assertListEqual(list(transposed.data), [3.0, 2.0, 1.0])
+
+    def test_build(self):
+        matrix = self.doc_term_matrix.matrix
+        self.assertEqual(matrix.shape, (79, 9))
+        self.assertNotIn(7, self.doc_term_matrix.lst_doc_ids)
+        # linhas com norma 1 (pesos já divididos pela norma do documento)
+        for i in range(matrix.shape[0]):
+            cols, weights = matrix.row(i)
+            self.assertAlmostEqual(sum(weight ** 2 for weight in weights), 1.0)
+            self.assertListEqual(list(cols), sorted(cols))
+        self.assertNotIn(self.doc_term_matrix.dic_term_column["todos"], matrix.indices)
+
+    def test_rank_batch(self):
+        model = VectorRankingModel(self.precomp)
+        lst_queries = [{"casa": 1}, {"verde": 2, "azul": 1}, {"rua": 1, "crocodilo": 1}, {"crocodilo": 1}]
+        lst_results = self.doc_term_matrix.rank_batch(lst_queries, k=None, use_scipy=False)
+        for dic_query, (lst_docs, dic_weights) in zip(lst_queries, lst_results):
+            dic_query_occur = {term: TermOccurrence(None, self.index.get_term_id(term), term_freq)
+                               for term, term_freq in dic_query.items() if term in self.index.vocabulary}
+            dic_occur = {term: self.index.get_occurrence_list(term) for term in dic_query_occur}
+            expected_docs, dic_expected = model.get_ordered_docs(dic_query_occur, dic_occur)
+            dic_expected = {doc_id: weight for doc_id, weight in dic_expected.items() if weight > 0}
+            self.assertSetEqual(set(dic_weights), set(dic_expected))
+            for doc_id, weight in dic_expected.items():
+                self.assertAlmostEqual(dic_weights[doc_id], weight)
+            self.assertListEqual([dic_weights[doc_id] for doc_id in lst_docs],
+                                 sorted(dic_weights.values(), reverse=True))
+
+        lst_top = self.doc_term_matrix.rank_batch(lst_queries, k=3, use_scipy=False)
+        for (lst_docs, dic_weights), (lst_top_docs, dic_top_weights) in zip(lst_results, lst_top):
+            self.assertListEqual(lst_top_docs, lst_docs[:3])
+
+    @unittest.skipUnless(scipy_available(), "scipy não instalado")
+    def test_rank_batch_scipy(self):
+        lst_queries = [{"casa": 1}, {"verde": 2, "azul": 1}]
+        lst_python = self.doc_term_matrix.rank_batch(lst_queries, k=5, use_scipy=False)
+        lst_scipy = self.doc_term_matrix.rank_batch(lst_queries, k=5, use_scipy=True)
+        for (lst_docs, dic_weights), (lst_scipy_docs, dic_scipy_weights) in zip(lst_python, lst_scipy):
+            self.assertListEqual(lst_docs, lst_scipy_docs)
+
+    def test_query_runner(self):
+        query_runner = QueryRunner(VectorRankingModel(self.precomp), self.index, self.cleaner)
+        dic_responses = query_runner.get_docs_term_matrix_batch(["casa verde", "porta"], self.doc_term_matrix, k=5)
+        self.assertEqual(len(dic_responses["casa verde"][0]), 5)
+        lst_docs, dic_weights = query_runner.get_docs_term("porta")
+        self.assertListEqual([dic_weights[doc_id] for doc_id in dic_responses["porta"][0]],
+                             sorted(dic_weights.values(), reverse=True)[:5])
+
+    def test_save_load(self):
+        with tempfile.TemporaryDirectory() as str_dir:
+            str_file = os.path.join(str_dir, "matrix.pickle")
+            self.doc_term_matrix.save(str_file)
+            loaded = DocTermMatrix.load(str_file)
+        self.assertIsNone(loaded.term_matrix)
+        self.assertListEqual(loaded.rank_batch([{"casa": 1}], use_scipy=False),
+                             self.doc_term_matrix.rank_batch([{"casa": 1}], use_scipy=False))
+
+
+if __name__ == "__main__":
+    unittest.main()
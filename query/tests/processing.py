@@ -1,8 +1,21 @@
 from index.structure import FileIndex,TermOccurrence
 from query.processing import QueryRunner, VectorRankingModel, IndexPreComputedVals
 from index.indexer import Cleaner
+from index.positions import PositionStore
 from typing import Mapping
+import math
+import os
+import tempfile
 import unittest
+
+
+class RecordingRankingModel(VectorRankingModel):
+    """Guarda os documentos pontuados na última chamada de get_ordered_docs"""
+    def get_ordered_docs(self, query, docs_occur_per_term):
+        self.set_scored_docs = {occur.doc_id for occur_list in docs_occur_per_term.values() for occur in occur_list}
+        return super().get_ordered_docs(query, docs_occur_per_term)
+
+
 class ProcessingTest(unittest.TestCase):
     def setUp(self):
         self.index = FileIndex()
@@ -38,6 +51,64 @@ class ProcessingTest(unittest.TestCase):
             for i,resp_esperada in enumerate(arr_resp_esperada):
                 resposta = self.queryRunner.count_topn_relevant(n, arr_lists[i], set_relevantes)
                 self.assertEqual(resp_esperada, resposta, msg=f"# de relevantes esperadas top {n}: {resp_esperada} resposta obtida: {resposta}")
+    def test_get_docs_phrase(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index = FileIndex(os.path.join(tmp_dir, "occur_index_phrase"))
+            position_store = PositionStore(os.path.join(tmp_dir, "positions.pos"))
+            lst_docs = {1: "belo horizonte é uma cidade",
+                        2: "o horizonte belo",
+                        3: "belo e grande horizonte",
+                        4: "cidade de belo horizonte"}
+            for doc_id, text in lst_docs.items():
+                dic_positions = {}
+                for position, term in enumerate(text.split(" ")):
+                    dic_positions.setdefault(term, []).append(position)
+                position_store.add_document(doc_id, dic_positions)
+                for term, lst_positions in dic_positions.items():
+                    index.index(term, doc_id, len(lst_positions))
+            index.finish_indexing()
+            cleaner = Cleaner(stop_words_file="stopwords.txt",language="portuguese",
+                            perform_stop_words_removal=False,perform_accents_removal=False,
+                            perform_stemming=False)
+            query_runner = QueryRunner(VectorRankingModel(IndexPreComputedVals(index)), index, cleaner, position_store)
+
+            lst_docs, dic_weights = query_runner.get_docs_phrase("Belo Horizonte")
+            self.assertListEqual(sorted(lst_docs), [1, 4])
+            lst_docs, dic_weights = query_runner.get_docs_phrase("Belo Horizonte", max_distance=2)
+            self.assertListEqual(sorted(lst_docs), [1, 3, 4])
+            lst_docs, dic_weights = query_runner.get_docs_phrase("Belo crocodilo")
+            self.assertListEqual(list(lst_docs), [])
+
+            #só os documentos da frase são pontuados, com os mesmos pesos (idf das listas completas)
+            ranking_model = RecordingRankingModel(IndexPreComputedVals(index))
+            query_runner.ranking_model = ranking_model
+            lst_docs, dic_weights = query_runner.get_docs_phrase("Belo Horizonte")
+            self.assertSetEqual(ranking_model.set_scored_docs, {1, 4})
+            lst_all_docs, dic_all_weights = query_runner.get_docs_term("Belo Horizonte")
+            self.assertListEqual(lst_docs, [doc_id for doc_id in lst_all_docs if doc_id in (1, 4)])
+            for doc_id in lst_docs:
+                self.assertAlmostEqual(dic_weights[doc_id], dic_all_weights[doc_id])
+            position_store.close()
+            self.assertRaises(ValueError, self.queryRunner.get_docs_phrase, "Belo Horizonte")
+
+    def test_get_docs_term_expanded(self):
+        self.assertRaises(ValueError, self.queryRunner.expand_query_terms, "vocês")
+        self.index.enable_kgram_index(k=2)
+        self.index.finish_indexing()
+        self.assertListEqual(self.queryRunner.expand_query_terms("voces esper* crocodilo"), ["vocês", "espero"])
+        lst_docs, dic_weights = self.queryRunner.get_docs_term_expanded("voces estejan")
+        self.assertListEqual(lst_docs, [3,2])
+        self.assertListEqual(self.queryRunner.get_docs_term_expanded("diver*")[0], [1])
+
+    def test_ndcg_and_relevant_docs(self):
+        self.assertAlmostEqual(self.queryRunner.compute_ndcg(3, [1,2,3], {1,2,3}), 1)
+        self.assertAlmostEqual(self.queryRunner.compute_ndcg(3, [4,1,5], {1}), 1/math.log2(3))
+        self.assertEqual(self.queryRunner.compute_ndcg(3, [4,5], {1}), 0)
+
+        dic_relevant = QueryRunner.load_relevant_docs()
+        self.assertSetEqual(set(dic_relevant), {"Belo Horizonte", "Irlanda", "São Paulo"})
+        self.assertIn(484, dic_relevant["Belo Horizonte"])
+
     def test_precision_recall(self):
         lst_docs = [1,2,3,4,5,6,7,9,11]
         relevant_docs = {1,3,5,7}
@@ -141,5 +212,12 @@ class ProcessingTest(unittest.TestCase):
             print()
             self.assertListEqual(resposta, arr_expected_response[i],f"A resposta a consulta '{query}' deveria ser {arr_expected_response[i]} e não {resposta}")
 
+    def test_get_docs_term_batch(self):
+        arr_queries = ["crocodilo","vocês","Vocês estejam"]
+        dic_responses = self.queryRunner.get_docs_term_batch(arr_queries)
+        self.assertListEqual(list(dic_responses.keys()), arr_queries)
+        for query in arr_queries:
+            self.assertListEqual(dic_responses[query][0], self.queryRunner.get_docs_term(query)[0])
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
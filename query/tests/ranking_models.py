@@ -1,5 +1,6 @@
 from query.ranking_models import IndexPreComputedVals,VectorRankingModel,BooleanRankingModel,  OPERATOR
 from index.structure import HashIndex,FileIndex,TermOccurrence
+from index.bitmap import RoaringBitmap
 import unittest
 
 class RankingModelTest(unittest.TestCase):
@@ -89,6 +90,30 @@ class RankingModelTest(unittest.TestCase):
                 
 
 
+    def test_deleted_docs(self):
+        map_index = self.arr_indexes[0]
+        map_query = self.arr_queries_per_idx[0][0]
+        map_index_for_query = self.obtem_index_for_query(map_query,map_index)
+        deleted_docs = RoaringBitmap([4])
+
+        lst_response,_ = BooleanRankingModel(OPERATOR.AND, deleted_docs).get_ordered_docs(map_query, map_index_for_query)
+        self.assertSetEqual(set(lst_response), {2})
+        lst_response,_ = BooleanRankingModel(OPERATOR.OR, deleted_docs).get_ordered_docs(map_query, map_index_for_query)
+        self.assertSetEqual(set(lst_response), {1,2})
+
+        index = HashIndex()
+        for term, lst_occur in map_index.items():
+            for occur in lst_occur:
+                index.index(term, occur.doc_id, occur.term_freq)
+        index.delete_document(4)
+        precomp = IndexPreComputedVals(index)
+        self.assertEqual(precomp.doc_count, 3)
+        self.assertNotIn(4, precomp.document_norm)
+        #ocorrencias recebidas de fora do indice (ex.: cache) também são filtradas
+        lst_response, doc_weights = VectorRankingModel(precomp).get_ordered_docs(map_query, map_index_for_query)
+        self.assertNotIn(4, lst_response)
+        self.assertListEqual(lst_response, [2,1])
+
     def test_vector_model(self):
         index = FileIndex()
         precomp = IndexPreComputedVals(index)
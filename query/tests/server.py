@@ -0,0 +1,191 @@
+from index.structure import FileIndex, Index
+from query.processing import QueryRunner
+from query.ranking_models import VectorRankingModel, IndexPreComputedVals, RankingModel
+from query.server import QueryServer, QueryClient
+from query.titles import TitleStore, build_title_store
+from index.indexer import Cleaner
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+
+
+class SlowRankingModel(RankingModel):
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+    def get_ordered_docs(self, query, docs_occur_per_term):
+        time.sleep(self.seconds)
+        return [], {}
+
+
+class QueryServerTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        index = FileIndex(os.path.join(self.tmp_dir.name, "occur_index"))
+        index.index("adoro",1,1)
+        index.index("vocês",2,3)
+        index.index("espero",2,1)
+        index.index("que",3,1)
+        index.index("vocês",3,1)
+        index.index("estejam",3,1)
+        index.index("se",3,1)
+        index.index("divertindo",1,4)
+        index.finish_indexing()
+
+        #o servidor trabalha sobre o indice persistido
+        str_index_file = os.path.join(self.tmp_dir.name, "index.pickle")
+        index.save(str_index_file)
+        self.index = Index.load(str_index_file)
+        self.cleaner = Cleaner(stop_words_file="stopwords.txt",language="portuguese",
+                        perform_stop_words_removal=False,perform_accents_removal=False,
+                        perform_stemming=False)
+        self.query_runner = QueryRunner(VectorRankingModel(IndexPreComputedVals(self.index)), self.index, self.cleaner)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    async def start(self, server: QueryServer) -> QueryClient:
+        await server.start()
+        host, port = server.address[:2]
+        return await QueryClient.connect(host, port)
+
+    async def test_query_and_stats(self):
+        server = QueryServer(self.query_runner)
+        client = await self.start(server)
+        try:
+            response = await client.query("Vocês estejam")
+            self.assertTrue(response["ok"])
+            self.assertListEqual(response["docs"], [3,2])
+            self.assertEqual(len(response["scores"]), 2)
+
+            response = await client.query("Vocês estejam", k=1)
+            self.assertListEqual(response["docs"], [3])
+
+            dic_responses = await client.query_many(["crocodilo","vocês","Vocês estejam"])
+            self.assertListEqual(dic_responses["crocodilo"]["docs"], [])
+            self.assertListEqual(dic_responses["vocês"]["docs"], [2,3])
+
+            stats = (await client.stats())["stats"]
+            self.assertEqual(stats["requests"], 6)
+            self.assertEqual(stats["latency"]["count"], 5)
+            self.assertEqual(stats["document_count"], 3)
+            self.assertEqual(stats["pending"], 0)
+        finally:
+            await client.close()
+            await server.close()
+
+    async def test_invalid_requests(self):
+        server = QueryServer(self.query_runner)
+        client = await self.start(server)
+        try:
+            response = await client.request({"op": "xpto"})
+            self.assertFalse(response["ok"])
+            response = await client.request({"op": "query"})
+            self.assertFalse(response["ok"])
+            self.assertIn("KeyError", response["error"])
+        finally:
+            await client.close()
+            await server.close()
+
+    async def test_timeout_and_admission_control(self):
+        query_runner = QueryRunner(SlowRankingModel(0.3), self.index, self.cleaner)
+        server = QueryServer(query_runner, ThreadPoolExecutor(4), max_pending=2, timeout=0.1)
+        client = await self.start(server)
+        try:
+            dic_responses = await asyncio.gather(*[client.query("vocês") for i in range(3)])
+            lst_errors = sorted(response["error"] for response in dic_responses)
+            self.assertListEqual(lst_errors, ["overloaded", "timeout", "timeout"])
+
+            stats = (await client.stats())["stats"]
+            self.assertEqual(stats["rejected"], 1)
+            self.assertEqual(stats["timeouts"], 2)
+
+            # as consultas que expiraram continuam ocupando as vagas até terminarem no executor
+            self.assertEqual(stats["pending"], 2)
+            response = await client.query("vocês")
+            self.assertEqual(response["error"], "overloaded")
+            await asyncio.sleep(0.4)
+            stats = (await client.stats())["stats"]
+            self.assertEqual(stats["pending"], 0)
+        finally:
+            await client.close()
+            await server.close()
+
+    async def test_publish_new_generation(self):
+        server = QueryServer(self.query_runner)
+        client = await self.start(server)
+        try:
+            new_index = FileIndex(os.path.join(self.tmp_dir.name, "occur_index_rebuild"))
+            new_index.index("crocodilo",7,2)
+            new_index.index("vocês",8,1)
+            new_index.finish_indexing()
+            new_runner = QueryRunner(VectorRankingModel(IndexPreComputedVals(new_index)), new_index, self.cleaner)
+            self.assertEqual(server.publish(new_runner), 1)
+
+            response = await client.query("crocodilo")
+            self.assertListEqual(response["docs"], [7])
+            stats = (await client.stats())["stats"]
+            self.assertEqual(stats["generation"], 1)
+            self.assertEqual(stats["document_count"], 2)
+        finally:
+            await client.close()
+            await server.close()
+
+    async def test_titles(self):
+        str_dat_file = os.path.join(self.tmp_dir.name, "titles.dat")
+        with open(str_dat_file, "w", encoding="utf-8") as file:
+            file.write("2;Vocês\n3;Que vocês estejam\n")
+        str_store_file = os.path.join(self.tmp_dir.name, "titles.bin")
+        build_title_store(str_dat_file, str_store_file)
+        title_store = TitleStore(str_store_file)
+
+        server = QueryServer(self.query_runner, title_store=title_store)
+        client = await self.start(server)
+        try:
+            response = await client.query("Vocês estejam adoro")
+            self.assertListEqual(response["docs"], [3,1,2])
+            self.assertListEqual(response["titles"], ["Que vocês estejam", None, "Vocês"])
+        finally:
+            await client.close()
+            await server.close()
+            title_store.close()
+
+    async def test_processes(self):
+        server = QueryServer(self.query_runner, num_processes=2)
+        client = await self.start(server)
+        try:
+            dic_responses = await client.query_many(["vocês", "Vocês estejam"])
+            self.assertListEqual(dic_responses["vocês"]["docs"], [2,3])
+            self.assertListEqual(dic_responses["Vocês estejam"]["docs"], [3,2])
+
+            new_index = FileIndex(os.path.join(self.tmp_dir.name, "occur_index_rebuild_processes"))
+            new_index.index("crocodilo",7,2)
+            new_index.index("vocês",8,1)
+            new_index.finish_indexing()
+            server.publish(QueryRunner(VectorRankingModel(IndexPreComputedVals(new_index)), new_index, self.cleaner))
+            response = await client.query("crocodilo")
+            self.assertListEqual(response["docs"], [7])
+        finally:
+            await client.close()
+            await server.close()
+        with self.assertRaises(ValueError):
+            QueryServer(self.query_runner, ThreadPoolExecutor(1), num_processes=1)
+
+    @unittest.skipUnless(hasattr(asyncio, "start_unix_server"), "sockets Unix indisponíveis")
+    async def test_unix_socket(self):
+        server = QueryServer(self.query_runner)
+        str_socket = os.path.join(self.tmp_dir.name, "query.sock")
+        await server.start_unix(str_socket)
+        client = await QueryClient.connect_unix(str_socket)
+        try:
+            response = await client.query("vocês")
+            self.assertListEqual(response["docs"], [2,3])
+        finally:
+            await client.close()
+            await server.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+from query.titles import TitleStore, build_title_store
+from concurrent.futures import ProcessPoolExecutor
+import os
+import pickle
+import tempfile
+import unittest
+
+
+def get_titles(title_store: TitleStore, lst_doc_ids):
+    return title_store.get_titles(lst_doc_ids)
+
+
+class TitleStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.str_dat_file = os.path.join(self.tmp_dir.name, "titles.dat")
+        self.str_store_file = os.path.join(self.tmp_dir.name, "titles.bin")
+        with open(self.str_dat_file, "w", encoding="utf-8") as file:
+            file.write("220;Astronomia\n223;América Latina\n5;Afonso; Príncipe\n1000000;Último\n\n")
+        self.assertEqual(build_title_store(self.str_dat_file, self.str_store_file), 4)
+        self.title_store = TitleStore(self.str_store_file)
+
+    def tearDown(self):
+        self.title_store.close()
+        self.tmp_dir.cleanup()
+
+    def test_lookup(self):
+        self.assertEqual(len(self.title_store), 4)
+        self.assertEqual(self.title_store[223], "América Latina")
+        self.assertEqual(self.title_store[5], "Afonso; Príncipe")
+        self.assertEqual(self.title_store.get(1000000), "Último")
+        self.assertIsNone(self.title_store.get(221))
+        self.assertRaises(KeyError, lambda: self.title_store[1])
+        self.assertNotIn(2000000, self.title_store)
+
+        dic_titles = self.title_store.get_titles([1000000, 220, 221, 5, 220])
+        self.assertDictEqual(dic_titles, {5: "Afonso; Príncipe", 220: "Astronomia", 1000000: "Último"})
+
+    def test_shared_between_processes(self):
+        #apenas o caminho do arquivo é serializado
+        self.assertLess(len(pickle.dumps(self.title_store)), 200)
+        with ProcessPoolExecutor(2) as executor:
+            dic_titles = executor.submit(get_titles, self.title_store, [223, 220]).result()
+        self.assertDictEqual(dic_titles, {220: "Astronomia", 223: "América Latina"})
+
+    def test_collection_titles(self):
+        str_store_file = os.path.join(self.tmp_dir.name, "collection.bin")
+        self.assertEqual(build_title_store("titlePerDoc.dat", str_store_file), 62128)
+        with TitleStore(str_store_file) as title_store:
+            self.assertEqual(title_store[231], "Albert Einstein")
+            self.assertLess(os.path.getsize(str_store_file), 2 * os.path.getsize("titlePerDoc.dat"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+"""
+Armazenamento compacto dos títulos dos documentos (titlePerDoc.dat).
+
+`build_title_store` converte o arquivo texto (linhas `doc_id;titulo`) em um
+único arquivo binário:
+
+    cabeçalho:  MAGIC (8 bytes) + quantidade de documentos n (uint64)
+    doc_ids:    n uint32, ordenados
+    offsets:    n+1 uint32, início de cada título na região de textos
+    textos:     títulos em UTF-8, concatenados
+
+(inteiros little-endian). O `TitleStore` abre o arquivo com mmap e acessa
+os vetores por memoryview, sem copiá-los: processos que abrem o mesmo
+arquivo compartilham as páginas do cache do sistema operacional. Ao ser
+serializado (pickle) ele guarda só o caminho do arquivo e o reabre no
+outro processo.
+"""
+from typing import Dict, Iterable, Optional
+from array import array
+import bisect
+import mmap
+import struct
+import sys
+
+MAGIC = b"RITITLE1"
+HEADER = struct.Struct("<8sQ")
+
+
+def build_title_store(str_dat_file: str, str_store_file: str, encoding: str = "utf-8") -> int:
+    """Gera o arquivo do TitleStore a partir do arquivo `doc_id;titulo`; retorna a quantidade de títulos"""
+    dic_titles = {}
+    with open(str_dat_file, "r", encoding=encoding) as file:
+        for line in file:
+            line = line.rstrip("\n")
+            if not line:
+                continue
+            str_doc_id, _, title = line.partition(";")
+            dic_titles[int(str_doc_id)] = title
+
+    arr_doc_ids = array("I", sorted(dic_titles))
+    arr_offsets = array("I", [0])
+    arr_texts = bytearray()
+    for doc_id in arr_doc_ids:
+        arr_texts += dic_titles[doc_id].encode("utf-8")
+        arr_offsets.append(len(arr_texts))
+    if sys.byteorder != "little":
+        arr_doc_ids.byteswap()
+        arr_offsets.byteswap()
+
+    with open(str_store_file, "wb") as file:
+        file.write(HEADER.pack(MAGIC, len(arr_doc_ids)))
+        arr_doc_ids.tofile(file)
+        arr_offsets.tofile(file)
+        file.write(arr_texts)
+    return len(arr_doc_ids)
+
+
+class TitleStore:
+    def __init__(self, str_store_file: str):
+        if sys.byteorder != "little":
+            raise NotImplementedError("TitleStore só é suportado em plataformas little-endian")
+        self.str_store_file = str_store_file
+        self.open()
+
+    def open(self):
+        with open(self.str_store_file, "rb") as file:
+            self.mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = HEADER.unpack_from(self.mm)
+        if magic != MAGIC:
+            raise ValueError(f"{self.str_store_file} não é um arquivo de títulos")
+        self.count = count
+
+        buffer = memoryview(self.mm)
+        start_offsets = HEADER.size + 4 * count
+        self.start_texts = start_offsets + 4 * (count + 1)
+        self.doc_ids = buffer[HEADER.size:start_offsets].cast("I")
+        self.offsets = buffer[start_offsets:self.start_texts].cast("I")
+
+    def close(self):
+        # as memoryviews precisam ser liberadas antes do mmap
+        self.doc_ids.release()
+        self.offsets.release()
+        self.mm.close()
+
+    def __enter__(self) -> "TitleStore":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def position(self, doc_id: int, lo: int = 0) -> int:
+        """Posição de doc_id no vetor (ou -1), buscando a partir de `lo`"""
+        pos = bisect.bisect_left(self.doc_ids, doc_id, lo)
+        if pos < self.count and self.doc_ids[pos] == doc_id:
+            return pos
+        return -1
+
+    def title_at(self, pos: int) -> str:
+        return self.mm[self.start_texts + self.offsets[pos]:self.start_texts + self.offsets[pos + 1]].decode("utf-8")
+
+    def get(self, doc_id: int, default: Optional[str] = None) -> Optional[str]:
+        pos = self.position(doc_id)
+        return self.title_at(pos) if pos >= 0 else default
+
+    def __getitem__(self, doc_id: int) -> str:
+        pos = self.position(doc_id)
+        if pos < 0:
+            raise KeyError(doc_id)
+        return self.title_at(pos)
+
+    def __contains__(self, doc_id: int) -> bool:
+        return self.position(doc_id) >= 0
+
+    def get_titles(self, doc_ids: Iterable[int]) -> Dict[int, str]:
+        """
+        Títulos de vários documentos (ex.: o top-k de uma consulta): os ids são
+        ordenados e cada busca binária começa onde a anterior terminou.
+        Documentos sem título ficam de fora do dicionário.
+        """
+        dic_titles = {}
+        lo = 0
+        for doc_id in sorted(set(doc_ids)):
+            lo = bisect.bisect_left(self.doc_ids, doc_id, lo)
+            if lo == self.count:
+                break
+            if self.doc_ids[lo] == doc_id:
+                dic_titles[doc_id] = self.title_at(lo)
+        return dic_titles
+
+    def __getstate__(self):
+        return {"str_store_file": self.str_store_file}
+
+    def __setstate__(self, dic_state):
+        self.str_store_file = dic_state["str_store_file"]
+        self.open()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Gera o arquivo de títulos (TitleStore) a partir de titlePerDoc.dat")
+    parser.add_argument("input", nargs="?", default="titlePerDoc.dat")
+    parser.add_argument("output", nargs="?", default="titlePerDoc.titles")
+    args = parser.parse_args()
+    print(f"{build_title_store(args.input, args.output)} títulos gravados em {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Codificação de inteiros não negativos em bytes (varint: 7 bits por byte, o
+bit mais alto indica que há mais bytes), usada nos formatos binários dos
+índices. Listas crescentes (doc_ids, posições) são gravadas como diferenças
+(gaps) entre valores consecutivos, que costumam caber em um único byte.
+"""
+from typing import BinaryIO, Iterable, List, Optional
+
+
+def encode_varint(number: int) -> bytes:
+    if number < 0:
+        raise ValueError(f"Apenas inteiros não negativos podem ser codificados: {number}")
+    arr_bytes = bytearray()
+    while number >= 0x80:
+        arr_bytes.append((number & 0x7F) | 0x80)
+        number >>= 7
+    arr_bytes.append(number)
+    return bytes(arr_bytes)
+
+
+def decode_varint(buffer: bytes, pos: int = 0) -> (int, int):
+    """Decodifica o varint que começa em buffer[pos]; retorna (valor, posição seguinte)"""
+    number = 0
+    shift = 0
+    while True:
+        byte = buffer[pos]
+        pos += 1
+        number |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return number, pos
+        shift += 7
+
+
+def write_varint(file: BinaryIO, number: int):
+    file.write(encode_varint(number))
+
+
+def read_varint(file: BinaryIO) -> Optional[int]:
+    """Lê um varint do arquivo; retorna None no fim do arquivo"""
+    number = 0
+    shift = 0
+    while True:
+        byte = file.read(1)
+        if not byte:
+            if shift > 0:
+                raise EOFError("Varint incompleto no fim do arquivo")
+            return None
+        number |= (byte[0] & 0x7F) << shift
+        if byte[0] < 0x80:
+            return number
+        shift += 7
+
+
+def encode_gaps(lst_numbers: Iterable[int]) -> bytes:
+    """Codifica uma sequência crescente como varints das diferenças"""
+    arr_bytes = bytearray()
+    last = 0
+    for number in lst_numbers:
+        arr_bytes += encode_varint(number - last)
+        last = number
+    return bytes(arr_bytes)
+
+
+def decode_gaps(buffer: bytes, count: int, pos: int = 0) -> (List[int], int):
+    lst_numbers = []
+    last = 0
+    for i in range(count):
+        gap, pos = decode_varint(buffer, pos)
+        last += gap
+        lst_numbers.append(last)
+    return lst_numbers, pos
@@ -0,0 +1,30 @@
+from util.encoding import encode_varint, decode_varint, write_varint, read_varint, encode_gaps, decode_gaps
+import io
+import unittest
+
+
+class EncodingTest(unittest.TestCase):
+    def test_varint(self):
+        for number in [0, 1, 127, 128, 300, 2**32, 2**70]:
+            arr_bytes = encode_varint(number)
+            self.assertEqual(decode_varint(arr_bytes), (number, len(arr_bytes)))
+        self.assertEqual(len(encode_varint(127)), 1)
+        self.assertEqual(len(encode_varint(128)), 2)
+        self.assertRaises(ValueError, encode_varint, -1)
+
+    def test_file(self):
+        file = io.BytesIO()
+        for number in [5, 1000, 0]:
+            write_varint(file, number)
+        file.seek(0)
+        self.assertListEqual([read_varint(file) for i in range(4)], [5, 1000, 0, None])
+        self.assertRaises(EOFError, read_varint, io.BytesIO(b"\x80"))
+
+    def test_gaps(self):
+        lst_numbers = [3, 4, 10, 1000, 1001]
+        arr_bytes = encode_gaps(lst_numbers) + b"resto"
+        self.assertEqual(decode_gaps(arr_bytes, len(lst_numbers)), (lst_numbers, len(arr_bytes) - 5))
+
+
+if __name__ == "__main__":
+    unittest.main()
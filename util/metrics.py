@@ -0,0 +1,209 @@
+"""
+Registro leve de métricas (contadores, timers e histogramas) para os trechos
+críticos da indexação e do processamento de consultas.
+
+Por padrão o registro está desabilitado: `span`, `inc` e `observe` apenas
+verificam uma flag e retornam, de forma que a instrumentação pode ficar no
+código de produção. Para habilitar, defina a variável de ambiente
+RI_METRICS=1 ou chame `metrics.enable()`.
+
+Exemplo:
+    with metrics.span("indexer.tokenize"):
+        tokens = word_tokenize(texto)
+    print(metrics.to_prometheus())
+"""
+from typing import Dict, Sequence
+from functools import wraps
+from time import perf_counter
+import bisect
+import json
+import os
+import re
+import threading
+
+
+class Counter:
+    def __init__(self, name: str):
+        self.name = name
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+    def snapshot(self) -> dict:
+        return {"type": "counter", "value": self.value}
+
+
+class Histogram:
+    DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+    def __init__(self, name: str, buckets: Sequence[float] = None, unit: str = ""):
+        self.name = name
+        self.unit = unit
+        self.buckets = tuple(sorted(buckets if buckets is not None else Histogram.DEFAULT_BUCKETS))
+        # a última posição conta as observações acima do maior limite (+Inf)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value: float):
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def snapshot(self) -> dict:
+        return {"type": "histogram",
+                "unit": self.unit,
+                "count": self.count,
+                "sum": self.sum,
+                "min": self.min,
+                "max": self.max,
+                "mean": self.sum / self.count if self.count else None,
+                "buckets": {str(bound): count for bound, count in zip(self.buckets + ("+Inf",), self.bucket_counts)}}
+
+
+class _Span:
+    __slots__ = ("registry", "name", "start")
+
+    def __init__(self, registry: "MetricsRegistry", name: str):
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.observe_time(self.name, perf_counter() - self.start)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class MetricsRegistry:
+    def __init__(self, enabled: bool = False, prefix: str = "ri"):
+        self.enabled = enabled
+        self.prefix = prefix
+        self.dic_metrics = {}
+        self.lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self.lock:
+            self.dic_metrics = {}
+
+    def counter(self, name: str) -> Counter:
+        return self._get_or_create(name, lambda: Counter(name))
+
+    def histogram(self, name: str, buckets: Sequence[float] = None, unit: str = "") -> Histogram:
+        return self._get_or_create(name, lambda: Histogram(name, buckets, unit))
+
+    def timer(self, name: str) -> Histogram:
+        return self.histogram(name, unit="seconds")
+
+    def _get_or_create(self, name: str, factory):
+        metric = self.dic_metrics.get(name)
+        if metric is None:
+            with self.lock:
+                metric = self.dic_metrics.get(name)
+                if metric is None:
+                    metric = factory()
+                    self.dic_metrics[name] = metric
+        return metric
+
+    def inc(self, name: str, amount: int = 1):
+        if not self.enabled:
+            return
+        metric = self.counter(name)
+        with self.lock:
+            metric.inc(amount)
+
+    def observe(self, name: str, value: float):
+        if not self.enabled:
+            return
+        metric = self.histogram(name)
+        with self.lock:
+            metric.observe(value)
+
+    def observe_time(self, name: str, seconds: float):
+        metric = self.timer(name)
+        with self.lock:
+            metric.observe(seconds)
+
+    def span(self, name: str):
+        """
+        Context manager que mede o tempo do bloco no timer `name`.
+        Desabilitado, retorna sempre o mesmo objeto que não faz nada.
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def timed(self, name: str):
+        """Decorador equivalente a envolver a função inteira em `span(name)`."""
+        def decorator(func):
+            @wraps(func)
+            def timed_func(*args, **kws):
+                if not self.enabled:
+                    return func(*args, **kws)
+                with _Span(self, name):
+                    return func(*args, **kws)
+            return timed_func
+        return decorator
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self.lock:
+            return {name: metric.snapshot() for name, metric in sorted(self.dic_metrics.items())}
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.snapshot(), **kwargs)
+
+    def prometheus_name(self, name: str) -> str:
+        return re.sub(r"[^a-zA-Z0-9_]", "_", f"{self.prefix}_{name}")
+
+    def to_prometheus(self) -> str:
+        lst_lines = []
+        with self.lock:
+            lst_metrics = sorted(self.dic_metrics.items())
+            for name, metric in lst_metrics:
+                str_name = self.prometheus_name(name)
+                if type(metric) == Counter:
+                    lst_lines.append(f"# TYPE {str_name}_total counter")
+                    lst_lines.append(f"{str_name}_total {metric.value}")
+                else:
+                    if metric.unit:
+                        str_name = f"{str_name}_{metric.unit}"
+                    lst_lines.append(f"# TYPE {str_name} histogram")
+                    acumulado = 0
+                    for bound, count in zip(metric.buckets + ("+Inf",), metric.bucket_counts):
+                        acumulado += count
+                        lst_lines.append(f'{str_name}_bucket{{le="{bound}"}} {acumulado}')
+                    lst_lines.append(f"{str_name}_sum {metric.sum}")
+                    lst_lines.append(f"{str_name}_count {metric.count}")
+        return "\n".join(lst_lines) + "\n"
+
+
+# registro global usado pela instrumentação dos módulos index e query
+metrics = MetricsRegistry(enabled=os.environ.get("RI_METRICS", "") not in ("", "0"))
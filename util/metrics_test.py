@@ -0,0 +1,86 @@
+from util.metrics import MetricsRegistry, metrics
+from util.time import CheckTime
+import json
+import unittest
+
+
+class MetricsTest(unittest.TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry(enabled=True)
+
+    def test_disabled_registry_records_nothing(self):
+        registry = MetricsRegistry(enabled=False)
+        with registry.span("indexer.tokenize"):
+            pass
+        registry.inc("indexer.documents")
+        registry.observe("query.results", 10)
+        self.assertEqual(registry.snapshot(), {}, "Com o registro desabilitado nenhuma métrica deveria ser criada")
+        self.assertIs(registry.span("a"), registry.span("b"), "Desabilitado, o span deveria ser sempre o mesmo objeto")
+
+    def test_counter_and_timer(self):
+        self.registry.inc("indexer.documents")
+        self.registry.inc("indexer.documents", 2)
+        for i in range(3):
+            with self.registry.span("indexer.tokenize"):
+                pass
+
+        snapshot = self.registry.snapshot()
+        self.assertEqual(snapshot["indexer.documents"]["value"], 3)
+        self.assertEqual(snapshot["indexer.tokenize"]["count"], 3)
+        self.assertEqual(snapshot["indexer.tokenize"]["unit"], "seconds")
+        self.assertEqual(sum(snapshot["indexer.tokenize"]["buckets"].values()), 3)
+
+    def test_timed_decorator(self):
+        @self.registry.timed("file_index.flush")
+        def flush(x):
+            return x * 2
+
+        self.assertEqual(flush(4), 8)
+        self.assertEqual(self.registry.snapshot()["file_index.flush"]["count"], 1)
+
+    def test_histogram_buckets(self):
+        self.registry.histogram("query.results", buckets=[1, 10, 100])
+        for value in [0, 5, 50, 500]:
+            self.registry.observe("query.results", value)
+        buckets = self.registry.snapshot()["query.results"]["buckets"]
+        self.assertDictEqual(buckets, {"1": 1, "10": 1, "100": 1, "+Inf": 1})
+
+    def test_export_json(self):
+        self.registry.inc("query.queries")
+        self.assertEqual(json.loads(self.registry.to_json())["query.queries"]["value"], 1)
+
+    def test_export_prometheus(self):
+        self.registry.inc("query.queries", 5)
+        self.registry.histogram("query.results", buckets=[1, 10])
+        self.registry.observe("query.results", 3)
+        with self.registry.span("query.score"):
+            pass
+        text = self.registry.to_prometheus()
+
+        self.assertIn("# TYPE ri_query_queries_total counter", text)
+        self.assertIn("ri_query_queries_total 5", text)
+        self.assertIn('ri_query_results_bucket{le="1"} 0', text)
+        self.assertIn('ri_query_results_bucket{le="10"} 1', text)
+        self.assertIn('ri_query_results_bucket{le="+Inf"} 1', text)
+        self.assertIn("ri_query_score_seconds_count 1", text)
+
+    def test_check_time(self):
+        time_checker = CheckTime()
+        time_checker.print_delta("Query Creation")
+
+        #tarefas diferentes vão para o mesmo timer
+        enabled = metrics.enabled
+        metrics.reset()
+        metrics.enable()
+        try:
+            time_checker.print_delta("Query Creation")
+            time_checker.print_delta("Consulta 42")
+            self.assertListEqual(list(metrics.snapshot()), ["checktime"])
+            self.assertEqual(metrics.snapshot()["checktime"]["count"], 2)
+        finally:
+            metrics.enabled = enabled
+            metrics.reset()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+"""
+Modo de profiling opcional para as fases de indexação e consulta.
+
+Habilitado pela variável de ambiente RI_PROFILE=<diretório> (ou pela flag
+--profile dos scripts), cada fase decorada com `profiler.profiled(nome)` é
+executada sob cProfile e tracemalloc e gera, no diretório informado:
+    <fase>.<n>.pstats      estatísticas do cProfile (abrir com pstats)
+    <fase>.<n>.txt         resumo legível das funções mais caras
+    <fase>.<n>.alloc.txt   maiores alocações ao final da fase
+Com RI_PROFILE_EVERY=N (ou --profile-every N), a cada N documentos/consultas
+(`profiler.sample`) é gravado também um <fase>.<n>.alloc.<i>.txt intermediário.
+
+Desabilitado, o decorador apenas repassa a chamada.
+"""
+from functools import wraps
+import argparse
+import cProfile
+import io
+import os
+import pstats
+import tracemalloc
+
+
+class Profiler:
+    def __init__(self, output_dir: str = None, sample_every: int = 0, top_entries: int = 30):
+        self.output_dir = None
+        self.sample_every = 0
+        self.top_entries = top_entries
+        self.dic_phase_runs = {}
+        self.lst_active_phases = []
+        self.configure(output_dir, sample_every)
+
+    @classmethod
+    def from_environment(cls) -> "Profiler":
+        return cls(os.environ.get("RI_PROFILE") or None, int(os.environ.get("RI_PROFILE_EVERY", "0")))
+
+    @property
+    def enabled(self) -> bool:
+        return self.output_dir is not None
+
+    def configure(self, output_dir: str = None, sample_every: int = 0):
+        self.output_dir = output_dir
+        self.sample_every = sample_every
+        if output_dir is not None:
+            os.makedirs(output_dir, exist_ok=True)
+
+    @staticmethod
+    def add_arguments(parser: argparse.ArgumentParser):
+        parser.add_argument("--profile", metavar="DIR", default=None,
+                            help="grava relatórios de cProfile/tracemalloc por fase em DIR")
+        parser.add_argument("--profile-every", metavar="N", type=int, default=0,
+                            help="snapshot de alocações a cada N documentos/consultas")
+
+    def configure_from_args(self, args: argparse.Namespace):
+        if args.profile is not None:
+            self.configure(args.profile, args.profile_every)
+
+    def profiled(self, phase: str):
+        def decorator(func):
+            @wraps(func)
+            def profiled_func(*args, **kws):
+                if not self.enabled:
+                    return func(*args, **kws)
+                return self.run_phase(phase, func, *args, **kws)
+            return profiled_func
+        return decorator
+
+    def run_phase(self, phase: str, func, *args, **kws):
+        run = self.dic_phase_runs.get(phase, 0) + 1
+        self.dic_phase_runs[phase] = run
+        str_prefix = os.path.join(self.output_dir, f"{phase}.{run}")
+
+        # fases aninhadas (ex.: finish_indexing dentro de um build) já são
+        # medidas pelo cProfile da fase externa; só registram as alocações
+        profile = None if self.lst_active_phases else cProfile.Profile()
+        started_tracemalloc = not tracemalloc.is_tracing()
+        if started_tracemalloc:
+            tracemalloc.start()
+        self.lst_active_phases.append([str_prefix, 0])
+        try:
+            if profile is None:
+                return func(*args, **kws)
+            profile.enable()
+            try:
+                return func(*args, **kws)
+            finally:
+                profile.disable()
+        finally:
+            self.lst_active_phases.pop()
+            if profile is not None:
+                self.write_stats(profile, str_prefix)
+            self.write_allocations(f"{str_prefix}.alloc.txt")
+            if started_tracemalloc:
+                tracemalloc.stop()
+
+    def sample(self):
+        """Chamado por documento/consulta processado dentro de uma fase."""
+        if not self.lst_active_phases or self.sample_every <= 0:
+            return
+        phase = self.lst_active_phases[-1]
+        phase[1] += 1
+        if phase[1] % self.sample_every == 0:
+            self.write_allocations(f"{phase[0]}.alloc.{phase[1]}.txt")
+
+    def write_stats(self, profile: cProfile.Profile, str_prefix: str):
+        profile.dump_stats(f"{str_prefix}.pstats")
+        stream = io.StringIO()
+        pstats.Stats(profile, stream=stream).sort_stats("cumulative").print_stats(self.top_entries)
+        with open(f"{str_prefix}.txt", "w", encoding="utf-8") as file:
+            file.write(stream.getvalue())
+
+    def write_allocations(self, str_file_name: str):
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        with open(str_file_name, "w", encoding="utf-8") as file:
+            file.write(f"current: {current / 10**6:,.3f} MB; peak: {peak / 10**6:,.3f} MB\n")
+            for stat in snapshot.statistics("lineno")[:self.top_entries]:
+                file.write(f"{stat}\n")
+
+
+# instância global usada pelos módulos index e query
+profiler = Profiler.from_environment()
@@ -0,0 +1,59 @@
+from util.profiling import Profiler, profiler
+from index.structure import FileIndex
+import os
+import pstats
+import tempfile
+import unittest
+
+
+class ProfilingTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        profiler.configure(None)
+        self.tmp_dir.cleanup()
+
+    def test_disabled_profiler(self):
+        obj_profiler = Profiler()
+
+        @obj_profiler.profiled("fase")
+        def fase(x):
+            return x + 1
+
+        self.assertFalse(obj_profiler.enabled)
+        self.assertEqual(fase(1), 2)
+
+    def test_phase_reports(self):
+        obj_profiler = Profiler(self.tmp_dir.name, sample_every=2)
+
+        @obj_profiler.profiled("fase")
+        def fase(num_docs):
+            lst_docs = []
+            for i in range(num_docs):
+                lst_docs.append([i] * 100)
+                obj_profiler.sample()
+            return len(lst_docs)
+
+        self.assertEqual(fase(5), 5)
+        self.assertEqual(fase(1), 1)
+        set_files = set(os.listdir(self.tmp_dir.name))
+        set_expected = {"fase.1.pstats", "fase.1.txt", "fase.1.alloc.txt",
+                        "fase.1.alloc.2.txt", "fase.1.alloc.4.txt",
+                        "fase.2.pstats", "fase.2.txt", "fase.2.alloc.txt"}
+        self.assertSetEqual(set_files, set_expected)
+        stats = pstats.Stats(os.path.join(self.tmp_dir.name, "fase.1.pstats"))
+        self.assertGreater(stats.total_calls, 0)
+
+    def test_file_index_phase(self):
+        profiler.configure(self.tmp_dir.name)
+        index = FileIndex()
+        index.index("casa", 1, 2)
+        index.index("verde", 2, 1)
+        index.finish_indexing()
+        self.assertTrue(os.path.exists(os.path.join(self.tmp_dir.name, "finish_indexing.1.pstats")))
+        self.assertTrue(os.path.exists(os.path.join(self.tmp_dir.name, "finish_indexing.1.alloc.txt")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+"""
+Benchmark de inicialização: tempo de importação e memória residente máxima
+(RSS) de um processo que apenas importa cada módulo, como um processo de
+consulta recém-criado.
+
+Cada medição é feita em um interpretador novo (subprocesso), para que os
+módulos já carregados no processo atual não interfiram; o resultado é a
+mediana de `repeat` execuções. A linha "(interpretador)" é o custo de um
+processo que não importa nada. São listados também os módulos pesados
+(HEAVY_MODULES) que a importação carregou.
+
+Uso: python -m util.startup [MODULO ...] [--repeat 5] [--json]
+"""
+from typing import List, Sequence
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+DEFAULT_MODULES = ("index.structure", "index.indexer", "query.processing", "query.server", "index.shared")
+HEAVY_MODULES = ("nltk", "bs4", "lxml", "IPython", "numpy")
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MEASURE_SCRIPT = """
+import importlib, json, resource, sys, time
+start = time.perf_counter()
+if sys.argv[1]:
+    importlib.import_module(sys.argv[1])
+elapsed = time.perf_counter() - start
+max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+# ru_maxrss é em KiB no Linux e em bytes no macOS
+max_rss_kb = max_rss // 1024 if sys.platform == "darwin" else max_rss
+print(json.dumps({"import_seconds": elapsed, "max_rss_kb": max_rss_kb,
+                  "heavy_modules": [name for name in json.loads(sys.argv[2]) if name in sys.modules]}))
+"""
+
+
+def measure_import(module: str, repeat: int = 5, cwd: str = REPO_DIR) -> dict:
+    """Mediana do tempo de importação e do RSS máximo de `module` ("" = só o interpretador)"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_DIR, os.environ.get("PYTHONPATH")])))
+    lst_runs = []
+    for i in range(repeat):
+        output = subprocess.run([sys.executable, "-c", MEASURE_SCRIPT, module, json.dumps(HEAVY_MODULES)],
+                                cwd=cwd, env=env, check=True, capture_output=True, text=True).stdout
+        lst_runs.append(json.loads(output))
+    return {"module": module or "(interpretador)",
+            "import_seconds": statistics.median(run["import_seconds"] for run in lst_runs),
+            "max_rss_kb": statistics.median(run["max_rss_kb"] for run in lst_runs),
+            "heavy_modules": lst_runs[-1]["heavy_modules"]}
+
+
+def startup_report(lst_modules: Sequence[str] = DEFAULT_MODULES, repeat: int = 5) -> List[dict]:
+    return [measure_import(module, repeat) for module in [""] + list(lst_modules)]
+
+
+def format_report(lst_results: List[dict]) -> str:
+    lst_lines = [f"{'módulo':<20} {'importação (ms)':>16} {'RSS máx. (MB)':>14}  módulos pesados"]
+    for result in lst_results:
+        lst_lines.append(f"{result['module']:<20} {result['import_seconds'] * 1000:>16.1f} "
+                         f"{result['max_rss_kb'] / 1024:>14.1f}  {', '.join(result['heavy_modules']) or '-'}")
+    return "\n".join(lst_lines)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Tempo de importação e memória de processos que só importam os módulos")
+    parser.add_argument("modules", nargs="*", default=list(DEFAULT_MODULES))
+    parser.add_argument("--repeat", type=int, default=5, help="execuções por módulo (é usada a mediana)")
+    parser.add_argument("--json", action="store_true", help="imprime o resultado em JSON")
+    args = parser.parse_args()
+
+    lst_results = startup_report(args.modules, args.repeat)
+    print(json.dumps(lst_results, indent=4) if args.json else format_report(lst_results))
+
+
+if __name__ == '__main__':
+    main()
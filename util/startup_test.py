@@ -0,0 +1,36 @@
+from util.startup import REPO_DIR, format_report, measure_import
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+
+class StartupTest(unittest.TestCase):
+    def test_measure_import(self):
+        result = measure_import("util.encoding", repeat=1)
+        self.assertEqual(result["module"], "util.encoding")
+        self.assertGreater(result["import_seconds"], 0)
+        self.assertGreater(result["max_rss_kb"], 0)
+        self.assertListEqual(result["heavy_modules"], [])
+        self.assertIn("util.encoding", format_report([result]))
+
+    def test_query_modules_are_light(self):
+        #processos de consulta não carregam nltk, BeautifulSoup nem IPython
+        for module in ["index.structure", "index.indexer", "query.processing"]:
+            self.assertListEqual(measure_import(module, repeat=1)["heavy_modules"], [], msg=module)
+
+    def test_import_outside_repo(self):
+        #os módulos (e o Cleaner padrão) não dependem do diretório atual
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            result = measure_import("query.processing", repeat=1, cwd=tmp_dir)
+            self.assertEqual(result["module"], "query.processing")
+            output = subprocess.run([sys.executable, "-c", "from index.indexer import HTMLIndexer;"
+                                                           "print(HTMLIndexer.cleaner.is_stop_word('ser'))"],
+                                    cwd=tmp_dir, env=dict(os.environ, PYTHONPATH=REPO_DIR),
+                                    check=True, capture_output=True, text=True).stdout
+        self.assertEqual(output.strip(), "True")
+
+
+if __name__ == "__main__":
+    unittest.main()
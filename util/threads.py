@@ -1,3 +1,27 @@
+"""
+Modelo de concorrência dos índices
+==================================
+
+- Leitura: `get_occurrence_list`, `document_count_with_term`, `vocabulary`,
+  `IndexPreComputedVals` e `Cleaner.preprocess_word` podem ser chamados por
+  várias threads ao mesmo tempo. No FileIndex as leituras compartilham o
+  `ReadWriteLock` do índice (vários leitores simultâneos, cada um com seu
+  próprio descritor do arquivo de ocorrências). O Cleaner e os valores
+  pré-computados não mudam depois de construídos e não usam trava.
+- Escrita: `index()` supõe uma única thread escritora por índice. As
+  operações que alteram o que os leitores enxergam (gravação das ocorrências
+  em arquivo, `finish_indexing` e demais operações de manutenção) tomam a
+  trava de escrita, que espera os leitores em andamento e bloqueia novos.
+- Troca de índice: uma reconstrução é feita em uma instância nova e depois
+  publicada com `GenerationPublisher.publish`. A troca é uma única atribuição
+  de referência; quem já obteve a geração anterior termina a consulta sobre
+  ela e a próxima consulta usa a nova, sem que os leitores precisem de trava.
+
+`synchronized` continua disponível para funções isoladas, mas serializa todos
+os chamadores e não deve ser usado nos caminhos de leitura.
+"""
+from contextlib import contextmanager
+from functools import wraps
 import threading
 #código obtido de: http://theorangeduck.com/page/synchronized-python
 def synchronized(func):
@@ -9,3 +33,125 @@ def synchronized(func):
             return func(*args, **kws)
 
     return synced_func
+
+
+class ReadWriteLock:
+    """
+    Trava leitores/escritor com preferência ao escritor (um escritor esperando
+    impede a entrada de novos leitores). Leituras aninhadas na mesma thread e
+    a thread escritora podem readquirir a trava; promover leitura a escrita
+    não é permitido.
+    """
+    def __init__(self):
+        self.condition = threading.Condition(threading.Lock())
+        self.readers = 0
+        self.waiting_writers = 0
+        self.writer = None
+        self.writer_depth = 0
+        self.local = threading.local()
+
+    def acquire_read(self):
+        me = threading.get_ident()
+        depth = getattr(self.local, "read_depth", 0)
+        if self.writer == me or depth > 0:
+            self.local.read_depth = depth + 1
+            return
+        with self.condition:
+            while self.writer is not None or self.waiting_writers > 0:
+                self.condition.wait()
+            self.readers += 1
+        self.local.read_depth = 1
+
+    def release_read(self):
+        self.local.read_depth -= 1
+        if self.local.read_depth > 0 or self.writer == threading.get_ident():
+            return
+        with self.condition:
+            self.readers -= 1
+            if self.readers == 0:
+                self.condition.notify_all()
+
+    def acquire_write(self):
+        me = threading.get_ident()
+        with self.condition:
+            if self.writer == me:
+                self.writer_depth += 1
+                return
+            if getattr(self.local, "read_depth", 0) > 0:
+                raise RuntimeError("Não é possível obter a trava de escrita segurando a de leitura")
+            self.waiting_writers += 1
+            while self.writer is not None or self.readers > 0:
+                self.condition.wait()
+            self.waiting_writers -= 1
+            self.writer = me
+            self.writer_depth = 1
+
+    def release_write(self):
+        with self.condition:
+            self.writer_depth -= 1
+            if self.writer_depth == 0:
+                self.writer = None
+                self.condition.notify_all()
+
+    @contextmanager
+    def reading(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def writing(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+def read_locked(func):
+    """Decorador de método: executa com a trava de leitura de `self.rw_lock`"""
+    @wraps(func)
+    def locked_func(self, *args, **kws):
+        with self.rw_lock.reading():
+            return func(self, *args, **kws)
+    return locked_func
+
+
+def write_locked(func):
+    """Decorador de método: executa com a trava de escrita de `self.rw_lock`"""
+    @wraps(func)
+    def locked_func(self, *args, **kws):
+        with self.rw_lock.writing():
+            return func(self, *args, **kws)
+    return locked_func
+
+
+class Generation:
+    def __init__(self, number: int, value):
+        self.number = number
+        self.value = value
+
+
+class GenerationPublisher:
+    """
+    Referência publicada atomicamente. Leitores chamam `current()` (sem trava)
+    e usam a geração obtida até o fim da operação; `publish` só serializa os
+    publicadores entre si.
+    """
+    def __init__(self, value=None):
+        self.lock_publish = threading.Lock()
+        self.generation = Generation(0, value)
+
+    def current(self) -> Generation:
+        return self.generation
+
+    @property
+    def value(self):
+        return self.generation.value
+
+    def publish(self, value) -> Generation:
+        with self.lock_publish:
+            self.generation = Generation(self.generation.number + 1, value)
+            return self.generation
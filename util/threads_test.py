@@ -0,0 +1,104 @@
+from util.threads import ReadWriteLock, GenerationPublisher
+from index.structure import FileIndex
+from concurrent.futures import ThreadPoolExecutor
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+
+class ReadWriteLockTest(unittest.TestCase):
+    def test_readers_share_the_lock(self):
+        rw_lock = ReadWriteLock()
+        barrier = threading.Barrier(3, timeout=2)
+
+        def read():
+            with rw_lock.reading():
+                #os tres leitores precisam estar dentro da trava ao mesmo tempo
+                barrier.wait()
+                return True
+
+        with ThreadPoolExecutor(3) as executor:
+            lst_results = list(executor.map(lambda i: read(), range(3)))
+        self.assertListEqual(lst_results, [True, True, True])
+
+    def test_writer_excludes_readers(self):
+        rw_lock = ReadWriteLock()
+        lst_events = []
+        rw_lock.acquire_read()
+
+        def write():
+            with rw_lock.writing():
+                lst_events.append("escrita")
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        time.sleep(0.05)
+        self.assertListEqual(lst_events, [], "O escritor não deveria entrar com um leitor ativo")
+        lst_events.append("fim leitura")
+        rw_lock.release_read()
+        writer.join(2)
+        self.assertListEqual(lst_events, ["fim leitura", "escrita"])
+
+    def test_reentrancy(self):
+        rw_lock = ReadWriteLock()
+        with rw_lock.writing():
+            with rw_lock.writing():
+                with rw_lock.reading():
+                    pass
+        with rw_lock.reading():
+            with rw_lock.reading():
+                self.assertRaises(RuntimeError, rw_lock.acquire_write)
+        #a trava deve estar livre novamente
+        with rw_lock.writing():
+            pass
+
+
+class GenerationPublisherTest(unittest.TestCase):
+    def test_publish(self):
+        publisher = GenerationPublisher("indice 0")
+        old_generation = publisher.current()
+        new_generation = publisher.publish("indice 1")
+
+        self.assertEqual(new_generation.number, old_generation.number + 1)
+        self.assertEqual(old_generation.value, "indice 0", "Quem obteve a geração anterior continua usando-a")
+        self.assertEqual(publisher.value, "indice 1")
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_concurrent_reads_during_rebuild(self):
+        index = FileIndex(os.path.join(self.tmp_dir.name, "occur_index"))
+        index.index("casa", 1, 1)
+        index.index("verde", 2, 1)
+        index.finish_indexing()
+        publisher = GenerationPublisher(index)
+        bol_stop = threading.Event()
+
+        def read():
+            count = 0
+            while not bol_stop.is_set():
+                current_index = publisher.value
+                self.assertEqual(len(current_index.get_occurrence_list("casa")), 1)
+                count += 1
+            return count
+
+        with ThreadPoolExecutor(4) as executor:
+            lst_futures = [executor.submit(read) for i in range(4)]
+            new_index = FileIndex(os.path.join(self.tmp_dir.name, "occur_index_rebuild"))
+            new_index.index("casa", 3, 2)
+            new_index.index("azul", 4, 1)
+            new_index.finish_indexing()
+            publisher.publish(new_index)
+            time.sleep(0.05)
+            bol_stop.set()
+            self.assertTrue(all(future.result() > 0 for future in lst_futures))
+        self.assertEqual(publisher.value.get_occurrence_list("casa")[0].doc_id, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,14 @@
+from datetime import datetime
+from util.metrics import metrics
+
+
 class CheckTime(object):
+    """
+    Cronômetro simples para impressão de tempos no notebook. Os tempos
+    impressos também são registrados no timer `checktime` de util.metrics
+    (quando habilitado); o nome da tarefa é texto livre e fica só na
+    impressão, para não criar uma métrica por tarefa.
+    """
     def __init__(self):
         self.time = datetime.now()
 
@@ -8,4 +18,8 @@ class CheckTime(object):
         return delta
     def printDelta(self,task):
         delta = self.finishTime()
+        if metrics.enabled:
+            metrics.observe_time("checktime", delta.total_seconds())
         print(task+" done in "+str(delta.total_seconds()))
+
+    print_delta = printDelta